@@ -21,6 +21,8 @@ Output structure (created under <MODEL_EXP_DIR>/gifs/):
 Notes:
   • Requires ffmpeg.
   • Expects frame files named like t=000.png, t=001.png, ...
+  • For runs without records/ (model_runs.py --no-record), use
+    code/python/s1_design_inference/render_runs.py, which renders from the pickles.
 USAGE
 }
 
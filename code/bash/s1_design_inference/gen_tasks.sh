@@ -5,9 +5,11 @@ set -euo pipefail
 PROJECT_DIR="${PROJECT_DIR:-$HOME/src/design-inference}"
 EXP="${EXP:-s1_design_inference}"
 TASKS_FILE="${TASKS_FILE:-$PROJECT_DIR/code/bash/${EXP}/tasks.txt}"
+MANIFEST="${MANIFEST:-${TASKS_FILE%.txt}.jsonl}"   # one JSON task per line, same order as tasks.txt
 SEEDS="${SEEDS:-20}"   # override via: SEEDS=50 code/bash/s1_design_inference/gen_tasks.sh
 OUTDIR="${OUTDIR:-$SCRATCH/design-inference/${EXP}}"   # <- write results to SCRATCH
 START_LOCATIONS_FILE="${PROJECT_DIR}/code/bash/${EXP}/start_locations.json"
+RECORD="${RECORD:-1}"  # RECORD=0: no per-timestep PNGs (animate later with render_runs.py)
 
 # --- Lmod / Python module (robust) ---
 source /share/software/user/open/lmod/lmod/init/bash
@@ -40,89 +42,16 @@ if [[ ! -f "$START_LOCATIONS_FILE" ]]; then
   exit 1
 fi
 
-echo "[gen] building task list → $TASKS_FILE"
+echo "[gen] building task manifest → $MANIFEST (+ $TASKS_FILE)"
 
-# First, generate the base task list
-python3 "$ORCH" --seeds "$SEEDS" --jobs 1 --dry-run 2>/dev/null \
-| awk '/^DRY-RUN:/{sub(/^DRY-RUN:[ ]*/,""); print}' \
-| sed 's/^python[[:space:]]/python3 /' \
-| awk -v outdir="$OUTDIR" '
-  # replace the value that follows --output-dir with our SCRATCH path
-  {
-    for (i=1; i<=NF; i++) {
-      if ($i=="--output-dir" && (i+1)<=NF) { $(i+1)=outdir }
-    }
-    print
-  }
-' > "${TASKS_FILE}.txt"
-
-# Now modify the task list to include start locations
-echo "[gen] adding start locations for model tasks..."
-
-python3 -c "
-import json
-import sys
-import re
-
-# Load start locations data
-try:
-    with open('$START_LOCATIONS_FILE', 'r') as f:
-        start_locations_data = json.load(f)
-except:
-    print('Error: Could not load start locations file: $START_LOCATIONS_FILE', file=sys.stderr)
-    sys.exit(1)
-
-# Create lookup dictionary keyed by trial_id
-location_cache = {}
-for item in start_locations_data:
-    location_cache[item['trial_id']] = item
-
-# Process each line in the task file
-with open('${TASKS_FILE}', 'r') as f:
-    for line in f:
-        line = line.strip()
-        if not line:
-            continue
-
-        # Extract level file to determine trial_id
-        parts = line.split()
-        level_file = None
-        for i, part in enumerate(parts):
-            if part == '--level' and i + 1 < len(parts):
-                level_file = parts[i + 1]
-                break
-
-        if level_file:
-            # Extract trial_id from level file path
-            level_name = level_file.split('/')[-1]  # Get filename
-            trial_match = re.match(r'(trial_\d+)\.txt$', level_name)
-            if trial_match:
-                trial_id = trial_match.group(1)
-
-                # Look up start locations for this trial
-                if trial_id in location_cache:
-                    trial_data = location_cache[trial_id]
-
-                    # Add start location arguments based on number of agents
-                    if '--num-agents 1' in line or '--num-start-locations 1' in line:
-                        # Single agent - use agent1_location
-                        if trial_data.get('agent1_location'):
-                            line += f' --start-location-model1 \"{trial_data[\"agent1_location\"]}\"'
-                    elif '--num-agents 2' in line or '--num-start-locations 2' in line:
-                        # Two agents - use both locations if available
-                        if trial_data.get('agent1_location'):
-                            line += f' --start-location-model1 \"{trial_data[\"agent1_location\"]}\"'
-                        if trial_data.get('agent2_location'):
-                            line += f' --start-location-model2 \"{trial_data[\"agent2_location\"]}\"'
-                else:
-                    print(f'Warning: Start locations not found for {trial_id}, using auto-placement.', file=sys.stderr)
-
-        print(line)
-" > "$TASKS_FILE"
-
-# Clean up temporary file
-rm -f "${TASKS_FILE}.txt"
+# model_runs.py resolves start locations from start_locations.json itself and
+# writes the JSONL manifest plus the matching command lines (line i = record i)
+RECORD_ARGS=()
+[[ "$RECORD" == "0" ]] && RECORD_ARGS=(--no-record)
+python3 "$ORCH" --seeds "$SEEDS" --outdir "$OUTDIR" \
+  --start-locations "$START_LOCATIONS_FILE" "${RECORD_ARGS[@]+"${RECORD_ARGS[@]}"}" \
+  --manifest "$MANIFEST" --tasks-txt "$TASKS_FILE"
 
 NLINES=$(wc -l < "$TASKS_FILE" || echo 0)
 echo "[gen] wrote $NLINES tasks to $TASKS_FILE"
-head -3 "$TASKS_FILE" 2>/dev/null || true
\ No newline at end of file
+head -3 "$TASKS_FILE" 2>/dev/null || true
@@ -8,23 +8,43 @@ Usage: get_layouts.sh [OPTIONS]
 
 Options:
   --no-regen-starts Use existing optimization results (skip regeneration)
+  --fresh-starts    Re-decide every trial instead of resuming from the checkpoint
+  --full-grid       Score every open start tile/pair with the surrogate and only
+                    simulate the best pairs (see find_start_locations.py)
+  --force-render    Re-render every layout image, even if its inputs are unchanged
   -h, --help        Show this help message
 
 This script generates layout images for all levels, automatically determining
 optimal start locations for 2-agent scenarios by running efficiency tests.
-By default, it regenerates optimization results. Use --no-regen-starts to skip
-regeneration if optimization results already exist.
+By default, it regenerates optimization results, resuming trials already
+decided for the same level contents and seed count. Use --no-regen-starts to
+skip regeneration if optimization results already exist.
 EOF
 }
 
 # Parse args
 REGEN_STARTS=true  # Default: regenerate starts
+RESUME_ARGS=(--resume)  # Default: keep trials already decided
+FINDER_ARGS=()
+RENDER_ARGS=()
 while [[ $# -gt 0 ]]; do
   case "$1" in
     --no-regen-starts)
       REGEN_STARTS=false
       shift
       ;;
+    --fresh-starts)
+      RESUME_ARGS=()
+      shift
+      ;;
+    --full-grid)
+      FINDER_ARGS+=(--full-grid)
+      shift
+      ;;
+    --force-render)
+      RENDER_ARGS+=(--force)
+      shift
+      ;;
     -h|--help)
       usage
       exit 0
@@ -65,13 +85,11 @@ mkdir -p "$LAYOUT_ROOT"
 if [[ "$REGEN_STARTS" == "true" ]]; then
   echo "Finding optimal start locations for all trials..."
 
-  # Remove existing file to ensure fresh results
-  rm -f "$START_LOCATIONS_FILE"
-
-  # Run the comprehensive start location finder
+  # Run the comprehensive start location finder. Each trial is checkpointed as it
+  # finishes and the file is rewritten atomically, so it is never deleted here.
   cd "$ROOT" && python3 code/python/s1_design_inference/find_start_locations.py \
     --output "$START_LOCATIONS_FILE" \
-    --seeds 3
+    --seeds 3 ${RESUME_ARGS[@]+"${RESUME_ARGS[@]}"} ${FINDER_ARGS[@]+"${FINDER_ARGS[@]}"}
 
   # Check if start location generation was successful
   if [[ $? -ne 0 ]]; then
@@ -88,75 +106,15 @@ else
   echo "Using existing start locations: $START_LOCATIONS_FILE"
 fi
 
-echo "Generating layout tasks..."
-
-# Generate tasks for both 1-agent and 2-agent layouts
-> "$TASKS_FILE"  # Clear tasks file
-
-# Generate tasks for all trials (1-36)
-for i in $(seq -w 1 36); do
-  level_file="$STIMULI_ROOT/trial_${i}.txt"
-  # skip non-regular files (just in case)
-  [[ -f "$level_file" ]] || continue
-
-  trial_id="trial_$(printf '%02d' $((10#$i)))"
-
-  # 1-agent layout - use start location from JSON
-  agent1_loc=$(python3 -c "
-import json
-try:
-    with open('$START_LOCATIONS_FILE') as f:
-        data = json.load(f)
-    for item in data:
-        if item['trial_id'] == '$trial_id':
-            print(item['agent1_location'])
-            break
-except:
-    pass
-")
-
-  if [[ -n "$agent1_loc" ]]; then
-    echo "python3 gym-cooking/gym_cooking/main.py --level \"$level_file\" --num-agents 0 --record --layout --output-prefix \"${LAYOUT_ROOT}\" --num-start-locations 1 --start-location-model1 \"$agent1_loc\"" >> "$TASKS_FILE"
-  else
-    # Fallback to auto-placement if location not found
-    echo "python3 gym-cooking/gym_cooking/main.py --level \"$level_file\" --num-agents 0 --record --layout --output-prefix \"${LAYOUT_ROOT}\" --num-start-locations 1" >> "$TASKS_FILE"
-  fi
-
-  # 2-agent layout - extract both locations from JSON
-  agent2_loc=$(python3 -c "
-import json
-try:
-    with open('$START_LOCATIONS_FILE') as f:
-        data = json.load(f)
-    for item in data:
-        if item['trial_id'] == '$trial_id':
-            agent2 = item.get('agent2_location')
-            print(agent2 if agent2 is not None else '')
-            break
-except:
-    pass
-")
-
-  if [[ -n "$agent1_loc" && -n "$agent2_loc" ]]; then
-    # Use optimized locations for 2-agent layout (cooks trials)
-    echo "python3 gym-cooking/gym_cooking/main.py --level \"$level_file\" --num-agents 0 --record --layout --output-prefix \"${LAYOUT_ROOT}\" --num-start-locations 2 --start-location-model1 \"$agent1_loc\" --start-location-model2 \"$agent2_loc\"" >> "$TASKS_FILE"
-  elif [[ -n "$agent1_loc" ]]; then
-    # Single agent layout (dish trials) - but show 2 locations for consistency in display
-    echo "python3 gym-cooking/gym_cooking/main.py --level \"$level_file\" --num-agents 0 --record --layout --output-prefix \"${LAYOUT_ROOT}\" --num-start-locations 1 --start-location-model1 \"$agent1_loc\"" >> "$TASKS_FILE"
-  else
-    # Fallback to auto-placement
-    echo "Warning: Could not find start locations for $trial_id, using auto-placement"
-    echo "python3 gym-cooking/gym_cooking/main.py --level \"$level_file\" --num-agents 0 --record --layout --output-prefix \"${LAYOUT_ROOT}\" --num-start-locations 2" >> "$TASKS_FILE"
-  fi
-done
-
-echo "Executing layout generation tasks..."
+echo "Rendering layout images..."
 
-# Execute all tasks
-while IFS= read -r task; do
-  echo "Running: $task"
-  eval "$task"
-done < "$TASKS_FILE"
+# One process pool renders every trial's 1-agent and 2-agent image; images whose
+# level and start locations are unchanged are skipped (see render_layouts.py).
+# layouts_tasks.txt keeps the equivalent main.py command per image for reference.
+cd "$ROOT" && python3 code/python/s1_design_inference/render_layouts.py \
+  --start-locations "$START_LOCATIONS_FILE" \
+  --out "$LAYOUT_ROOT" \
+  --tasks-txt "$TASKS_FILE" ${RENDER_ARGS[@]+"${RENDER_ARGS[@]}"}
 
 echo "Layout generation complete!"
 
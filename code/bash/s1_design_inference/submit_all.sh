@@ -5,19 +5,27 @@ set -euo pipefail
 #   submit_all.sh [overwrite] [regen]
 # or via env:
 #   OVERWRITE=1 REGEN=1 CHUNK=900 CONCURRENCY=300 SEEDS=20 ./submit_all.sh
+# Packed mode (each array element runs PACK_SIZE tasks on PACK_CPUS cores):
+#   PACK=1 PACK_SIZE=64 PACK_CPUS=8 ./submit_all.sh
 
 PROJECT_DIR="${PROJECT_DIR:-$HOME/src/design-inference}"
 GEN="${GEN:-$PROJECT_DIR/code/bash/s1_design_inference/gen_tasks.sh}"
 TASKS_FILE="${TASKS_FILE:-$PROJECT_DIR/code/bash/s1_design_inference/tasks.txt}"
 SLURM_FILE="${SLURM_FILE:-$PROJECT_DIR/code/bash/s1_design_inference/run_overcooked_array.slurm}"
+PACK_SLURM_FILE="${PACK_SLURM_FILE:-$PROJECT_DIR/code/bash/s1_design_inference/run_overcooked_packed.slurm}"
 LOGROOT="${LOGROOT:-/scratch/users/$USER/design-inference/s1_design_inference}"
+export DESIGN_INFERENCE_CACHE="${DESIGN_INFERENCE_CACHE:-$LOGROOT/cache}"   # same default as the array job
 
 # tuneables
 CHUNK="${CHUNK:-900}"             # max task IDs per submission
 CONCURRENCY="${CONCURRENCY:-300}" # %X throttle for each array
 SEEDS="${SEEDS:-20}"              # passed to generator
-OVERWRITE="${OVERWRITE:-0}"       # 1 = submit all (ignore existing pickles)
+OVERWRITE="${OVERWRITE:-0}"       # 1 = submit all (ignore cached results)
 REGEN="${REGEN:-0}"               # 1 = rebuild tasks.txt first
+PACK="${PACK:-0}"                 # 1 = run PACK_SIZE tasks per array element on an in-node pool
+PACK_SIZE="${PACK_SIZE:-64}"      # tasks per array element (PACK=1)
+PACK_CPUS="${PACK_CPUS:-8}"       # --cpus-per-task / pool size (PACK=1)
+PACK_MODE="${PACK_MODE:-lpt}"     # lpt (by expected cost) | balanced | contiguous (PACK=1)
 
 # Optional positionals
 case "${1-}" in overwrite) OVERWRITE=1 ;; esac
@@ -65,29 +73,12 @@ compress_ranges() {
   '
 }
 
-# 2) Build list of missing lines (those whose pickle does NOT exist)
-#    Do this entirely in awk + test to avoid subshell/set -e pitfalls.
+# 2) Build list of missing lines (those without a cached result for the same
+#    level contents, models, start locations, seed and simulator version)
 MISSING_IDX_FILE="$(mktemp)"
 trap 'rm -f "$MISSING_IDX_FILE"' EXIT
 
-awk -v dflt="$LOGROOT" -v out="$MISSING_IDX_FILE" '
-{
-  odir=""; pref=""; seed="";
-  for(i=1;i<=NF;i++){
-    if($i=="--output-dir")    odir=$(i+1);
-    if($i=="--output-prefix") pref=$(i+1);
-    if($i=="--seed")          seed=$(i+1);
-  }
-  if(odir=="") odir=dflt;
-  pick=odir "/pickles/" pref "-seed=" seed ".pkl";
-  # Use system() to test existence; status 0 = exists
-  cmd = "test -f \047" pick "\047";
-  status = system(cmd);
-  if (status != 0) {
-    print NR >> out;
-  }
-}
-END { }' "$TASKS_FILE"
+python3 "$PROJECT_DIR/code/python/s1_design_inference/sim_cache.py" missing --tasks "$TASKS_FILE" > "$MISSING_IDX_FILE"
 
 # Count
 MISSING=$(wc -l < "$MISSING_IDX_FILE" || echo 0)
@@ -100,10 +91,36 @@ if [[ "$OVERWRITE" == "1" ]]; then
 else
   echo "Will be run:    $MISSING"
 fi
-echo "OVERWRITE=$OVERWRITE (1 = re-run even if pickle exists)"
+echo "OVERWRITE=$OVERWRITE (1 = re-run even if a cached result exists)"
 
 # 3) Submit
-if [[ "$OVERWRITE" == "1" ]]; then
+if [[ "$PACK" == "1" ]]; then
+  # Packed: one array element per PACK_SIZE tasks; memory sized from measured
+  # peak RSS of earlier runs (logs/telemetry.jsonl), or 2G per worker with no history
+  LINES_FILE="$LOGROOT/logs/pack_lines.$(date +%Y%m%d-%H%M%S).txt"
+  mkdir -p "$LOGROOT/logs"
+  if [[ "$OVERWRITE" == "1" ]]; then
+    seq 1 "$NLINES" > "$LINES_FILE"
+  else
+    sort -n "$MISSING_IDX_FILE" > "$LINES_FILE"
+  fi
+  NTASKS=$(wc -l < "$LINES_FILE")
+  (( NTASKS > 0 )) || { echo "Nothing to run. Exiting."; exit 0; }
+  NUM_PACKS=$(( (NTASKS + PACK_SIZE - 1) / PACK_SIZE ))
+  MEM=$(python3 "$PROJECT_DIR/code/python/s1_design_inference/run_task_pack.py" mem \
+        --log "$LOGROOT/logs/telemetry.jsonl" --jobs "$PACK_CPUS")
+  PLAN_FILE=""
+  if [[ "$PACK_MODE" == "lpt" ]]; then
+    # Longest-processing-time assignment from historical costs, fixed up front so
+    # every array element reads the same plan
+    PLAN_FILE="${LINES_FILE%.txt}.plan"
+    python3 "$PROJECT_DIR/code/python/s1_design_inference/run_task_pack.py" plan \
+      --tasks "$TASKS_FILE" --lines "$LINES_FILE" --num-packs "$NUM_PACKS" --outdir "$LOGROOT" --out "$PLAN_FILE"
+  fi
+  echo "Submitting $NTASKS task(s) as $NUM_PACKS pack(s) of ~$PACK_SIZE ($PACK_MODE) on $PACK_CPUS CPUs, --mem=$MEM (%$CONCURRENCY)"
+  sbatch --export=ALL,NUM_PACKS="$NUM_PACKS",LINES_FILE="$LINES_FILE",PLAN_FILE="$PLAN_FILE",PACK_MODE="$PACK_MODE",OVERWRITE_RESULTS="$OVERWRITE" \
+         --array="1-${NUM_PACKS}%${CONCURRENCY}" --cpus-per-task="$PACK_CPUS" --mem="$MEM" "$PACK_SLURM_FILE"
+elif [[ "$OVERWRITE" == "1" ]]; then
   # Submit full coverage in CHUNK-sized spans
   CHUNKS=$(( (NLINES + CHUNK - 1) / CHUNK ))
   echo "Submitting ALL $NLINES tasks in $CHUNKS chunk(s) of up to $CHUNK (%$CONCURRENCY)"
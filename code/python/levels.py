@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Shared parser for gym-cooking level files.
+
+A level txt file has up to three blank-line-separated phases:
+  1. the kitchen map, one character per tile
+  2. recipe names, one per line (e.g. Salad, SaladOL)
+  3. start locations, one "x y" pair per line
+
+`load_level` parses a file into a compact `Level`: a uint8 tile-code grid plus a
+typed object table, so scans and feasibility checks are array operations. Parsed
+levels are cached in memory and on disk, keyed by the sha256 of the file contents,
+so each level is parsed once per pipeline run no matter how many scripts ask.
+The all-pairs shortest-path index over a level's open tiles (`distance_index`)
+is cached the same way.
+"""
+
+import os
+import hashlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = Path(os.environ.get("DESIGN_INFERENCE_CACHE", ROOT / ".cache" / "design-inference")) / "levels"
+
+# Tile codes for the `tiles` grid
+FLOOR, COUNTER, CUTBOARD, DELIVERY, DISPENSER = 0, 1, 2, 3, 4
+TILE_CHARS = {'-': COUNTER, '/': CUTBOARD, '*': DELIVERY}
+
+# Items that can sit on a counter (lowercase) or be dispensed (uppercase)
+ITEMS = {'t': 'Tomato', 'l': 'Lettuce', 'o': 'Onion', 'p': 'Plate'}
+ITEM_CODES = {c: i for i, c in enumerate('tlop')}
+
+OBJECT_DTYPE = np.dtype([('x', np.uint8), ('y', np.uint8), ('item', np.uint8), ('dispenser', np.bool_)])
+
+
+class Level(NamedTuple):
+    tiles: np.ndarray            # (height, width) uint8 tile codes
+    objects: np.ndarray          # structured array with OBJECT_DTYPE
+    recipes: Tuple[str, ...]
+    start_locations: Tuple[Tuple[int, int], ...]
+    sha: str
+
+    @property
+    def height(self) -> int:
+        return self.tiles.shape[0]
+
+    @property
+    def width(self) -> int:
+        return self.tiles.shape[1]
+
+    def open_mask(self) -> np.ndarray:
+        """Tiles an agent can start on: floor with nothing on it."""
+        return self.tiles == FLOOR
+
+    def item_mask(self, item: str, dispenser: Optional[bool] = None) -> np.ndarray:
+        """Boolean grid of tiles holding `item` ('t', 'l', 'o' or 'p')."""
+        objs = self.objects[self.objects['item'] == ITEM_CODES[item]]
+        if dispenser is not None:
+            objs = objs[objs['dispenser'] == dispenser]
+        mask = np.zeros(self.tiles.shape, dtype=bool)
+        mask[objs['y'], objs['x']] = True
+        return mask
+
+
+def parse_level(text: str, sha: str = "") -> Level:
+    """Parse the contents of a level txt file."""
+    phases: List[List[str]] = [[]]
+    for line in text.splitlines():
+        if line.strip() == '':
+            if phases[-1]:
+                phases.append([])
+            continue
+        phases[-1].append(line.strip())
+
+    rows = phases[0]
+    recipes = tuple(phases[1]) if len(phases) > 1 else ()
+    starts = tuple(tuple(int(v) for v in l.split()[:2]) for l in phases[2]) if len(phases) > 2 else ()
+
+    height, width = len(rows), max((len(r) for r in rows), default=0)
+    # Short rows are padded with floor, which is how the old per-tile lookups treated them
+    chars = np.full((height, width), ord(' '), dtype=np.uint8)
+    for y, row in enumerate(rows):
+        chars[y, :len(row)] = np.frombuffer(row.encode('ascii'), dtype=np.uint8)
+
+    tiles = np.zeros((height, width), dtype=np.uint8)
+    for c, code in TILE_CHARS.items():
+        tiles[chars == ord(c)] = code
+    tiles[np.isin(chars, np.frombuffer(b'tlop', dtype=np.uint8))] = COUNTER
+    tiles[np.isin(chars, np.frombuffer(b'TLOP', dtype=np.uint8))] = DISPENSER
+
+    obj_y, obj_x = np.nonzero(np.isin(chars, np.frombuffer(b'tlopTLOP', dtype=np.uint8)))
+    objects = np.empty(len(obj_x), dtype=OBJECT_DTYPE)
+    objects['x'], objects['y'] = obj_x, obj_y
+    obj_chars = chars[obj_y, obj_x]
+    objects['dispenser'] = obj_chars < ord('a')
+    objects['item'] = [ITEM_CODES[chr(c).lower()] for c in obj_chars]
+
+    return Level(tiles, objects, recipes, starts, sha)
+
+
+def format_level(layout: str, recipes: Sequence[str] = (), start_locations: Sequence[Tuple[int, int]] = ()) -> str:
+    """Inverse of parse_level: render the txt format from its phases."""
+    text = layout.rstrip('\n')
+    if recipes or start_locations:
+        text += '\n\n' + '\n'.join(recipes)
+    if start_locations:
+        text += '\n\n' + ''.join(f'{x} {y}\n' for x, y in start_locations)
+    return text
+
+
+def write_level(path, layout: str, recipes: Sequence[str] = (), start_locations: Sequence[Tuple[int, int]] = ()):
+    with open(path, 'w') as f:
+        f.write(format_level(layout, recipes, start_locations))
+
+
+# ─── CACHE ─────────────────────────────────────────────────────────────────────
+
+_MEMORY_CACHE: Dict[str, Level] = {}
+
+
+def file_sha(path) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _save_npz(level: Level, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.savez(f, tiles=level.tiles, objects=level.objects,
+                 recipes=np.array(level.recipes, dtype=str),
+                 start_locations=np.array(level.start_locations, dtype=np.int16).reshape(-1, 2))
+    os.replace(tmp, path)
+
+
+def _load_npz(path: Path, sha: str) -> Level:
+    with np.load(path) as z:
+        return Level(z['tiles'], z['objects'], tuple(str(r) for r in z['recipes']),
+                     tuple((int(x), int(y)) for x, y in z['start_locations']), sha)
+
+
+def load_level(path, use_disk_cache: bool = True) -> Level:
+    """Parse a level file, reusing the in-memory or on-disk parse when the contents match."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    sha = hashlib.sha256(raw).hexdigest()
+    if sha in _MEMORY_CACHE:
+        return _MEMORY_CACHE[sha]
+
+    npz = CACHE_DIR / f'{sha}.npz'
+    level = None
+    if use_disk_cache and npz.exists():
+        try:
+            level = _load_npz(npz, sha)
+        except (OSError, ValueError, KeyError):
+            level = None
+    if level is None:
+        level = parse_level(raw.decode('utf-8'), sha)
+        if use_disk_cache:
+            try:
+                _save_npz(level, npz)
+            except OSError:
+                pass  # read-only checkout; the memory cache still applies
+    _MEMORY_CACHE[sha] = level
+    return level
+
+
+# ─── START TILE SCANS ──────────────────────────────────────────────────────────
+
+def scan_order(width: int, height: int, start_xy, dir_primary, dir_secondary) -> np.ndarray:
+    """
+    Tiles visited, in order, by gym-cooking's auto_place_agents scan, as an (n, 2) array of (x, y).
+
+    The scan stays in the interior (outer walls excluded): it walks along the
+    primary direction, and when it runs off the interior it steps once along the
+    secondary direction and resets to the far interior edge of the primary axis.
+    It stops after as many steps as there are interior tiles.
+    """
+    xmin, xmax = 1, max(1, width - 2)
+    ymin, ymax = 1, max(1, height - 2)
+    x0 = min(max(start_xy[0], xmin), xmax)
+    y0 = min(max(start_xy[1], ymin), ymax)
+
+    def axis(lo, hi, d):
+        return np.arange(hi, lo - 1, -1) if d < 0 else np.arange(lo, hi + 1)
+
+    if dir_primary[0] != 0:
+        full = axis(xmin, xmax, dir_primary[0])
+        first = full[np.flatnonzero(full == x0)[0]:]
+        rest = axis(ymin, ymax, dir_secondary[1])
+        rest = rest[rest > y0] if dir_secondary[1] > 0 else rest[rest < y0]
+        xs = np.concatenate([first, np.tile(full, len(rest))])
+        ys = np.concatenate([np.full(len(first), y0), np.repeat(rest, len(full))])
+    else:
+        full = axis(ymin, ymax, dir_primary[1])
+        first = full[np.flatnonzero(full == y0)[0]:]
+        rest = axis(xmin, xmax, dir_secondary[0])
+        rest = rest[rest > x0] if dir_secondary[0] > 0 else rest[rest < x0]
+        ys = np.concatenate([first, np.tile(full, len(rest))])
+        xs = np.concatenate([np.full(len(first), x0), np.repeat(rest, len(full))])
+
+    n = max(1, (xmax - xmin + 1) * (ymax - ymin + 1))
+    return np.stack([xs, ys], axis=1)[:n]
+
+
+def scan_open(level: Level, start_xy, dir_primary, dir_secondary) -> Tuple[int, int]:
+    """First open start tile along the scan; falls back to the top-left interior tile."""
+    order = scan_order(level.width, level.height, start_xy, dir_primary, dir_secondary)
+    hits = np.flatnonzero(level.open_mask()[order[:, 1], order[:, 0]])
+    if len(hits) == 0:
+        return (1, 1)
+    x, y = order[hits[0]]
+    return (int(x), int(y))
+
+
+def candidate_locations(level: Level) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    The two auto-placement start tiles: agent1 scans from the top-right interior
+    leftwards, agent2 from the bottom-left interior upwards.
+    """
+    w, h = level.width, level.height
+    a1 = scan_open(level, (max(1, w - 2), 1), dir_primary=(-1, 0), dir_secondary=(0, 1))
+    a2 = scan_open(level, (1, max(1, h - 2)), dir_primary=(0, -1), dir_secondary=(1, 0))
+    if a2 == a1:
+        a2 = scan_open(level, (a2[0], a2[1] - 1), dir_primary=(0, -1), dir_secondary=(1, 0))
+    return a1, a2
+
+
+# ─── REACHABILITY ──────────────────────────────────────────────────────────────
+# Batched: masks are (..., height, width) boolean arrays, so a stack of layouts
+# is checked in one pass.
+
+def dilate(mask: np.ndarray) -> np.ndarray:
+    """`mask` grown by one tile in the four move directions."""
+    out = mask.copy()
+    out[..., 1:, :] |= mask[..., :-1, :]
+    out[..., :-1, :] |= mask[..., 1:, :]
+    out[..., :, 1:] |= mask[..., :, :-1]
+    out[..., :, :-1] |= mask[..., :, 1:]
+    return out
+
+
+def flood_fill(walkable: np.ndarray, seeds: np.ndarray) -> np.ndarray:
+    """Tiles of `walkable` connected to `seeds` by four-neighbour moves."""
+    region = seeds & walkable
+    while True:
+        grown = dilate(region) & walkable
+        if np.array_equal(grown, region):
+            return region
+        region = grown
+
+
+def reachable(level: Level, start_xy) -> np.ndarray:
+    """Floor tiles an agent at `start_xy` can walk to."""
+    seeds = np.zeros(level.tiles.shape, dtype=bool)
+    seeds[start_xy[1], start_xy[0]] = True
+    return flood_fill(level.open_mask(), seeds)
+
+
+def tile_index(walkable: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Numbering of the walkable tiles of one layout: a (height, width) grid of
+    tile numbers (-1 where not walkable) and the (n, 2) x, y of each number.
+    """
+    ys, xs = np.nonzero(walkable)
+    index = np.full(walkable.shape, -1, dtype=np.int32)
+    index[ys, xs] = np.arange(len(xs))
+    return index, np.stack([xs, ys], axis=1)
+
+
+def all_pairs_distances(walkable: np.ndarray, extra_edges: Sequence[Tuple[int, int, float]] = ()) -> np.ndarray:
+    """
+    (n, n) shortest move counts between the walkable tiles of one layout, in
+    tile_index order (inf where unreachable). `extra_edges` adds undirected
+    (i, j, cost) links between tile numbers, e.g. passing an item over a counter.
+    """
+    index, coords = tile_index(walkable)
+    n = len(coords)
+    dist = np.full((n, n), np.inf)
+    dist[np.arange(n), np.arange(n)] = 0.0
+    for dx, dy in ((1, 0), (0, 1)):
+        a = index[:walkable.shape[0] - dy, :walkable.shape[1] - dx]
+        b = index[dy:, dx:]
+        both = (a >= 0) & (b >= 0)
+        dist[a[both], b[both]] = dist[b[both], a[both]] = 1.0
+    for i, j, cost in extra_edges:
+        dist[i, j] = dist[j, i] = min(dist[i, j], cost)
+    # Floyd-Warshall, one vectorized relaxation per intermediate tile
+    for k in range(n):
+        np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+    return dist
+
+
+_DISTANCE_CACHE: Dict[str, np.ndarray] = {}
+
+
+def distance_index(level: Level, use_disk_cache: bool = True) -> np.ndarray:
+    """
+    all_pairs_distances over the level's open tiles, cached in memory and on
+    disk next to the parsed level (same content sha), so each layout's index is
+    built once no matter how many start tiles or pairs are evaluated on it.
+    """
+    if not level.sha:
+        return all_pairs_distances(level.open_mask())
+    if level.sha in _DISTANCE_CACHE:
+        return _DISTANCE_CACHE[level.sha]
+    path = CACHE_DIR / f'{level.sha}.apsp.npy'
+    dist = None
+    if use_disk_cache and path.exists():
+        try:
+            dist = np.load(path)
+        except (OSError, ValueError):
+            dist = None
+    if dist is None:
+        dist = all_pairs_distances(level.open_mask())
+        if use_disk_cache:
+            try:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(path.name + f'.{os.getpid()}.tmp')
+                with open(tmp, 'wb') as f:
+                    np.save(f, dist)
+                os.replace(tmp, path)
+            except OSError:
+                pass
+    _DISTANCE_CACHE[level.sha] = dist
+    return dist
@@ -1,23 +1,131 @@
 import os
 import re
-import io
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 
+ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = Path(os.environ.get("DESIGN_INFERENCE_CACHE", ROOT / ".cache" / "design-inference")) / "osf"
+OSF_API = 'https://api.osf.io/v2'
+
+
+class _TeeReader:
+    """File-like wrapper that copies everything read from `raw` into `sink` and a sha256."""
+
+    def __init__(self, raw, sink):
+        self.raw = raw
+        self.sink = sink
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        chunk = self.raw.read(size)
+        self.sink.write(chunk)
+        self.sha256.update(chunk)
+        return chunk
+
+    def drain(self):
+        for chunk in iter(lambda: self.read(1 << 16), b''):
+            pass
+
+
 class OSFDataHandler:
-    def __init__(self, node_id):
-        self.dataframes = []
+    """
+    Loads experiment CSVs from an OSF node.
+
+    Files are tracked in an index over the metadata parsed from their names
+    (project, experiment, iteration_name, gameID). Downloaded files stay in the
+    local cache and are only read into memory when a query selects them.
+    """
+
+    def __init__(self, node_id, cache_dir=None, max_workers=8, api_url=OSF_API):
+        self.entries = {}   # key -> {'metadata', 'path', 'dataframe'}
+        self.index = {}     # metadata field -> value -> set of entry keys
         self.node_id = node_id
         self.ACCESS_TOKEN = os.environ.get('OSF_ID')
+        self.api_url = api_url.rstrip('/')
+        self.max_workers = max_workers
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR / node_id
+        self._index_lock = threading.Lock()
+
+        # One pooled session for every request, sized for the download threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(4, max_workers))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if self.ACCESS_TOKEN:
+            self.session.headers['Authorization'] = f'Bearer {self.ACCESS_TOKEN}'
+
+    # ─── INDEX ─────────────────────────────────────────────────────────────────
+
+    def _register(self, key, metadata, path=None, dataframe=None):
+        if key in self.entries:
+            self._unindex(key)
+        self.entries[key] = {'metadata': metadata, 'path': path, 'dataframe': dataframe}
+        for field, value in metadata.items():
+            self.index.setdefault(field, {}).setdefault(value, set()).add(key)
+
+    def _unindex(self, key):
+        for field, value in self.entries[key]['metadata'].items():
+            self.index.get(field, {}).get(value, set()).discard(key)
 
     def add_dataframe(self, dataframe, metadata):
-        self.dataframes.append({'dataframe': dataframe, 'metadata': metadata})
+        self._register(f'memory:{len(self.entries)}', metadata, dataframe=dataframe)
+
+    def select(self, criteria=None):
+        """Keys of the entries whose metadata matches every criterion, in insertion order."""
+        keys = None
+        for field, value in (criteria or {}).items():
+            matches = self.index.get(field, {}).get(value, set())
+            keys = set(matches) if keys is None else keys & matches
+        return [k for k in self.entries if keys is None or k in keys]
+
+    def _frame(self, key):
+        entry = self.entries[key]
+        if entry['dataframe'] is not None:
+            return entry['dataframe']
+        return pd.read_csv(entry['path'])
 
     def find(self, criteria=None):
-        results = [item['dataframe'] for item in self.dataframes if all(item['metadata'].get(k) == v for k, v in criteria.items())]
+        results = [self._frame(k) for k in self.select(criteria)]
         print(f'Found {len(results)} files matching specified criteria.')
         return results
 
+    def combined(self, criteria=None, as_arrow=False):
+        """
+        One table of the selected files only. With as_arrow, a pyarrow Table
+        concatenated from memory-mapped Arrow copies of the cached CSVs.
+        """
+        keys = self.select(criteria)
+        if as_arrow:
+            import pyarrow as pa
+            return pa.concat_tables([self._arrow_table(k) for k in keys], promote_options='default')
+        if not keys:
+            return pd.DataFrame()
+        return pd.concat([self._frame(k) for k in keys]).reset_index(drop=True)
+
+    def _arrow_table(self, key):
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        entry = self.entries[key]
+        if entry['path'] is None:
+            return pa.Table.from_pandas(entry['dataframe'], preserve_index=False)
+        arrow_path = Path(str(entry['path']) + '.arrow')
+        if not arrow_path.exists() or arrow_path.stat().st_mtime < Path(entry['path']).stat().st_mtime:
+            table = pa_csv.read_csv(entry['path'])
+            tmp = arrow_path.with_name(arrow_path.name + f'.{os.getpid()}.tmp')
+            with pa.OSFile(str(tmp), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp, arrow_path)
+        with pa.memory_map(str(arrow_path), 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
     @staticmethod
     def extract_metadata(filename):
         # pattern = r'(?P<project>[^-]+)-(?P<experiment>[^-]+)-(?P<iteration_name>[^-]+)-(?P<gameID>[a-f0-9\-]+)\.csv'
@@ -27,28 +135,111 @@ class OSFDataHandler:
             return match.groupdict()
         raise ValueError(f"Filename {filename} does not match the expected pattern.")
 
-    def download_csv_file(self, file_url):
-        headers = {
-            'Authorization': f'Bearer {self.ACCESS_TOKEN}'
-        }
-        response = requests.get(file_url, headers=headers, allow_redirects=False)
+    # ─── LOCAL CACHE ───────────────────────────────────────────────────────────
+
+    @property
+    def _index_path(self):
+        return self.cache_dir / 'index.json'
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, filename, version):
+        with self._index_lock:
+            index = self._load_index()
+            index[filename] = version
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._index_path.with_name('index.json.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(index, f, indent=1, sort_keys=True)
+            os.replace(tmp, self._index_path)
+
+    @staticmethod
+    def file_version(file):
+        """The attributes OSF changes whenever a file's contents change."""
+        attrs = file['attributes']
+        hashes = (attrs.get('extra') or {}).get('hashes') or {}
+        return {'modified': attrs.get('date_modified'), 'size': attrs.get('size'), 'sha256': hashes.get('sha256')}
+
+    def cached_path(self, file):
+        """Local copy of `file` if it matches the version OSF reports, else None."""
+        filename = file['attributes']['name']
+        path = self.cache_dir / filename
+        version = self._load_index().get(filename)
+        if version is None or not path.exists() or version != self.file_version(file):
+            return None
+        if version['size'] is not None and path.stat().st_size != version['size']:
+            return None
+        return path
+
+    # ─── DOWNLOADS ─────────────────────────────────────────────────────────────
+
+    def _open_download(self, file_url):
+        # OSF redirects downloads to its storage host; follow it by hand so the
+        # token is sent there too (requests drops it on cross-host redirects)
+        response = self.session.get(file_url, allow_redirects=False, stream=True)
         response.raise_for_status()
-        
         if 'Location' in response.headers:
             redirect_url = response.headers['Location']
-            response = requests.get(redirect_url, headers=headers)
+            response.close()
+            response = self.session.get(redirect_url, stream=True)
             response.raise_for_status()
-        
-        return response.content.decode('utf-8')
+        response.raw.decode_content = True
+        return response
+
+    def download_csv_file(self, file_url):
+        with self._open_download(file_url) as response:
+            return response.content.decode('utf-8')
+
+    def _download(self, file, parse=False):
+        """
+        Stream `file` into the cache, checking its sha256; with parse, the CSV
+        is parsed from the same stream as it is written.
+        """
+        filename = file['attributes']['name']
+        version = self.file_version(file)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f'.{filename}.', dir=self.cache_dir)
+        df = None
+        try:
+            with os.fdopen(fd, 'wb') as sink, self._open_download(file['links']['download']) as response:
+                tee = _TeeReader(response.raw, sink)
+                if parse:
+                    df = pd.read_csv(tee)
+                tee.drain()  # the parser may stop before EOF; keep the cached copy whole
+            if version['sha256'] and tee.sha256.hexdigest() != version['sha256']:
+                raise IOError(f"sha256 mismatch downloading {filename}")
+            os.replace(tmp, self.cache_dir / filename)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._update_index(filename, version)
+        return df
+
+    def load_file(self, file):
+        """DataFrame for one OSF file entry, from the cache when unchanged."""
+        path = self.cached_path(file)
+        if path is not None:
+            return pd.read_csv(path)
+        return self._download(file, parse=True)
+
+    def ensure_cached(self, file):
+        """(path, downloaded) of an up-to-date local copy of `file`; nothing is parsed."""
+        path = self.cached_path(file)
+        if path is not None:
+            return path, False
+        self._download(file)
+        return self.cache_dir / file['attributes']['name'], True
 
     def fetch_node_files(self, provider='osfstorage'):
-        url = f'https://api.osf.io/v2/nodes/{self.node_id}/files/{provider}/'
-        headers = {
-            'Authorization': f'Bearer {self.ACCESS_TOKEN}'
-        }
+        url = f'{self.api_url}/nodes/{self.node_id}/files/{provider}/'
         files = []
         while url:
-            response = requests.get(url, headers=headers)
+            response = self.session.get(url)
             response.raise_for_status()
             data = response.json()
             files.extend(data['data'])
@@ -56,11 +247,8 @@ class OSFDataHandler:
         return files
 
     def get_project_name(self):
-        url = f'https://api.osf.io/v2/nodes/{self.node_id}/'
-        headers = {
-            'Authorization': f'Bearer {self.ACCESS_TOKEN}'
-        }
-        response = requests.get(url, headers=headers)
+        url = f'{self.api_url}/nodes/{self.node_id}/'
+        response = self.session.get(url)
         response.raise_for_status()
         node_data = response.json()
         return node_data['data']['attributes']['title']
@@ -79,13 +267,15 @@ class OSFDataHandler:
     def load_filtered_csvs(self, criteria):
         filtered_files = self.filter_files(criteria)
         project_name = self.get_project_name()
-        
-        for file in filtered_files:
+
+        # Bounded concurrent downloads into the cache; nothing is parsed until
+        # the combined table below reads the selected files once
+        with ThreadPoolExecutor(max_workers=self.max_workers) as ex:
+            results = list(ex.map(self.ensure_cached, filtered_files))
+        for file, (path, _) in zip(filtered_files, results):
             filename = file['attributes']['name']
-            file_url = file['links']['download']
-            csv_content = self.download_csv_file(file_url)
-            df = pd.read_csv(io.StringIO(csv_content))
-            metadata = self.extract_metadata(filename)
-            self.add_dataframe(df, metadata)
-        print(f"Loaded {len(self.dataframes)} CSV files from project '{project_name}' (OSF node {self.node_id}).")
-        return pd.concat([item['dataframe'] for item in self.dataframes]).reset_index(drop=True)
\ No newline at end of file
+            self._register(filename, self.extract_metadata(filename), path=path)
+        downloaded = sum(d for _, d in results)
+        print(f"Loaded {len(filtered_files)} CSV files from project '{project_name}' (OSF node {self.node_id}); "
+              f"{len(filtered_files) - downloaded} from cache, {downloaded} downloaded.")
+        return self.combined(criteria)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Vectorized bootstrap of model predictions for the s1 design inference trials.
+
+The notebook's bootstrap_cooks / bootstrap_dish resample each trial with
+`df.sample(frac=1, replace=True)` + `groupby().mean()` once per replicate. Here
+all resample indices for a trial are drawn as one (n_boot, n_rows) index matrix
+and the per-model means of every replicate come out of a single bincount, so a
+trial costs a few array operations instead of n_boot pandas groupbys.
+
+Draws use the legacy RandomState stream in the same order as the notebook
+(`RandomState.randint(0, n, n)` per replicate, trials in sorted order, cooks then
+dish), so under the same seed the point estimates and percentile CIs match the
+pandas implementation exactly.
+
+Cooks trials can be evaluated for many mixture weights `w` in the same pass.
+"""
+
+from typing import Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+COOKS_MODELS = ("greedy", "bd_bd", "greedy_greedy")
+DISH_RECIPES = ("Salad", "SaladOL")
+
+
+def get_random_state(random_state=None) -> np.random.RandomState:
+    """None -> numpy's global RandomState (what df.sample uses by default); int -> seeded RandomState."""
+    if random_state is None:
+        return np.random.mtrand._rand
+    if isinstance(random_state, np.random.RandomState):
+        return random_state
+    return np.random.RandomState(random_state)
+
+
+def resample_indices(n_rows: int, n_boot: int, rs: np.random.RandomState) -> np.ndarray:
+    """(n_boot, n_rows) row indices; row b equals the b-th `df.sample(frac=1, replace=True)`."""
+    return rs.randint(0, n_rows, size=(n_boot, n_rows))
+
+
+def replicate_means(values: np.ndarray, codes: np.ndarray, n_groups: int, idx: np.ndarray) -> np.ndarray:
+    """
+    Per-group means of `values` for every bootstrap replicate.
+
+    `codes` assigns each row to a group in [0, n_groups). Returns an
+    (n_boot, n_groups) array, NaN where a replicate drew no rows of a group.
+    """
+    n_boot = idx.shape[0]
+    flat = (codes[idx] + n_groups * np.arange(n_boot)[:, None]).ravel()
+    sums = np.bincount(flat, weights=values[idx].ravel(), minlength=n_boot * n_groups)
+    counts = np.bincount(flat, minlength=n_boot * n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return means.reshape(n_boot, n_groups)
+
+
+def _encode(series: pd.Series, levels) -> np.ndarray:
+    """Map labels to their position in `levels`; others become len(levels) (ignored)."""
+    lookup = {l: i for i, l in enumerate(levels)}
+    return series.map(lambda v: lookup.get(v, len(levels))).to_numpy(dtype=np.intp)
+
+
+def _summarize(preds: np.ndarray, valid: np.ndarray, confidence: float) -> dict:
+    """Mean and percentile CI over the valid replicates (last axis)."""
+    alpha = 1 - confidence
+    lower, upper = 100 * (alpha / 2), 100 * (1 - alpha / 2)
+    p = preds[..., valid]
+    return {
+        "model_pred": np.mean(p, axis=-1),
+        "ci_lower": np.percentile(p, lower, axis=-1),
+        "ci_upper": np.percentile(p, upper, axis=-1),
+    }
+
+
+def cooks_replicates(df: pd.DataFrame, n_boot=1000, random_state=None):
+    """
+    Bootstrap replicate means for one cooks trial.
+
+    Returns (means, valid): means is (n_boot, 3) in COOKS_MODELS order and
+    valid marks replicates that drew both bd_bd and greedy_greedy rows, the
+    ones the notebook keeps.
+    """
+    rs = get_random_state(random_state)
+    idx = resample_indices(len(df), n_boot, rs)
+    codes = _encode(df["model_model"], COOKS_MODELS)
+    means = replicate_means(df["timesteps"].to_numpy(dtype=float), codes, len(COOKS_MODELS) + 1, idx)
+    means = means[:, :len(COOKS_MODELS)]
+    valid = ~np.isnan(means[:, 1]) & ~np.isnan(means[:, 2])
+    return means, valid
+
+
+def cooks_predictions(means: np.ndarray, w: Union[float, Iterable[float]]) -> np.ndarray:
+    """greedy / (greedy + w*bd_bd + (1-w)*greedy_greedy) per replicate; (n_w, n_boot) for array `w`."""
+    w = np.asarray(w, dtype=float)[..., None]
+    mix = w * means[:, 1] + (1 - w) * means[:, 2]
+    return means[:, 0] / (means[:, 0] + mix)
+
+
+def bootstrap_cooks(df: pd.DataFrame, w=0.5, n_boot=1000, confidence=0.95, random_state=None):
+    """
+    Bootstrap mixture model for one cooks trial.
+
+    Scalar `w` returns a Series like the notebook's bootstrap_cooks; an array of
+    weights returns a DataFrame with one row per weight, all from the same draws.
+    """
+    means, valid = cooks_replicates(df, n_boot, random_state)
+    preds = cooks_predictions(means, w)
+    stats = _summarize(preds, valid, confidence)
+    if np.ndim(w) == 0:
+        return pd.Series({**{k: float(v) for k, v in stats.items()}, "mixture_weight": w})
+    return pd.DataFrame({**stats, "mixture_weight": np.asarray(w, dtype=float)})
+
+
+def bootstrap_dish(df: pd.DataFrame, a="Salad", b="SaladOL", n_boot=1000, confidence=0.95, random_state=None):
+    """Bootstrap Salad / (Salad + SaladOL) for one dish trial."""
+    rs = get_random_state(random_state)
+    idx = resample_indices(len(df), n_boot, rs)
+    codes = _encode(df["model_recipe"], (a, b))
+    means = replicate_means(df["timesteps"].to_numpy(dtype=float), codes, 3, idx)
+    valid = ~np.isnan(means[:, 0]) & ~np.isnan(means[:, 1])
+    preds = means[:, 0] / (means[:, 0] + means[:, 1])
+    return pd.Series({k: float(v) for k, v in _summarize(preds, valid, confidence).items()})
+
+
+def model_predictions(cooks_model: pd.DataFrame, dish_model: pd.DataFrame, w=0.7, n_boot=1000,
+                      confidence=0.95, random_state: Optional[Union[int, np.random.RandomState]] = None):
+    """
+    Per-trial model predictions for all trials, as the notebook's `model_preds`
+    (before the metadata merge). With an array `w`, cooks trials get one row per weight.
+    """
+    rs = get_random_state(random_state)
+    frames = []
+    for trial, df in cooks_model.groupby("trial", sort=True):
+        res = bootstrap_cooks(df, w=w, n_boot=n_boot, confidence=confidence, random_state=rs)
+        res = res.to_frame().T if isinstance(res, pd.Series) else res
+        frames.append(res.assign(trial=trial))
+    cooks = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    rows = []
+    for trial, df in dish_model.groupby("trial", sort=True):
+        rows.append({"trial": trial, **bootstrap_dish(df, n_boot=n_boot, confidence=confidence, random_state=rs)})
+    dish = pd.DataFrame(rows)
+
+    cols = ["trial", "model_pred", "ci_lower", "ci_upper", "mixture_weight"]
+    return pd.concat([cooks.reindex(columns=cols), dish.reindex(columns=cols[:-1])], ignore_index=True)
@@ -4,10 +4,31 @@ Find optimal start locations for all s1_design_inference trials.
 
 For "cooks" trials: Run 1-agent greedy tests at both candidate locations to determine
 which location should be assigned to agent1 (better performance) vs agent2.
+With --race, all cooks trials are tested concurrently and each stops adding seeds
+once one location is clearly better (see race_decision).
+
+With --surrogate-margin, a cooks trial whose candidates the shortest-path
+surrogate (surrogate.py) separates by at least that many steps is assigned
+without simulating; only the trials it cannot separate are tested.
+
+With --full-grid, placement no longer depends on the auto-placement scan order:
+every open tile is scored by the surrogate, every agent1/agent2 pair by its
+two-agent bound (from the level's cached all-pairs distance index), and only
+the --top-k pairs per cooks trial are simulated, batched on one process pool.
+Each trial's per-tile heatmap is saved under 'start_tile_costs'.
 
 For "dish" trials: Get the single start location from gym-cooking's auto-placement.
 
 Outputs a complete start_locations.json file for all 36 trials with metadata.
+
+Each trial is checkpointed as soon as it is decided: one line, with the level's
+sha256, seed budget, mode and search settings, is appended to
+<output>.checkpoint.jsonl. The output JSON is written (atomically) only once
+every selected trial is done, so an interrupted run never leaves a partial
+file for submit_all.sh to pick up. --resume skips trials whose checkpoint
+still matches, so a preempted job only reruns what it had not finished;
+--trials recomputes just those trials and merges them into the existing output.
+A trial that fails gets no entry (never its old one) and the exit status is 1.
 """
 
 import os
@@ -15,9 +36,18 @@ import sys
 import json
 import csv
 import subprocess
+import math
 import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pathlib import Path
 
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from levels import load_level, candidate_locations, file_sha
+import sim_cache
+
 # Debug: check Python version
 print(f"Running with Python {sys.version}")
 try:
@@ -59,109 +89,80 @@ def get_single_start_location(level_file, model_type="greedy", seed=1):
     return loc1
 
 
-def run_single_agent_test(level_file, start_location, model_type="greedy", seed=1):
+def run_single_agent_test(level_file, start_location, model_type="greedy", seed=1, use_cache=True):
     """
     Run a single 1-agent test with the specified start location.
     Returns the number of timesteps taken to complete the task.
+    Results are reused from the simulation cache when the level contents match.
+    """
+    return run_timesteps_test(level_file, [start_location], [model_type], seed, use_cache)
+
+
+def run_timesteps_test(level_file, start_locations, models, seed=1, use_cache=True):
+    """
+    Run one Salad test with an agent per start location ("x y") and model.
+    Returns the number of timesteps taken to complete the task.
     """
+    num_agents = len(start_locations)
+    key = sim_cache.task_key(level_file, seed, num_agents, models, "Salad", start_locations, kind="timesteps")
+    if use_cache:
+        cached = sim_cache.fetch_value(key)
+        if cached is not None:
+            return cached
+
     output_prefix = f"temp_optimization"
 
     conda_cmd = [
         "conda", "run", "-n", "design-overcooked", "python3",
         "gym-cooking/gym_cooking/main.py",
         "--level", level_file,
-        "--num-agents", "1",
-        "--num-start-locations", "1",
+        "--num-agents", str(num_agents),
+        "--num-start-locations", str(num_agents),
         "--seed", str(seed),
-        "--model1", model_type,
         "--return-timesteps-only",
         "--output-prefix", output_prefix,
         "--recipe", "Salad",
-        "--start-location-model1", start_location
     ]
+    for i, (model, loc) in enumerate(zip(models, start_locations), start=1):
+        conda_cmd += [f"--model{i}", model, f"--start-location-model{i}", loc]
+    where = " / ".join(start_locations)
 
     try:
         project_root = Path(__file__).resolve().parents[3]
         result = subprocess.run(conda_cmd, capture_output=True, text=True, cwd=project_root)
 
         if result.returncode != 0:
-            print(f"Error running test for {level_file} at {start_location}: {result.stderr}")
+            print(f"Error running test for {level_file} at {where}: {result.stderr}")
             return None
 
         # Parse the output to extract timesteps
         for line in result.stdout.split('\n'):
             if line.startswith('TIMESTEPS:'):
                 timesteps = int(line.split(':')[1])
+                if use_cache:
+                    meta = {"level": str(level_file), "seed": seed}
+                    if num_agents == 1:
+                        meta["start_location"] = start_locations[0]
+                    else:
+                        meta["start_locations"] = list(start_locations)
+                    sim_cache.store_value(key, timesteps, meta)
                 return timesteps
 
-        print(f"No timesteps found in output for {level_file} at {start_location}")
+        print(f"No timesteps found in output for {level_file} at {where}")
         return None
 
     except Exception as e:
-        print(f"Exception running test for {level_file} at {start_location}: {e}")
+        print(f"Exception running test for {level_file} at {where}: {e}")
         return None
 
 
 def get_candidate_locations(level_file):
     """
-    Get the two candidate start locations by parsing the level file and using the same
-    scanning logic as gym-cooking's auto_place_agents to find real open spaces.
+    Get the two candidate start locations using the same scanning logic as
+    gym-cooking's auto_place_agents (see levels.candidate_locations).
     """
     try:
-        # Parse the level file to get world dimensions and objects
-        with open(level_file, 'r') as f:
-            lines = f.readlines()
-
-        # Find the end of phase 1 (kitchen map)
-        phase = 1
-        max_x = 0
-        max_y = 0
-        world_objects = {}
-
-        # Parse the level file to extract objects (similar to load_level in overcooked_environment.py)
-        y = 0
-        for line in lines:
-            line = line.strip()
-            if line == '':
-                phase += 1
-                if phase > 1:
-                    break
-                continue
-
-            if phase == 1:
-                max_x = max(max_x, len(line))
-                max_y += 1
-
-                # Parse objects in this line (similar to load_level logic)
-                for x, rep in enumerate(line):
-                    # Object, i.e. Tomato, Lettuce, Onion, or Plate.
-                    if rep in 'tlop':
-                        world_objects[(x, y)] = rep
-                    # Food dispenser: make food dispenser object and food on top as a hack
-                    elif rep in 'TLOP':
-                        world_objects[(x, y)] = rep
-                    # GridSquare, i.e. Floor, Counter, Cutboard, Delivery.
-                    elif rep in '-*/':
-                        world_objects[(x, y)] = rep
-                    # Empty spaces are walkable
-                    else:
-                        world_objects[(x, y)] = ' '
-                y += 1
-
-        # Calculate world dimensions
-        w, h = max_x, max_y
-
-        # Use the same logic as gym-cooking's auto_place_agents to find candidate locations
-        # Start from the same initial positions as the environment
-        top_right_interior = (max(1, w - 2), 1)
-        bottom_left_interior = (1, max(1, h - 2))
-
-        # Use the scanning logic to find actual open spaces
-        a1 = scan_open(world_objects, w, h, top_right_interior, dir_primary=(-1, 0), dir_secondary=(0, 1))
-        a2 = scan_open(world_objects, w, h, bottom_left_interior, dir_primary=(0, -1), dir_secondary=(1, 0))
-        if a2 == a1:
-            a2 = scan_open(world_objects, w, h, (a2[0], a2[1]-1), dir_primary=(0, -1), dir_secondary=(1, 0))
-
+        a1, a2 = candidate_locations(load_level(level_file))
         return f"{a1[0]} {a1[1]}", f"{a2[0]} {a2[1]}"
 
     except Exception as e:
@@ -169,69 +170,31 @@ def get_candidate_locations(level_file):
         return None, None
 
 
-def is_open_start_tile(world_objects, width, height, xy):
-    """Open if it's inside the grid, not collidable, and not a supply/cut/delivery/counter."""
-    x, y = xy
-    if x < 0 or y < 0 or x >= width or y >= height:
-        return False
-
-    # Check if there's an object at this location
-    if (x, y) in world_objects:
-        obj = world_objects[(x, y)]
-        # Objects that are collidable/not walkable
-        if obj in '-*/':  # walls, counters, etc.
-            return False
-        # Objects that are walkable but not good start locations
-        if obj in 'tlopTLOP':  # food items and dispensers
-            return False
-
-    # For empty spaces, they should be walkable
-    return True
-
-
-def scan_open(world_objects, width, height, start_xy, dir_primary, dir_secondary):
+def surrogate_decision(trial_info, margin):
     """
-    Scan within the interior bounding box (exclude outer walls) in the pattern:
-    - Agent 1: move left along the row; when exhausted, move down a row, reset x to right interior.
-    - Agent 2: move up along the column; when exhausted, move right a column, reset y to bottom interior.
+    Assign the candidates by the shortest-path surrogate's single-agent Salad
+    estimate when they differ by at least `margin` steps (or only one can
+    finish). Returns an optimize result, or None when simulation is needed.
     """
-    # interior bounds (exclude border walls)
-    xmin, xmax = 1, max(1, width - 2)
-    ymin, ymax = 1, max(1, height - 2)
-
-    # clamp start into interior
-    x, y = start_xy
-    x = min(max(x, xmin), xmax)
-    y = min(max(y, ymin), ymax)
-
-    visited = set()
-    for _ in range(max(1, (xmax - xmin + 1) * (ymax - ymin + 1))):
-        if (x, y) not in visited and is_open_start_tile(world_objects, width, height, (x, y)):
-            return (x, y)
-        visited.add((x, y))
-
-        # step primary
-        x += dir_primary[0]
-        y += dir_primary[1]
-
-        # if moved out of interior, wrap & step secondary
-        if not (xmin <= x <= xmax and ymin <= y <= ymax):
-            # undo last step
-            x -= dir_primary[0]
-            y -= dir_primary[1]
-            # step secondary
-            x += dir_secondary[0]
-            y += dir_secondary[1]
-            # reset along primary axis to appropriate interior edge
-            if dir_primary[0] != 0:  # horizontal primary (agent 1)
-                x = xmax if dir_primary[0] < 0 else xmin
-            if dir_primary[1] != 0:  # vertical primary (agent 2)
-                y = ymax if dir_primary[1] < 0 else ymin
-            # clamp
-            x = min(max(x, xmin), xmax)
-            y = min(max(y, ymin), ymax)
-    # As a last resort, return top-left interior
-    return (xmin, ymin)
+    import surrogate
+    level = load_level(trial_info['layout_abspath'])
+    g = surrogate.graph_for(level)
+    loc1, loc2 = candidate_locations(level)
+    t1, t2 = surrogate.single(g, "Salad", loc1), surrogate.single(g, "Salad", loc2)
+    if not abs(t1 - t2) >= margin:  # also False when neither can finish (inf - inf)
+        return None
+    if t2 < t1:
+        loc1, loc2, t1, t2 = loc2, loc1, t2, t1
+    return {
+        'agent1_location': f"{loc1[0]} {loc1[1]}",
+        'agent2_location': f"{loc2[0]} {loc2[1]}",
+        'optimization_data': {
+            'decided_by': 'surrogate',
+            'surrogate_steps_agent1': t1 if math.isfinite(t1) else None,
+            'surrogate_steps_agent2': t2 if math.isfinite(t2) else None,
+            'seeds_used': 0
+        }
+    }
 
 
 def optimize_cooks_trial(trial_info, num_seeds=3):
@@ -277,6 +240,17 @@ def optimize_cooks_trial(trial_info, num_seeds=3):
 
     print(f"  Average times: {loc1}={avg_time1:.1f}, {loc2}={avg_time2:.1f}")
 
+    return assign_locations(loc1, loc2, loc1_seed_data, loc2_seed_data, seeds_used=num_seeds)
+
+
+def assign_locations(loc1, loc2, loc1_seed_data, loc2_seed_data, seeds_used, **extra):
+    """
+    Assign the location with the lower average time to agent1 and the other to agent2.
+    Any `extra` keys are added to the optimization data.
+    """
+    avg_time1 = sum(d['timesteps'] for d in loc1_seed_data) / len(loc1_seed_data)
+    avg_time2 = sum(d['timesteps'] for d in loc2_seed_data) / len(loc2_seed_data)
+
     # Assign better location to agent1, worse to agent2
     if avg_time1 <= avg_time2:
         agent1_loc, agent2_loc = loc1, loc2
@@ -292,11 +266,281 @@ def optimize_cooks_trial(trial_info, num_seeds=3):
             'agent1_seed_data': agent1_data,
             'agent2_seed_data': agent2_data,
             'avg_time_agent1': sum(time['timesteps'] for time in agent1_data) / len(agent1_data),
-            'avg_time_agent2': sum(time['timesteps'] for time in agent2_data) / len(agent2_data)
+            'avg_time_agent2': sum(time['timesteps'] for time in agent2_data) / len(agent2_data),
+            'seeds_used': seeds_used,
+            **extra
         }
     }
 
 
+def _betacf(a, b, x, iters=200, eps=1e-14):
+    """Continued fraction of the regularized incomplete beta function (Numerical Recipes betacf)."""
+    qab, qap, qam = a + b, a + 1.0, a - 1.0
+    c, d = 1.0, 1.0 - qab * x / qap
+    d = 1.0 / (d if abs(d) > 1e-300 else 1e-300)
+    h = d
+    for m in range(1, iters + 1):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((qam + m2) * (a + m2)), -(a + m) * (qab + m) * x / ((a + m2) * (qap + m2))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > 1e-300 else 1e-300)
+            c = 1.0 + aa / c
+            c = c if abs(c) > 1e-300 else 1e-300
+            h *= d * c
+        if abs(d * c - 1.0) < eps:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0 or x >= 1.0:
+        return max(0.0, min(1.0, x))
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def t_quantile(p, df):
+    """Student-t quantile for p in (0.5, 1), by bisection on the CDF (no scipy in the environment)."""
+    def upper_tail(t):
+        return 0.5 * _betainc(df / 2.0, 0.5, df / (df + t * t))
+    lo, hi = 0.0, 1.0
+    while upper_tail(hi) > 1 - p:
+        lo, hi = hi, hi * 2
+    for _ in range(200):
+        mid = (lo + hi) / 2
+        if upper_tail(mid) > 1 - p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def race_decision(diffs, max_seeds, confidence=0.95, min_seeds=5):
+    """
+    Sequential test on paired per-seed differences (time at loc1 - time at loc2).
+
+    Returns 'separated' once a Student-t CI (df = n - 1) on the mean difference
+    excludes zero, 'tied' if the differences show no variation and average
+    zero, 'budget' when `max_seeds` is reached, and None to keep sampling. The
+    CI is Bonferroni corrected over the `max_seeds` possible looks so that
+    peeking after every seed keeps the overall error rate at 1 - confidence.
+    Nothing is decided before `min_seeds` (at least 2) seeds, so a handful of
+    identical differences cannot pass for a zero-width interval.
+    """
+    n = len(diffs)
+    if n >= max(2, min_seeds):
+        mean = sum(diffs) / n
+        sd = statistics.stdev(diffs)
+        alpha = (1 - confidence) / max(1, max_seeds)
+        half_width = t_quantile(1 - alpha / 2, n - 1) * sd / math.sqrt(n)
+        if abs(mean) > half_width:
+            return 'separated'
+        if sd == 0:
+            return 'tied'
+    if n >= max_seeds:
+        return 'budget'
+    return None
+
+
+def race_cooks_trials(trials, max_seeds=10, confidence=0.95, min_seeds=5, jobs=None, on_result=None):
+    """
+    Racing mode for all cooks trials at once.
+
+    Every (trial, candidate, seed) test runs on a shared process pool. Each trial
+    keeps adding seeds until race_decision() stops it, so clear-cut trials use
+    only `min_seeds` seeds. Returns {trial_id: optimize result or None}, and
+    calls on_result(trial_id, result) as each trial is decided.
+    """
+    state = {}
+    for trial in trials:
+        loc1, loc2 = get_candidate_locations(trial['layout_abspath'])
+        print(f"Racing {trial['trial_id']} with candidate locations: {loc1}, {loc2}")
+        state[trial['trial_id']] = {
+            'trial': trial, 'locs': (loc1, loc2), 'next_seed': 1,
+            'times': {}, 'pending': 0, 'done': loc1 is None
+        }
+
+    results = {tid: None for tid in state}
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = {}
+
+        def submit_seed(tid):
+            st = state[tid]
+            seed = st['next_seed']
+            st['next_seed'] += 1
+            for i, loc in enumerate(st['locs']):
+                fu = ex.submit(run_single_agent_test, st['trial']['layout_abspath'], loc, "greedy", seed)
+                futures[fu] = (tid, seed, i)
+                st['pending'] += 1
+
+        for tid, st in state.items():
+            if not st['done']:
+                for _ in range(min(min_seeds, max_seeds)):
+                    submit_seed(tid)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for fu in done:
+                tid, seed, i = futures.pop(fu)
+                st = state[tid]
+                st['pending'] -= 1
+                st['times'].setdefault(seed, [None, None])[i] = fu.result()
+                if st['pending']:
+                    continue
+
+                # All submitted seeds are back: decide whether this trial needs more
+                seeds = sorted(st['times'])
+                diffs = [st['times'][s][0] - st['times'][s][1] for s in seeds
+                         if None not in st['times'][s]]
+                decision = race_decision(diffs, max_seeds, confidence, min_seeds)
+                if decision is None and st['next_seed'] <= max_seeds:
+                    submit_seed(tid)
+                    continue
+
+                loc1, loc2 = st['locs']
+                loc1_seed_data = [{"seed": s, "timesteps": st['times'][s][0]} for s in seeds
+                                  if st['times'][s][0] is not None]
+                loc2_seed_data = [{"seed": s, "timesteps": st['times'][s][1]} for s in seeds
+                                  if st['times'][s][1] is not None]
+                if not loc1_seed_data or not loc2_seed_data:
+                    print(f"Failed to get valid results for {tid}")
+                    continue
+                print(f"  {tid}: {decision or 'budget'} after {len(seeds)} seed(s)")
+                results[tid] = assign_locations(loc1, loc2, loc1_seed_data, loc2_seed_data,
+                                                seeds_used=len(seeds), race_decision=decision or 'budget')
+                if on_result is not None:
+                    on_result(tid, results[tid])
+    return results
+
+
+def tile_cost_grid(g, costs):
+    """Per-tile costs as rows of the level grid: null on non-walkable tiles and where the recipe cannot finish."""
+    grid = [[None] * g.level.width for _ in range(g.level.height)]
+    for (x, y), c in zip(g.coords, costs):
+        if math.isfinite(c):
+            grid[y][x] = round(float(c), 1)
+    return grid
+
+
+def start_tile_costs(level_file, recipes=("Salad",)):
+    """{recipe: heatmap} of the surrogate's single-agent steps from every open tile."""
+    import surrogate
+    g = surrogate.graph_for(load_level(level_file))
+    return {recipe: tile_cost_grid(g, surrogate.single_all(g, recipe)) for recipe in recipes}
+
+
+def rank_pairs(g, solo, pair_costs, top_k):
+    """
+    The `top_k` unordered tile pairs with the lowest two-agent surrogate bound
+    (ties: faster solo tile), each oriented so agent1 is the faster solo tile.
+    """
+    n = len(g.coords)
+    i, j = np.triu_indices(n, k=1)
+    cost = pair_costs[i, j]
+    keep = np.isfinite(cost)
+    i, j, cost = i[keep], j[keep], cost[keep]
+    first = np.where(solo[i] <= solo[j], i, j)
+    second = np.where(solo[i] <= solo[j], j, i)
+    order = np.lexsort((solo[first], cost))[:top_k]
+    return [(int(first[k]), int(second[k]), float(cost[k])) for k in order], int(keep.sum())
+
+
+def full_grid_result(plan, times, model, num_seeds):
+    """
+    Assign a full-grid trial's simulated pair with the fewest mean timesteps;
+    None if no pair is feasible or no simulation of any pair succeeded.
+    """
+    tid = plan['trial']['trial_id']
+    evaluated = []
+    for p, (loc1, loc2, cost) in enumerate(plan['pairs']):
+        seed_data = sorted(times.get((tid, p), []), key=lambda d: d['seed'])
+        avg = sum(d['timesteps'] for d in seed_data) / len(seed_data) if seed_data else None
+        evaluated.append({'agent1_location': loc1, 'agent2_location': loc2, 'surrogate_steps': cost,
+                          'seed_data': seed_data, 'avg_time': avg})
+    simulated = [e for e in evaluated if e['avg_time'] is not None]
+    if not evaluated:
+        print(f"No feasible start pair for {tid}")
+        return None
+    if not simulated:
+        # a surrogate ranking alone is not a decision; leave the trial for a rerun
+        print(f"No successful simulation of any start pair for {tid}")
+        return None
+    best = min(simulated, key=lambda e: e['avg_time'])
+    return {
+        'agent1_location': best['agent1_location'],
+        'agent2_location': best['agent2_location'],
+        'optimization_data': {
+            'mode': 'full-grid',
+            'model': model,
+            'tiles_evaluated': plan['n_tiles'],
+            'pairs_evaluated': plan['n_pairs'],
+            'top_pairs': evaluated,
+            'seeds_used': num_seeds
+        },
+        'start_tile_costs': plan['grids']
+    }
+
+
+def full_grid_cooks_trials(trials, top_k=3, num_seeds=3, jobs=None, model="greedy", on_result=None):
+    """
+    Full-grid mode for all cooks trials at once.
+
+    Every open tile is scored by the surrogate's single-agent estimate and every
+    agent1/agent2 pair by its two-agent bound, all from the level's cached
+    all-pairs distance index. Only the `top_k` pairs per trial are simulated
+    (2-agent `model`, `num_seeds` seeds), on one shared process pool, and the
+    pair with the fewest mean timesteps is assigned. Returns {trial_id: optimize
+    result or None}, with each trial's per-tile heatmaps (single-agent steps, and
+    the best two-agent bound with agent1 on the tile) under 'start_tile_costs', and
+    calls on_result(trial_id, result) as soon as a trial's last simulation is back.
+    """
+    import surrogate
+    plans = {}
+    for trial in trials:
+        g = surrogate.graph_for(load_level(trial['layout_abspath']))
+        solo = surrogate.single_all(g, "Salad")
+        pair_costs = surrogate.two_agent_all(g, "Salad")
+        pairs, n_pairs = rank_pairs(g, solo, pair_costs, top_k)
+        locs = [(f"{g.coords[a][0]} {g.coords[a][1]}", f"{g.coords[b][0]} {g.coords[b][1]}", c) for a, b, c in pairs]
+        print(f"Full grid {trial['trial_id']}: {len(g.coords)} tiles, {n_pairs} feasible pairs, "
+              f"simulating {len(locs)}: {', '.join(f'({l1} / {l2})' for l1, l2, _ in locs)}")
+        grids = {'Salad': tile_cost_grid(g, solo),
+                 # best two-agent bound with agent1 on the tile
+                 'Salad_two_agent': tile_cost_grid(g, pair_costs.min(axis=1))}
+        plans[trial['trial_id']] = {'trial': trial, 'grids': grids, 'pairs': locs,
+                                    'n_tiles': len(g.coords), 'n_pairs': n_pairs}
+
+    times = {}
+    results = {}
+    pending = {tid: len(plan['pairs']) * num_seeds for tid, plan in plans.items()}
+
+    def finish(tid):
+        results[tid] = full_grid_result(plans[tid], times, model, num_seeds)
+        if results[tid] is not None and on_result is not None:
+            on_result(tid, results[tid])
+
+    with ProcessPoolExecutor(max_workers=jobs) as ex:
+        futures = {}
+        for tid, plan in plans.items():
+            if not pending[tid]:
+                finish(tid)
+            for p, (loc1, loc2, _) in enumerate(plan['pairs']):
+                for seed in range(1, num_seeds + 1):
+                    fu = ex.submit(run_timesteps_test, plan['trial']['layout_abspath'], [loc1, loc2], [model, model], seed)
+                    futures[fu] = (tid, p, seed)
+        for fu in as_completed(futures):
+            tid, p, seed = futures[fu]
+            if fu.result() is not None:
+                times.setdefault((tid, p), []).append({"seed": seed, "timesteps": fu.result()})
+            pending[tid] -= 1
+            if not pending[tid]:
+                finish(tid)
+    return results
+
+
 def process_dish_trial(trial_info):
     """
     Process a "dish" trial by getting the single start location.
@@ -319,6 +563,74 @@ def process_dish_trial(trial_info):
     }
 
 
+def checkpoint_path(output):
+    """The append-only per-trial log kept next to the output JSON."""
+    return output.with_name(output.stem + ".checkpoint.jsonl")
+
+
+def load_checkpoint(path):
+    """trial_id -> its latest checkpoint entry; a line torn by a crash mid-write is ignored."""
+    entries = {}
+    if not path.exists():
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            entries[entry['trial_id']] = entry
+    return entries
+
+
+def append_checkpoint(path, entry):
+    """Append one trial's line with a single fsynced write, starting a fresh line after a torn one."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'ab') as f:
+        line = json.dumps(entry).encode() + b"\n"
+        if f.tell() > 0:
+            with open(path, 'rb') as r:
+                r.seek(-1, os.SEEK_END)
+                if r.read(1) != b"\n":
+                    line = b"\n" + line
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def read_results(path):
+    """trial_id -> entry of an existing start_locations.json (empty if missing or unreadable)."""
+    try:
+        with open(path) as f:
+            return {item['trial_id']: item for item in json.load(f)}
+    except (OSError, ValueError):
+        return {}
+
+
+def write_results(path, results):
+    """Replace the output JSON atomically, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, 'w') as f:
+        json.dump(results, f, indent=2)
+    os.replace(tmp, path)
+
+
+def merge_results(trials, existing, done, selected):
+    """
+    Entries in metadata order: this run's results, plus the existing file's
+    entries for trials outside `selected`. A selected trial that was not decided
+    (for its current level and settings) gets no entry rather than a stale one.
+    """
+    merged = []
+    for trial in trials:
+        tid = trial['trial_id']
+        entry = done.get(tid) if tid in selected else existing.get(tid)
+        if entry is not None:
+            merged.append(entry)
+    return merged
+
+
 def main():
     parser = argparse.ArgumentParser(description="Find optimal start locations for all s1_design_inference trials")
     parser.add_argument("--metadata", type=Path,
@@ -334,6 +646,26 @@ def main():
                        help="Number of seeds for optimization testing")
     parser.add_argument("--dry-run", action="store_true",
                        help="Print what would be done without running tests")
+    parser.add_argument("--race", action="store_true",
+                       help="Evaluate all cooks trials concurrently and stop adding seeds once one location is clearly better")
+    parser.add_argument("--max-seeds", type=int, default=10,
+                       help="Seed budget per cooks trial in --race mode")
+    parser.add_argument("--confidence", type=float, default=0.95,
+                       help="Confidence level of the sequential test in --race mode")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                       help="Worker processes in --race mode")
+    parser.add_argument("--full-grid", action="store_true",
+                       help="Score every open tile and start pair with the surrogate; simulate only the top pairs")
+    parser.add_argument("--top-k", type=int, default=3,
+                       help="Start pairs simulated per cooks trial in --full-grid mode")
+    parser.add_argument("--pair-model", default="greedy",
+                       help="Model both agents use when simulating pairs in --full-grid mode")
+    parser.add_argument("--surrogate-margin", type=float, default=None,
+                       help="Skip simulating cooks trials whose candidates the surrogate separates by this many steps")
+    parser.add_argument("--resume", action="store_true",
+                       help="Skip trials the checkpoint already decided for the same level contents and seed count")
+    parser.add_argument("--trials", nargs="+", default=None,
+                       help="Only recompute these trial ids, merging them into the existing output")
 
     args = parser.parse_args()
 
@@ -348,30 +680,108 @@ def main():
             return 1
         trial['layout_abspath'] = str(layout_file)
 
-    # Process all trials
-    results = []
+    selected = trials
+    if args.trials:
+        unknown = sorted(set(args.trials) - {t['trial_id'] for t in trials})
+        if unknown:
+            print(f"Error: Unknown trial id(s): {', '.join(unknown)}")
+            return 1
+        selected = [t for t in trials if t['trial_id'] in set(args.trials)]
+
+    # A trial is decided for its level contents, seed budget and search settings;
+    # --resume reuses checkpointed results only when all of them still match
+    mode = 'full-grid' if args.full_grid else 'race' if args.race else 'fixed'
+    for trial in selected:
+        key = {'level_sha': file_sha(trial['layout_abspath']),
+               'seeds': args.max_seeds if mode == 'race' else args.seeds,
+               'mode': mode}
+        if trial['trial_type'] == 'cooks':
+            key['surrogate_margin'] = args.surrogate_margin
+            if mode == 'race':
+                key['confidence'] = args.confidence
+            elif mode == 'full-grid':
+                key.update(top_k=args.top_k, pair_model=args.pair_model)
+        trial['checkpoint_key'] = key
+
+    checkpoint = checkpoint_path(args.output)
+    done = {}
+    if args.resume:
+        previous = load_checkpoint(checkpoint)
+        for trial in selected:
+            entry = previous.get(trial['trial_id'])
+            if entry and all(entry.get(k) == v for k, v in trial['checkpoint_key'].items()):
+                done[trial['trial_id']] = entry['result']
+        print(f"Resuming: {len(done)} of {len(selected)} trial(s) already decided in {checkpoint}")
+    todo = [t for t in selected if t['trial_id'] not in done]
+
+    # Trials outside this run keep their entries from the existing output
+    existing = read_results(args.output) if args.trials else {}
+
+    def record(trial, res):
+        """Checkpoint one finished trial; the output JSON is only written once every trial is done."""
+        result = {
+            'trial_id': trial['trial_id'],
+            'trial_type': trial['trial_type'],
+            'layout_path': f"stimuli/s1_design_inference/txt/{trial['trial_id']}.txt"
+        }
+        result.update(res)
+        done[trial['trial_id']] = result
+        append_checkpoint(checkpoint, {'trial_id': trial['trial_id'], **trial['checkpoint_key'], 'result': result})
+        print(f"  Completed {trial['trial_id']}")
 
-    for trial in trials:
+    # Trials the surrogate separates clearly never reach the simulator
+    decided = {}
+    if args.surrogate_margin is not None:
+        for trial in todo:
+            if trial['trial_type'] == 'cooks':
+                res = surrogate_decision(trial, args.surrogate_margin)
+                if res is not None:
+                    decided[trial['trial_id']] = res
+        print(f"Surrogate assigned {len(decided)} cooks trial(s) without simulation")
+
+    by_id = {t['trial_id']: t for t in todo}
+
+    # Full-grid mode scores every tile and pair, then simulates the top pairs on one
+    # pool, checkpointing each trial as soon as its pairs are all back
+    full = {}
+    if args.full_grid and not args.dry_run:
+        full = full_grid_cooks_trials([t for t in todo if t['trial_type'] == 'cooks' and t['trial_id'] not in decided],
+                                      top_k=args.top_k, num_seeds=args.seeds, jobs=args.jobs, model=args.pair_model,
+                                      on_result=lambda tid, res: record(by_id[tid], res))
+
+    # In racing mode, all cooks trials are decided up front on one process pool,
+    # each checkpointed as soon as its race stops
+    raced = {}
+    if args.race and not args.full_grid and not args.dry_run:
+        raced = race_cooks_trials([t for t in todo if t['trial_type'] == 'cooks' and t['trial_id'] not in decided],
+                                  max_seeds=args.max_seeds, confidence=args.confidence, jobs=args.jobs,
+                                  on_result=lambda tid, res: record(by_id[tid], res))
+
+    # Process the remaining trials
+    for trial in todo:
+        if trial['trial_id'] in done:
+            continue
         print(f"\nProcessing {trial['trial_id']} ({trial['trial_type']})...")
 
         if args.dry_run:
             print(f"  [DRY RUN] Would process {trial['trial_id']}")
             continue
 
-        # Base result structure (use relative path for portability)
-        result = {
-            'trial_id': trial['trial_id'],
-            'trial_type': trial['trial_type'],
-            'layout_path': f"stimuli/s1_design_inference/txt/{trial['trial_id']}.txt"
-        }
-
         if trial['trial_type'] == 'cooks':
             # Optimize start locations for cooks trials
-            opt_result = optimize_cooks_trial(trial, args.seeds)
+            if trial['trial_id'] in decided:
+                opt_result = decided[trial['trial_id']]
+                print(f"  Surrogate: agent1 {opt_result['agent1_location']}, agent2 {opt_result['agent2_location']}")
+            elif args.full_grid:
+                opt_result = full.get(trial['trial_id'])
+            elif args.race:
+                opt_result = raced.get(trial['trial_id'])
+            else:
+                opt_result = optimize_cooks_trial(trial, args.seeds)
             if opt_result is None:
                 print(f"Failed to optimize {trial['trial_id']}, skipping...")
                 continue
-            result.update(opt_result)
+            record(trial, opt_result)
 
         elif trial['trial_type'] == 'dish':
             # Get single start location for dish trials
@@ -379,27 +789,31 @@ def main():
             if dish_result is None:
                 print(f"Failed to process {trial['trial_id']}, skipping...")
                 continue
-            result.update(dish_result)
+            if args.full_grid:
+                dish_result['start_tile_costs'] = start_tile_costs(trial['layout_abspath'], ("Salad", "SaladOL"))
+            record(trial, dish_result)
 
         else:
             print(f"Unknown trial type '{trial['trial_type']}' for {trial['trial_id']}")
             continue
 
-        results.append(result)
-        print(f"  Completed {trial['trial_id']}")
-
     if args.dry_run:
-        print(f"\n[DRY RUN] Would write {len(results)} results to {args.output}")
+        print(f"\n[DRY RUN] Would process {len(todo)} trial(s) and merge them into {args.output}")
         return 0
 
-    # Write results to JSON
-    args.output.parent.mkdir(parents=True, exist_ok=True)
-
-    with open(args.output, 'w') as f:
-        json.dump(results, f, indent=2)
-
-    print(f"\nCompleted! Processed {len(results)} trials.")
-    print(f"Results saved to: {args.output}")
+    # Written once, now that every selected trial is decided (or failed): an
+    # interrupted run leaves its progress only in the checkpoint
+    results = merge_results(trials, existing, done, {t['trial_id'] for t in selected})
+    write_results(args.output, results)
+
+    failed = [t['trial_id'] for t in todo if t['trial_id'] not in done]
+    print(f"\nCompleted! Processed {len(todo) - len(failed)} trials "
+          f"({len(selected) - len(todo)} resumed, {len(failed)} failed).")
+    print(f"Results saved to: {args.output} ({len(results)} trials)")
+    if failed:
+        print(f"Error: no start locations for {', '.join(failed)}; "
+              f"fix and rerun with --resume (decided trials are checkpointed)")
+        return 1
 
     return 0
 
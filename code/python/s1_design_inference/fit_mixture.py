@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Fit the cooks-trial mixture weight w to participants' slider responses.
+
+A cooks trial's model prediction is greedy / (greedy + w*bd_bd + (1-w)*greedy_greedy)
+on mean timesteps (bootstrap.cooks_predictions); the notebook fixes w = 0.7.
+Here w is fitted by least squares against the mean slider response per trial
+(rescaled to 0..1, 1 = "made for two cooks").
+
+Everything that does not depend on w is computed once: the per-trial model means,
+each trial's bootstrap replicate means (bootstrap.cooks_replicates, the same
+draws the notebook's bootstrap uses) and participant-resampled slider means. The
+loss over the whole w grid, for the point estimate and every replicate, is then
+one broadcast array expression per block of weights, and each replicate's best
+w gives the percentile CI.
+
+Slider data is read from trial_data.csv exports (data/behavioral_results/...):
+the trial is the first trial_NN found in the trial column (the first candidate
+column whose values contain one: a trial id or stimulus path) and the slider
+column holds the 0..100 response (a number, or jsPsych's {"intent_agents": v}
+response JSON; other responses, such as survey answers, are skipped).
+
+CLI:
+  fit_mixture.py --trial-data trial_data.csv [...] [--model-results model_results.csv]
+                 [--grid 1001] [--n-boot 1000] [--seed 0] [--output fit.json]
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import bootstrap
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+MODEL_RESULTS_CSV = ROOT / "data" / "models" / EXPERIMENT / "model_results.csv"
+TRIAL_DATA_GLOB = str(ROOT / "data" / "behavioral_results" / EXPERIMENT / "*" / "trial_data.csv")
+
+TRIAL_COLUMNS = ("trial", "trial_id", "stimulus", "trial_stim", "preamble")
+TRIAL_PATTERN = r"(trial_\d+)"
+SLIDER_COLUMNS = ("intent_agents", "slider_value", "slider_num_agents", "response")
+PARTICIPANT_COLUMNS = ("game_id", "gameID", "participant", "subject_id")
+SLIDER_MAX = 100.0
+W_BLOCK = 64  # weights evaluated per broadcast, to bound the (w, trial, replicate) temporary
+
+
+# ─── SLIDER DATA ───────────────────────────────────────────────────────────────
+
+def _pick(df: pd.DataFrame, name: Optional[str], candidates: Sequence[str], what: str) -> str:
+    if name:
+        return name
+    for c in candidates:
+        if c in df.columns:
+            return c
+    raise KeyError(f"no {what} column (tried {', '.join(candidates)}); pass it explicitly")
+
+
+def _trial_column(df: pd.DataFrame, name: Optional[str]) -> str:
+    """The first candidate column whose values actually name a trial_NN (a trial_id may be a UUID)."""
+    if name:
+        return name
+    for c in TRIAL_COLUMNS:
+        if c in df.columns and df[c].astype(str).str.extract(TRIAL_PATTERN, expand=False).notna().any():
+            return c
+    raise KeyError(f"no trial column with trial_NN values (tried {', '.join(TRIAL_COLUMNS)}); pass it explicitly")
+
+
+def _slider_value(v) -> float:
+    """The 0..100 response: a number, or the intent_agents of a response JSON; NaN for anything else."""
+    if isinstance(v, str) and v.strip().startswith("{"):
+        try:
+            v = json.loads(v).get("intent_agents")
+        except (ValueError, AttributeError):
+            return np.nan
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_slider_responses(paths: Sequence, trial_col: Optional[str] = None, slider_col: Optional[str] = None,
+                          participant_col: Optional[str] = None) -> pd.DataFrame:
+    """One row per response: participant, trial ('trial_NN') and slider (0..1)."""
+    frames = []
+    for p in paths:
+        df = pd.read_csv(p)
+        tcol = _trial_column(df, trial_col)
+        scol = _pick(df, slider_col, SLIDER_COLUMNS, "slider")
+        try:
+            pcol = _pick(df, participant_col, PARTICIPANT_COLUMNS, "participant")
+            participant = df[pcol].astype(str)
+        except KeyError:
+            participant = pd.Series([f"{p}:{i}" for i in range(len(df))], index=df.index)
+        trial = df[tcol].astype(str).str.extract(TRIAL_PATTERN, expand=False)
+        frames.append(pd.DataFrame({"participant": participant, "trial": trial,
+                                    "slider": df[scol].map(_slider_value) / SLIDER_MAX}))
+    out = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["participant", "trial", "slider"])
+    return out.dropna(subset=["trial", "slider"]).reset_index(drop=True)
+
+
+def human_means(responses: pd.DataFrame, trials: Sequence[str], n_boot: int,
+                rs: np.random.RandomState) -> tuple:
+    """
+    Observed (n_trials,) mean slider per trial and (n_trials, n_boot) means over
+    participant-resampled data (NaN where a resample has no response for a trial).
+    """
+    table = responses.pivot_table(index="participant", columns="trial", values="slider", aggfunc="mean")
+    table = table.reindex(columns=list(trials))
+    values = table.to_numpy(dtype=float)                   # (participants, trials)
+    answered = ~np.isnan(values)
+    values = np.where(answered, values, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed = values.sum(0) / answered.sum(0)
+        idx = rs.randint(0, len(values), size=(n_boot, len(values)))
+        boot = values[idx].sum(1) / answered[idx].sum(1)   # (n_boot, trials)
+    return observed, boot.T
+
+
+# ─── FIT ───────────────────────────────────────────────────────────────────────
+
+def model_replicates(cooks_model: pd.DataFrame, n_boot: int, rs: np.random.RandomState) -> tuple:
+    """
+    Trials in sorted order, observed per-model means (n_trials, 3) in
+    bootstrap.COOKS_MODELS order, and replicate means (n_trials, n_boot, 3) with
+    invalid replicates (no bd_bd or greedy_greedy rows drawn) set to NaN.
+    """
+    trials, observed, reps = [], [], []
+    for trial, df in cooks_model.groupby("trial", sort=True):
+        means = df.groupby("model_model").timesteps.mean()
+        observed.append([means.get(m, np.nan) for m in bootstrap.COOKS_MODELS])
+        m, valid = bootstrap.cooks_replicates(df, n_boot, rs)
+        m[~valid] = np.nan
+        reps.append(m)
+        trials.append(trial)
+    return trials, np.array(observed, dtype=float), np.array(reps, dtype=float).reshape(len(trials), n_boot, 3)
+
+
+def loss_grid(means: np.ndarray, target: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """
+    Mean squared error over trials for every weight in `grid`.
+
+    means is (n_trials, ..., 3), target (n_trials, ...); returns (len(grid), ...).
+    Trials with a NaN prediction or target are left out of that column's mean.
+    """
+    greedy, bd, gg = means[..., 0], means[..., 1], means[..., 2]
+    out = np.empty((len(grid),) + target.shape[1:])
+    for i in range(0, len(grid), W_BLOCK):
+        w = grid[i:i + W_BLOCK].reshape((-1,) + (1,) * target.ndim)
+        err = greedy / (greedy + w * bd + (1 - w) * gg) - target
+        sq = np.where(np.isnan(err), 0.0, err * err)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[i:i + W_BLOCK] = sq.sum(1) / (~np.isnan(err)).sum(1)
+    return out
+
+
+def fit(cooks_model: pd.DataFrame, responses: pd.DataFrame, grid_size: int = 1001, n_boot: int = 1000,
+        confidence: float = 0.95, random_state=0) -> dict:
+    """
+    Best-fit w on a `grid_size` grid over [0, 1], its bootstrap percentile CI and
+    per-trial residuals (human mean - model prediction at the best w).
+    """
+    rs = bootstrap.get_random_state(random_state)
+    grid = np.linspace(0.0, 1.0, grid_size)
+    trials, observed, reps = model_replicates(cooks_model, n_boot, rs)
+    human, human_boot = human_means(responses, trials, n_boot, rs)
+    if np.isnan(human).all():
+        raise ValueError("no slider responses for any cooks trial in the model results")
+
+    loss = loss_grid(observed, human, grid)
+    best = grid[np.nanargmin(loss)]
+    boot_loss = loss_grid(reps, human_boot, grid)          # (n_w, n_boot)
+    ok = ~np.isnan(boot_loss).all(0)
+    boot_w = grid[np.nanargmin(boot_loss[:, ok], axis=0)]
+    alpha = 1 - confidence
+    lo, hi = np.percentile(boot_w, [100 * alpha / 2, 100 * (1 - alpha / 2)]) if len(boot_w) else (np.nan, np.nan)
+
+    pred = bootstrap.cooks_predictions(observed, best)
+    n = responses.groupby("trial").size()
+    residuals = pd.DataFrame({"trial": trials, "human_mean": human, "model_pred": pred,
+                              "residual": human - pred, "n_responses": [int(n.get(t, 0)) for t in trials]})
+    return {"w": float(best), "ci_lower": float(lo), "ci_upper": float(hi), "confidence": confidence,
+            "mse": float(np.nanmin(loss)), "n_boot": int(ok.sum()), "grid": grid, "loss": loss,
+            "boot_w": boot_w, "residuals": residuals}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fit the cooks mixture weight w to slider responses")
+    ap.add_argument("--trial-data", nargs="+", default=None,
+                    help=f"trial_data.csv file(s) (default: {os.path.relpath(TRIAL_DATA_GLOB, ROOT)})")
+    ap.add_argument("--trial-col", default=None)
+    ap.add_argument("--slider-col", default=None)
+    ap.add_argument("--participant-col", default=None)
+    ap.add_argument("--model-results", type=Path, default=MODEL_RESULTS_CSV)
+    ap.add_argument("--grid", type=int, default=1001, help="Number of w values on [0, 1]")
+    ap.add_argument("--n-boot", type=int, default=1000)
+    ap.add_argument("--confidence", type=float, default=0.95)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--output", type=Path, default=None, help="Write the fit as JSON (residuals as .csv next to it)")
+    args = ap.parse_args()
+
+    paths: List[str] = args.trial_data or sorted(glob.glob(TRIAL_DATA_GLOB))
+    if not paths:
+        print(f"No trial data found ({TRIAL_DATA_GLOB})", file=sys.stderr)
+        return 1
+    responses = load_slider_responses(paths, args.trial_col, args.slider_col, args.participant_col)
+    model = pd.read_csv(args.model_results)
+    res = fit(model[model.trial_type == "cooks"], responses, args.grid, args.n_boot, args.confidence, args.seed)
+
+    print(f"{len(responses)} response(s) from {responses.participant.nunique()} participant(s)")
+    print(f"w = {res['w']:.3f}  {100 * res['confidence']:.0f}% CI [{res['ci_lower']:.3f}, {res['ci_upper']:.3f}]  "
+          f"MSE {res['mse']:.4f}  ({res['n_boot']} replicates)")
+    print(res["residuals"].to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({k: res[k] for k in ("w", "ci_lower", "ci_upper", "confidence", "mse", "n_boot")}
+                      | {"trial_data": [os.path.relpath(p, ROOT) for p in paths]}, f, indent=2)
+        res["residuals"].to_csv(args.output.with_suffix(".csv"), index=False)
+        print(f"Wrote {args.output} and {args.output.with_suffix('.csv')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
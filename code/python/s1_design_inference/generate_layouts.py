@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Procedurally generate candidate s1_design_inference kitchens.
+
+Each batch is a stack of layouts built and filtered as arrays:
+  1. a counter border, plus `n_counters` counters at random interior tiles
+  2. one delivery (*), `n_chopping_boards` cutboards (/), one dispenser per
+     ingredient of the trial type and the plates (p), placed at random counter
+     tiles (corners excluded, since no agent can reach them)
+  3. both agents' start tiles, found the way gym-cooking's auto_place_agents
+     finds them (see levels.candidate_locations)
+  4. rejection: every station (delivery, cutboard, dispenser, plate) must be
+     next to floor that agent1 can reach, since dish trials and the 1-agent
+     greedy spec of every trial run agent1 alone; with --allow-split-cooks, a
+     cooks layout only needs the two agents' regions together to reach every
+     station (a divided kitchen, as in trial_17). Unless --allow-pockets,
+     every floor tile must be reachable
+
+Here n_counters counts interior counter tiles, including ones holding a station.
+
+Survivors are deduplicated and written like stimuli/s1_design_inference:
+<out>/txt/<trial_id>.txt in the level txt format, plus <out>/trials_metadata.csv
+with the trials_metadata columns (intended_slider_value is left empty, since
+finding it is what the simulations are for) and the generator's own fields.
+With --surrogate, each survivor also gets shortest-path estimates (surrogate.py)
+for pruning before any simulation.
+
+Usage:
+  generate_layouts.py --trial-type cooks --n-chopping-boards 1 2 --n-counters 4 6 9 --n 1000 --out DIR
+  generate_layouts.py --from-metadata --n 200 --out DIR    # every (type, boards, counters) in trials_metadata.csv
+"""
+
+import sys
+import csv
+import time
+import hashlib
+import argparse
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import levels
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+LEVEL_DIR = ROOT / "stimuli" / EXPERIMENT
+METADATA_CSV = LEVEL_DIR / "trials_metadata.csv"
+
+# Dispensers each trial type's kitchens carry (see the hand-made trials)
+DISPENSERS = {"cooks": "TL", "dish": "TLO"}
+
+METADATA_FIELDS = ["trial_id", "trial_type", "intended_slider_value", "n_chopping_boards", "n_counters",
+                   "agent1_start", "agent2_start", "agent1_reaches_all", "agent2_reaches_all",
+                   "shared_floor", "floor_tiles", "sha256"]
+SURROGATE_FIELDS = ["surrogate_Salad_single", "surrogate_Salad_two_agent", "surrogate_SaladOL_single"]
+
+
+# ─── GENERATION ────────────────────────────────────────────────────────────────
+
+def random_counters(rng: np.random.Generator, batch: int, height: int, width: int, n_counters: int) -> np.ndarray:
+    """(batch, height, width) counter masks: the border plus `n_counters` random interior tiles."""
+    inner = (height - 2) * (width - 2)
+    if not 0 <= n_counters < inner:
+        raise ValueError(f"n_counters must be in 0..{inner - 1} for a {width}x{height} kitchen")
+    picks = np.argsort(rng.random((batch, inner)), axis=1)[:, :n_counters]
+    interior = np.zeros((batch, inner), dtype=bool)
+    np.put_along_axis(interior, picks, True, axis=1)
+    counters = np.ones((batch, height, width), dtype=bool)
+    counters[:, 1:-1, 1:-1] = interior.reshape(batch, height - 2, width - 2)
+    return counters
+
+
+def place_stations(rng: np.random.Generator, counters: np.ndarray, stations: bytes) -> np.ndarray:
+    """
+    Character grids with one station (a byte of `stations`) on each of
+    len(stations) distinct random counter tiles, corners excluded.
+    """
+    batch, height, width = counters.shape
+    slots = counters.copy()
+    slots[:, [0, 0, -1, -1], [0, -1, 0, -1]] = False
+    keys = rng.random((batch, height * width))
+    keys[~slots.reshape(batch, -1)] = 2.0  # never picked before a real slot
+    picks = np.argsort(keys, axis=1)[:, :len(stations)]
+    if (np.take_along_axis(keys, picks, axis=1) > 1.0).any():
+        raise ValueError(f"not enough counter tiles for {len(stations)} stations")
+
+    chars = np.where(counters, np.uint8(ord('-')), np.uint8(ord(' '))).reshape(batch, -1)
+    np.put_along_axis(chars, picks, np.frombuffer(stations, dtype=np.uint8)[None, :], axis=1)
+    return chars.reshape(batch, height, width)
+
+
+def scan_starts(walkable: np.ndarray, start_xy, dir_primary, dir_secondary) -> np.ndarray:
+    """(batch, 2) x, y of the first walkable tile along one auto-placement scan (levels.scan_open)."""
+    batch, height, width = walkable.shape
+    order = levels.scan_order(width, height, start_xy, dir_primary, dir_secondary)
+    hits = walkable[:, order[:, 1], order[:, 0]]
+    starts = order[hits.argmax(axis=1)]
+    starts[~hits.any(axis=1)] = (1, 1)
+    return starts
+
+
+def agent_starts(walkable: np.ndarray):
+    """Both agents' auto-placement start tiles for every layout in the batch."""
+    batch, height, width = walkable.shape
+    a1 = scan_starts(walkable, (width - 2, 1), (-1, 0), (0, 1))
+    a2 = scan_starts(walkable, (1, height - 2), (0, -1), (1, 0))
+    # auto_place_agents rescans agent2 from just above agent1 when they collide
+    for b in np.flatnonzero((a1 == a2).all(axis=1)):
+        level = levels.Level(np.where(walkable[b], levels.FLOOR, levels.COUNTER).astype(np.uint8),
+                             np.empty(0, dtype=levels.OBJECT_DTYPE), (), (), "")
+        a2[b] = levels.scan_open(level, (a2[b, 0], a2[b, 1] - 1), (0, -1), (1, 0))
+    return a1, a2
+
+
+def start_masks(starts: np.ndarray, shape) -> np.ndarray:
+    masks = np.zeros(shape, dtype=bool)
+    masks[np.arange(len(starts)), starts[:, 1], starts[:, 0]] = True
+    return masks
+
+
+def generate_batch(rng: np.random.Generator, batch: int, trial_type: str, n_chopping_boards: int,
+                   n_counters: int, height: int = 7, width: int = 7, n_plates: int = 1,
+                   allow_pockets: bool = False, allow_split_cooks: bool = False) -> Dict[str, np.ndarray]:
+    """
+    One batch of random layouts with their feasibility. Returns arrays indexed
+    by layout: 'chars' (batch, height, width) uint8, 'ok', 'agent1_start',
+    'agent2_start', 'agent1_reaches_all', 'agent2_reaches_all', 'shared_floor'
+    and 'floor_tiles'.
+    """
+    stations = b"*" + b"/" * n_chopping_boards + DISPENSERS[trial_type].encode() + b"p" * n_plates
+    counters = random_counters(rng, batch, height, width, n_counters)
+    chars = place_stations(rng, counters, stations)
+    walkable = ~counters
+    station_mask = counters & (chars != ord('-'))
+
+    a1, a2 = agent_starts(walkable)
+    # Both agents' regions in one flood fill
+    regions = levels.flood_fill(np.concatenate([walkable, walkable]),
+                                np.concatenate([start_masks(a1, walkable.shape), start_masks(a2, walkable.shape)]))
+    r1, r2 = regions[:batch], regions[batch:]
+    reached = r1 | r2
+
+    def reaches_all(region):
+        return ~(station_mask & ~levels.dilate(region)).any(axis=(1, 2))
+
+    floor_tiles = walkable.sum(axis=(1, 2))
+    # agent1 runs alone in dish trials and in every trial's 1-agent spec; only
+    # the two-agent condition of a cooks trial can rely on both regions together
+    feasible = reaches_all(reached) if allow_split_cooks and trial_type == "cooks" else reaches_all(r1)
+    ok = feasible & (a1 != a2).any(axis=1) & (floor_tiles >= 2)
+    if not allow_pockets:
+        ok &= ~(walkable & ~reached).any(axis=(1, 2))
+    return {
+        "chars": chars,
+        "ok": ok,
+        "agent1_start": a1,
+        "agent2_start": a2,
+        "agent1_reaches_all": reaches_all(r1),
+        "agent2_reaches_all": reaches_all(r2),
+        "shared_floor": r1[np.arange(batch), a2[:, 1], a2[:, 0]],
+        "floor_tiles": floor_tiles,
+    }
+
+
+def layout_text(chars: np.ndarray) -> str:
+    return "\n".join(row.tobytes().decode("ascii") for row in chars)
+
+
+def generate(trial_type: str, n_chopping_boards: int, n_counters: int, n: int, rng: np.random.Generator,
+             batch: int = 4096, max_batches: int = 1000, seen: Optional[set] = None, **kwargs) -> List[dict]:
+    """
+    Up to `n` distinct feasible layouts (fewer if `max_batches` run out), as
+    dicts with their layout text and metadata. `seen` holds layout hashes to
+    skip and is updated in place.
+    """
+    seen = set() if seen is None else seen
+    out = []
+    for _ in range(max_batches):
+        res = generate_batch(rng, batch, trial_type, n_chopping_boards, n_counters, **kwargs)
+        for b in np.flatnonzero(res["ok"]):
+            text = layout_text(res["chars"][b])
+            sha = hashlib.sha256(text.encode()).hexdigest()
+            if sha in seen:
+                continue
+            seen.add(sha)
+            out.append({
+                "layout": text,
+                "trial_type": trial_type,
+                "intended_slider_value": "",
+                "n_chopping_boards": n_chopping_boards,
+                "n_counters": n_counters,
+                "agent1_start": "{} {}".format(*res["agent1_start"][b]),
+                "agent2_start": "{} {}".format(*res["agent2_start"][b]),
+                "agent1_reaches_all": bool(res["agent1_reaches_all"][b]),
+                "agent2_reaches_all": bool(res["agent2_reaches_all"][b]),
+                "shared_floor": bool(res["shared_floor"][b]),
+                "floor_tiles": int(res["floor_tiles"][b]),
+                "sha256": sha,
+            })
+            if len(out) == n:
+                return out
+    return out
+
+
+def add_surrogate(rows: List[dict]):
+    """Raw surrogate steps from the agent1 (and agent2) start tiles; empty when infeasible."""
+    import surrogate
+    for row in rows:
+        g = surrogate.graph_for(levels.parse_level(row["layout"]))
+        s1, s2 = (surrogate.parse_xy(row[k]) for k in ("agent1_start", "agent2_start"))
+        for field in SURROGATE_FIELDS:
+            _, recipe, kind = field.split("_", 2)
+            steps = surrogate.single(g, recipe, s1) if kind == "single" else surrogate.two_agent(g, recipe, s1, s2)
+            row[field] = steps if np.isfinite(steps) else ""
+
+
+# ─── OUTPUT ────────────────────────────────────────────────────────────────────
+
+def write_layouts(rows: List[dict], out_dir: Path, prefix: str = "gen", fields=METADATA_FIELDS):
+    """Write each layout to <out_dir>/txt/ and all metadata to <out_dir>/trials_metadata.csv."""
+    txt_dir = out_dir / "txt"
+    txt_dir.mkdir(parents=True, exist_ok=True)
+    width = max(5, len(str(len(rows))))
+    for i, row in enumerate(rows, start=1):
+        row["trial_id"] = f"{prefix}_{i:0{width}d}"
+        levels.write_level(txt_dir / f"{row['trial_id']}.txt", row["layout"])
+    with open(out_dir / "trials_metadata.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def metadata_combos(metadata_csv: Path):
+    """Distinct (trial_type, n_chopping_boards, n_counters) of the hand-made trials."""
+    with open(metadata_csv) as f:
+        rows = list(csv.DictReader(f))
+    return sorted({(r["trial_type"], int(r["n_chopping_boards"]), int(r["n_counters"])) for r in rows})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate and filter candidate kitchen layouts")
+    ap.add_argument("--trial-type", choices=sorted(DISPENSERS), default="cooks")
+    ap.add_argument("--n-chopping-boards", type=int, nargs="+", default=[1, 2])
+    ap.add_argument("--n-counters", type=int, nargs="+", default=[4, 6, 9],
+                    help="Interior counter tiles (stations on them included)")
+    ap.add_argument("--from-metadata", action="store_true",
+                    help="Generate for every (trial_type, n_chopping_boards, n_counters) in --metadata")
+    ap.add_argument("--metadata", type=Path, default=METADATA_CSV)
+    ap.add_argument("--n", type=int, default=100, help="Layouts per combination")
+    ap.add_argument("--height", type=int, default=7)
+    ap.add_argument("--width", type=int, default=7)
+    ap.add_argument("--plates", type=int, default=1)
+    ap.add_argument("--allow-pockets", action="store_true", help="Keep layouts with unreachable floor")
+    ap.add_argument("--allow-split-cooks", action="store_true",
+                    help="Keep cooks layouts where only both agents together reach every station")
+    ap.add_argument("--surrogate", action="store_true", help="Add shortest-path time estimates to the metadata")
+    ap.add_argument("--batch", type=int, default=4096)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--prefix", default="gen")
+    ap.add_argument("--out", type=Path, required=True)
+    args = ap.parse_args()
+
+    if args.from_metadata:
+        combos = metadata_combos(args.metadata)
+    else:
+        combos = [(args.trial_type, c, k) for c, k in product(args.n_chopping_boards, args.n_counters)]
+
+    rng = np.random.default_rng(args.seed)
+    seen, rows = set(), []
+    for trial_type, n_cut, n_counters in combos:
+        t0 = time.perf_counter()
+        found = generate(trial_type, n_cut, n_counters, args.n, rng, batch=args.batch, seen=seen,
+                         height=args.height, width=args.width, n_plates=args.plates,
+                         allow_pockets=args.allow_pockets, allow_split_cooks=args.allow_split_cooks)
+        dt = time.perf_counter() - t0
+        print(f"{trial_type} boards={n_cut} counters={n_counters}: {len(found)} layout(s) in {dt:.2f}s "
+              f"({len(found) / max(dt, 1e-9):.0f}/s)")
+        if len(found) < args.n:
+            print(f"  WARN: only {len(found)} of {args.n} distinct feasible layouts found", file=sys.stderr)
+        rows.extend(found)
+
+    fields = METADATA_FIELDS
+    if args.surrogate:
+        t0 = time.perf_counter()
+        add_surrogate(rows)
+        print(f"Surrogate estimates for {len(rows)} layout(s) in {time.perf_counter() - t0:.2f}s")
+        fields = METADATA_FIELDS + SURROGATE_FIELDS
+    write_layouts(rows, args.out, args.prefix, fields)
+    print(f"Wrote {len(rows)} layout(s) to {args.out / 'txt'} and {args.out / 'trials_metadata.csv'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
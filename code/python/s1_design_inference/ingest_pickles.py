@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Incrementally ingest model output pickles into the results store.
+
+A manifest (<outdir>/results/ingest_manifest.json) remembers every pickle
+already ingested by path, size and mtime (or content hash with --hash). Each
+run parses only new or changed pickles, on a process pool, appends their rows
+to the columnar results store as one batch, and re-exports model_results.csv.
+Rows use the schema of process_model_outputs.ipynb: timesteps from
+actions['agent-1'], agent_pauses, agent_collisions and was_successful.
+
+Usage:
+  python ingest_pickles.py [--outdir DIR] [--jobs N] [--hash] [--full]
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import results_store
+from results_store import DATA_ROOT, METADATA_CSV
+
+
+def manifest_path(outdir) -> Path:
+    return results_store.results_dir(outdir) / "ingest_manifest.json"
+
+
+def load_manifest(outdir) -> dict:
+    p = manifest_path(outdir)
+    if not p.exists():
+        return {}
+    with open(p) as f:
+        return json.load(f)
+
+
+def save_manifest(outdir, manifest: dict):
+    p = manifest_path(outdir)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(p.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, p)
+
+
+def sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(path, use_hash: bool) -> dict:
+    st = os.stat(path)
+    fp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if use_hash:
+        fp["sha256"] = sha256(path)
+    return fp
+
+
+def is_current(entry: dict, fp: dict, use_hash: bool) -> bool:
+    """True if the manifest entry matches the file as it is now."""
+    if not entry or entry.get("size") != fp["size"]:
+        return False
+    if use_hash:
+        return entry.get("sha256") == fp["sha256"]
+    return entry.get("mtime_ns") == fp["mtime_ns"]
+
+
+def parse_one(path: str):
+    """Worker: (path, row, error) for one pickle."""
+    try:
+        return path, results_store.row_from_pickle(path), None
+    except Exception:
+        return path, None, traceback.format_exc(limit=2)
+
+
+def ingest(outdir=DATA_ROOT, jobs=None, use_hash=False, full=False, metadata_csv=METADATA_CSV, csv_path=None):
+    t0 = time.perf_counter()
+    pickles = sorted(glob.glob(os.path.join(outdir, "pickles", "*.pkl")))
+    manifest = {} if full else load_manifest(outdir)
+
+    todo, fps = [], {}
+    for p in pickles:
+        fps[p] = fingerprint(p, use_hash)
+        if not is_current(manifest.get(p), fps[p], use_hash):
+            todo.append(p)
+    print(f"{len(pickles)} pickle(s), {len(pickles) - len(todo)} already ingested, {len(todo)} to parse")
+
+    rows, failed = [], []
+    t_parse = time.perf_counter()
+    if todo:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            chunk = max(1, len(todo) // (4 * workers))
+            for path, row, err in ex.map(parse_one, todo, chunksize=chunk):
+                if err is None:
+                    rows.append(row)
+                    manifest[path] = fps[path]
+                else:
+                    failed.append((path, err))
+                    manifest.pop(path, None)
+    t_parse = time.perf_counter() - t_parse
+
+    if rows:
+        results_store.append_batch(rows, outdir, name=f"ingest-{time.strftime('%Y%m%d-%H%M%S')}")
+    # forget files that no longer exist so they are re-read if they come back
+    manifest = {p: fp for p, fp in manifest.items() if p in fps}
+    save_manifest(outdir, manifest)
+
+    out = csv_path or Path(outdir) / "model_results.csv"
+    df = results_store.model_results(outdir, metadata_csv)
+    df.to_csv(out, index=False)
+
+    rate = len(rows) / t_parse if t_parse > 0 else float("nan")
+    print(f"Parsed {len(rows)} pickle(s) in {t_parse:.2f}s ({rate:.1f} files/s); "
+          f"{len(df)} rows -> {out} (total {time.perf_counter() - t0:.2f}s)")
+    if failed:
+        print(f"{len(failed)} unreadable pickle(s):")
+        for path, err in failed:
+            print(f"  {path}\n    {err.strip().splitlines()[-1]}")
+    return rows, failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incrementally ingest model output pickles")
+    ap.add_argument("--outdir", type=Path, default=DATA_ROOT, help="Folder containing pickles/")
+    ap.add_argument("--metadata", type=Path, default=METADATA_CSV)
+    ap.add_argument("--csv", type=Path, default=None, help="Output CSV (default <outdir>/model_results.csv)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count(), help="Parser processes")
+    ap.add_argument("--hash", action="store_true", help="Detect changes by content hash instead of mtime")
+    ap.add_argument("--full", action="store_true", help="Ignore the manifest and re-parse everything")
+    args = ap.parse_args()
+
+    _, failed = ingest(args.outdir, args.jobs, args.hash, args.full, args.metadata, args.csv)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
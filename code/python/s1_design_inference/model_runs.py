@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
-import argparse, csv, os, subprocess
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import argparse, csv, hashlib, importlib.util, json, os, shlex, sys
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, List
 
+import sim_cache
+import telemetry
+
 # Project roots
 ROOT = Path(__file__).resolve().parents[3]
 EXPERIMENT = "s1_design_inference"
@@ -13,6 +15,7 @@ TXT_DIR = LEVEL_DIR / "txt"
 METADATA_CSV = LEVEL_DIR / "trials_metadata.csv"
 
 DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+START_LOCATIONS_JSON = ROOT / "code" / "bash" / EXPERIMENT / "start_locations.json"
 
 PYTHON = "python3"
 MAIN_PY = ROOT / "gym-cooking" / "gym_cooking" / "main.py"
@@ -32,8 +35,17 @@ def ensure_dirs(*paths: Path):
     for p in paths:
         p.mkdir(parents=True, exist_ok=True)
 
+def load_start_locations(path: Optional[Path]):
+    """trial_id -> [agent1_location, agent2_location] from find_start_locations.py output."""
+    if path is None or not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return {item["trial_id"]: [item.get("agent1_location"), item.get("agent2_location")]
+                for item in json.load(f)}
+
 def build_cmd(level: Path, num_agents: int, seed: int, outdir: Path, prefix: str,
-              models: List[str], recipe: Optional[str]):
+              models: List[str], recipe: Optional[str], starts: Optional[List[Optional[str]]] = None,
+              record: bool = True):
     env = os.environ.copy()
     # single-thread heavy libs for CPU parallel
     env["OMP_NUM_THREADS"] = "1"
@@ -46,7 +58,11 @@ def build_cmd(level: Path, num_agents: int, seed: int, outdir: Path, prefix: str
         "--level", str(level),
         "--num-agents", str(num_agents),
         "--seed", str(seed),
-        "--record",
+    ]
+    if record:
+        # one PNG per timestep under records/ (render_runs.py animates runs from their pickles instead)
+        cmd.append("--record")
+    cmd += [
         "--output-dir", str(outdir),
         "--output-prefix", prefix,
     ]
@@ -55,6 +71,9 @@ def build_cmd(level: Path, num_agents: int, seed: int, outdir: Path, prefix: str
             cmd += [f"--model{i}", m]
     if recipe:
         cmd += ["--recipe", recipe]
+    for i, loc in enumerate((starts or [])[:num_agents], start=1):
+        if loc:
+            cmd += [f"--start-location-model{i}", loc]
     return cmd, env
 
 def log_header(level: Path, seed: int, num_agents: int, models: List[str], recipe: Optional[str]):
@@ -63,18 +82,133 @@ def log_header(level: Path, seed: int, num_agents: int, models: List[str], recip
     rec = f" recipe={recipe}" if recipe else ""
     print(f"[ {ts} | lvl={level.stem} seed={seed} ] Agents={num_agents} models={model_str}{rec}")
 
-def main():
-    ap = argparse.ArgumentParser(description="S1 Design Inference model runs (CPU-parallel)")
-    ap.add_argument("--metadata", type=Path, default=METADATA_CSV)
-    ap.add_argument("--seeds", type=int, default=20, help="Run seeds 1..N")
-    ap.add_argument("--jobs", type=int, default=os.cpu_count() * 0.8, help="Parallel processes")
-    ap.add_argument("--dry-run", action="store_true")
-    args = ap.parse_args()
+def task_log(task) -> Path:
+    """A task's own stdout/stderr log (subprocess executor), laid out like its records/."""
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    return Path(outdir) / "logs" / "tasks" / prefix / f"seed={seed}.log"
 
-    seeds = list(range(1, args.seeds + 1))
-    rows = read_metadata(args.metadata)
+def cache_key(task) -> str:
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    return sim_cache.task_key(level, seed, na, models, recipe, starts)
+
+def fetch_cached(task) -> bool:
+    """Materialize a cached pickle for `task` at its usual output path, if there is one."""
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    if sim_cache.fetch_pickle(cache_key(task), sim_cache.pickle_path(outdir, prefix, seed)):
+        print(f"CACHE HIT: {prefix} seed={seed}")
+        return True
+    return False
+
+def cache_result(task):
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    pkl = sim_cache.pickle_path(outdir, prefix, seed)
+    if pkl.exists():
+        sim_cache.store_pickle(cache_key(task), pkl, {"level": str(level), "seed": seed, "prefix": prefix})
+
+_STORE_WARNED = False
+
+def record_result(task, wall_time: Optional[float] = None):
+    """Append the run's row to the columnar results store next to its pickle; returns the row."""
+    global _STORE_WARNED
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    pkl = sim_cache.pickle_path(outdir, prefix, seed)
+    if not pkl.exists():
+        return None
+    try:
+        import results_store
+        data = results_store.load_run_pickle(pkl)
+        row = results_store.row_from_pickle(pkl, wall_time, data)
+        write_trajectory(pkl, outdir, data, (list(starts or []) + [None] * na)[:na])
+        results_store.append_rows([row], outdir)
+        return row
+    except ImportError as e:
+        if not _STORE_WARNED:
+            print(f"WARN: not writing to the results store: {e}")
+            _STORE_WARNED = True
+        return None
+    except Exception as e:
+        # one unreadable pickle or failed write must not stop the sweep
+        print(f"WARN: no results row for {pkl}: {e}")
+        return None
+
+def write_trajectory(pkl: Path, outdir: Path, data: dict, given_starts: List[Optional[str]]):
+    """The run's compact trajectory part (trajectories.py), packed once the sweep ends."""
+    try:
+        import trajectories
+        trajectories.write_part(pkl, outdir, data, given_starts)
+    except Exception as e:
+        print(f"WARN: no trajectory part for {pkl}: {e}")
+
+def pack_trajectories(outdir: Path):
+    try:
+        import trajectories
+        trajectories.pack(outdir)
+    except Exception as e:
+        print(f"WARN: trajectories not packed: {e}")
 
-    tasks = []  # (level, na, seed, outdir, prefix, models, recipe)
+def record_telemetry(task, usage: dict, executor: str, row: Optional[dict] = None):
+    """Log a finished simulation's resource use to <outdir>/logs/telemetry.jsonl."""
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    telemetry.record(outdir, {"executor": executor, **telemetry.task_fields(prefix, seed), **usage,
+                              "timesteps": row["timesteps"] if row else None})
+
+def run_subprocesses(tasks, jobs: int, timeout: Optional[float] = None, retries: int = 0,
+                     use_cache: bool = True, record: bool = True):
+    """Run one main.py subprocess per task under the asyncio supervisor; returns its statuses."""
+    from supervisor import run_supervised
+
+    sup_tasks = []
+    for i, (level, na, seed, outdir, prefix, models, recipe, starts) in enumerate(tasks):
+        cmd, env = build_cmd(level, na, seed, outdir, prefix, models, recipe, starts, record)
+        sup_tasks.append({"index": i, "name": f"{prefix} seed={seed}", "seed": seed, "prefix": prefix,
+                          "cmd": cmd, "env": env, "log": str(task_log(tasks[i]))})
+
+    def report(status):
+        task = tasks[status["index"]]
+        usage = {k: status.get(k) for k in ("returncode", "wall_time", "cpu_time", "max_rss_mb",
+                                            "timed_out", "attempts")}
+        row = None
+        if status["returncode"] == 0:
+            if use_cache:
+                cache_result(task)
+            row = record_result(task, status["wall_time"])
+        record_telemetry(task, usage, "subprocess", row)
+
+    return run_supervised(sup_tasks, jobs, timeout, retries, on_status=report)
+
+def run_workers(tasks, jobs: int, chunk_size: int, use_cache: bool = True, costs=None, record: bool = True):
+    """Run tasks on the persistent in-process worker pool; returns their statuses."""
+    from sim_pool import run_pool
+
+    pool_tasks = []
+    env = None
+    for i, (level, na, seed, outdir, prefix, models, recipe, starts) in enumerate(tasks):
+        log_header(level, seed, na, models, recipe)
+        cmd, env = build_cmd(level, na, seed, outdir, prefix, models, recipe, starts, record)
+        pool_tasks.append({"index": i, "level": str(level), "seed": seed, "prefix": prefix, "argv": cmd[2:],
+                           "cost": costs.task_cost(prefix) if costs else 0.0})
+
+    def report(status):
+        task = tasks[status["index"]]
+        usage = {k: status.get(k) for k in ("returncode", "wall_time", "cpu_time", "max_rss_mb")}
+        if status["returncode"] != 0:
+            print(f"FAILED: {status['prefix']} seed={status['seed']} (rc={status['returncode']})")
+            if status["error"]:
+                print(status["error"])
+            record_telemetry(task, usage, "worker")
+        else:
+            if use_cache:
+                cache_result(task)
+            record_telemetry(task, usage, "worker", record_result(task, status["wall_time"]))
+
+    thread_env = {k: env[k] for k in ("OMP_NUM_THREADS", "MKL_NUM_THREADS",
+                                      "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")} if env else None
+    return run_pool(pool_tasks, MAIN_PY, jobs, chunk_size=chunk_size, env=thread_env, on_status=report)
+
+def build_tasks(rows, seeds: List[int], data_dir: Path = DATA_ROOT, start_locations=None):
+    """One (level, na, seed, outdir, prefix, models, recipe, starts) tuple per simulation."""
+    start_locations = start_locations or {}
+    tasks = []
 
     for r in rows:
         trial_id = r["trial_id"]
@@ -83,7 +217,9 @@ def main():
         if not level_path.exists():
             raise FileNotFoundError(f"Missing level file: {level_path}")
 
-        data_dir = DATA_ROOT
+        if start_locations and trial_id not in start_locations:
+            print(f"Warning: Start locations not found for {trial_id}, using auto-placement.", file=sys.stderr)
+        starts = start_locations.get(trial_id)
 
         if trial_type == "cooks":
             run_specs = [
@@ -98,7 +234,7 @@ def main():
                 for seed in seeds:
                     prefix = f"{trial_id}-{spec['label']}"
                     tasks.append((level_path, spec["na"], seed, data_dir, prefix,
-                                  spec["models"], spec["recipe"]))
+                                  spec["models"], spec["recipe"], starts))
 
         elif trial_type == "dish":
             # single-agent greedy with two recipes
@@ -107,33 +243,347 @@ def main():
                 for seed in seeds:
                     prefix = f"{trial_id}-{label}"
                     tasks.append((level_path, 1, seed, data_dir, prefix,
-                                  ["greedy", None, None, None], recipe))
+                                  ["greedy", None, None, None], recipe, starts))
         else:
             raise ValueError(f"Unknown trial_type '{trial_type}' for trial_id={trial_id}")
+    return tasks
+
+def task_id(task) -> str:
+    """Stable id from what a task simulates (not where it writes), e.g. '3f9c0a1b2d4e5f60'."""
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    spec = {
+        "level": Path(level).name,
+        "prefix": prefix,
+        "num_agents": na,
+        "models": [m or None for m in models[:na]],
+        "recipe": recipe,
+        "start_locations": [s or None for s in (starts or [None] * na)[:na]],
+        "seed": seed,
+    }
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:16]
+
+def task_record(task, record: bool = True) -> dict:
+    """A manifest line: the task's fields, its id and the main.py command that runs it."""
+    level, na, seed, outdir, prefix, models, recipe, starts = task
+    cmd, _ = build_cmd(level, na, seed, outdir, prefix, models, recipe, starts, record)
+    trial, _, settings = prefix.partition("-")
+    return {
+        "id": task_id(task), "trial": trial, "settings": settings, "seed": seed,
+        "level": str(level), "num_agents": na, "models": list(models), "recipe": recipe,
+        "start_locations": list(starts) if starts else None,
+        "outdir": str(outdir), "prefix": prefix, "cmd": shlex.join(cmd),
+    }
+
+def task_from_record(rec: dict):
+    return (Path(rec["level"]), rec["num_agents"], rec["seed"], Path(rec["outdir"]), rec["prefix"],
+            rec["models"], rec["recipe"], rec["start_locations"])
+
+def write_manifest(tasks, path: Path, tasks_txt: Optional[Path] = None, record: bool = True):
+    """Write the JSONL manifest (and optionally the matching tasks.txt, line for line)."""
+    records = [task_record(t, record) for t in tasks]
+    for out, lines in ((path, [json.dumps(r) for r in records]),
+                       (tasks_txt, [r["cmd"] for r in records])):
+        if out is None:
+            continue
+        out.parent.mkdir(parents=True, exist_ok=True)
+        tmp = out.with_name(out.name + ".tmp")
+        with open(tmp, "w") as f:
+            f.writelines(l + "\n" for l in lines)
+        os.replace(tmp, out)
+    return records
+
+def read_manifest(path: Path):
+    with open(path) as f:
+        return [task_from_record(json.loads(l)) for l in f if l.strip()]
 
+def parse_shard(spec: str):
+    """'i/N' (1-based, e.g. $SLURM_ARRAY_TASK_ID/N) -> (i, N)."""
+    i, n = (int(v) for v in spec.split("/"))
+    if not 1 <= i <= n:
+        raise argparse.ArgumentTypeError(f"shard must be i/N with 1 <= i <= N, got {spec}")
+    return i, n
+
+def parse_task_ids(spec: str):
+    """Comma-separated ids, or @file with one id per line."""
+    if spec.startswith("@"):
+        with open(spec[1:]) as f:
+            return {l.strip() for l in f if l.strip()}
+    return {t.strip() for t in spec.split(",") if t.strip()}
+
+def select_tasks(tasks, shard=None, task_ids=None):
+    """Keep the tasks named in `task_ids`, then every N-th task starting at i for shard (i, N)."""
+    if task_ids is not None:
+        tasks = [t for t in tasks if task_id(t) in task_ids]
+    if shard is not None:
+        i, n = shard
+        tasks = tasks[i - 1::n]
+    return tasks
+
+def failure_report_path(args) -> Path:
+    return args.failure_report or Path(args.outdir) / "logs" / "failed_tasks.jsonl"
+
+def write_failure_report(failures, path: Path, record: bool = True):
+    """
+    Failed tasks as manifest lines, with their returncode, timed_out, attempts
+    and log added, so `--from-manifest <path>` reruns exactly those tasks.
+    A run without failures removes the previous report.
+    """
+    if not failures:
+        if path.exists():
+            path.unlink()
+        return None
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        for task, status in failures:
+            extra = {k: status.get(k) for k in ("returncode", "timed_out", "attempts", "log") if k in status}
+            f.write(json.dumps({**task_record(task, record), **extra}) + "\n")
+    os.replace(tmp, path)
+    return path
+
+def launch_log_path(outdir) -> Path:
+    return Path(outdir) / "logs" / "launched_tasks.jsonl"
+
+def log_launches(tasks, record: bool = True):
+    """
+    Append the tasks about to run, as manifest lines, to their outdir's launch
+    log, so render_runs.py / trajectories.py can replay a pickle without
+    'states' from the start locations it was really given (later lines win).
+    """
+    by_log = {}
+    for t in tasks:
+        by_log.setdefault(launch_log_path(t[3]), []).append(json.dumps(task_record(t, record)) + "\n")
+    for path, lines in by_log.items():
+        ensure_dirs(path.parent)
+        with open(path, "a") as f:
+            f.writelines(lines)
+
+def missing_ids(tasks):
+    """Ids of tasks without a cached result: manifest ids minus cached ids."""
+    done = {task_id(t) for t in tasks if sim_cache.lookup(cache_key(t)) is not None}
+    return [task_id(t) for t in tasks if task_id(t) not in done]
+
+def run_tasks(tasks, args):
+    """Run (or dry-run) tasks with the executor chosen in `args`; returns the failed (task, status) pairs."""
     # Ensure dirs
-    for _, _, seed, outdir, prefix, _, _ in tasks:
-        record_dir = Path(os.path.join(outdir, 'records', prefix, f'seed={seed}'))
-        ensure_dirs(outdir, record_dir)
+    for _, _, seed, outdir, prefix, _, _, _ in tasks:
+        ensure_dirs(outdir)
+        if not args.no_record:
+            ensure_dirs(Path(os.path.join(outdir, 'records', prefix, f'seed={seed}')))
 
-    futures, rcodes = [], []
-    with ThreadPoolExecutor(max_workers=args.jobs) as ex:
+    if not args.dry_run:
+        log_launches(tasks, not args.no_record)
+
+    # Tasks whose inputs match a cached result are materialized instead of rerun
+    if not args.no_cache and not args.dry_run:
+        remaining = []
         for t in tasks:
-            level, na, seed, outdir, prefix, models, recipe = t
-            log_header(level, seed, na, models, recipe)
-            cmd, env = build_cmd(level, na, seed, outdir, prefix, models, recipe)
-            if args.dry_run:
-                print("DRY-RUN:", " ".join(cmd))
-                rcodes.append(0)
+            if fetch_cached(t):
+                record_result(t)
             else:
-                futures.append(ex.submit(subprocess.call, cmd, env=env))
+                remaining.append(t)
+        tasks = remaining
+
+    # Longest expected first: the pool hands the next task to whichever worker
+    # frees up, so the short tasks fill in around the expensive bd_bd runs at the end
+    costs = None
+    if args.schedule == "cost" and tasks:
+        import task_costs
+        costs = task_costs.default_costs(tasks[0][3])
+        tasks = task_costs.longest_first(tasks, [costs.task_cost(t[4]) for t in tasks])
+
+    if args.dry_run:
+        for level, na, seed, outdir, prefix, models, recipe, starts in tasks:
+            log_header(level, seed, na, models, recipe)
+            cmd, _ = build_cmd(level, na, seed, outdir, prefix, models, recipe, starts, not args.no_record)
+            print("DRY-RUN:", shlex.join(cmd))
+        return []
+
+    if args.executor == "worker":
+        statuses = run_workers(tasks, args.jobs, args.worker_chunk, use_cache=not args.no_cache, costs=costs,
+                               record=not args.no_record)
+    else:
+        statuses = run_subprocesses(tasks, args.jobs, args.timeout, args.retries,
+                                    use_cache=not args.no_cache, record=not args.no_record)
+    return [(tasks[s["index"]], s) for s in statuses if s["returncode"] != 0]
+
+def trial_ci_widths(outdir: Path, seeds_used: dict, trial_types: dict, w: float = 0.7,
+                    n_boot: int = 1000, confidence: float = 0.95, random_state: int = 0) -> dict:
+    """
+    Width of each trial's bootstrap model_pred CI (as in process_model_outputs.ipynb),
+    from the results store rows with seeds 1..seeds_used[trial]. NaN if it cannot be computed.
+    """
+    import numpy as np
+    import bootstrap, results_store
+    runs = results_store.load_runs(outdir, columns=["trial", "model_model", "model_recipe",
+                                                    "model_seed", "timesteps"])
+    widths = {}
+    for trial, n in seeds_used.items():
+        df = runs[(runs.trial == trial) & (runs.model_seed <= n)]
+        if df.empty:
+            widths[trial] = float("nan")
+            continue
+        if trial_types[trial] == "cooks":
+            means, valid = bootstrap.cooks_replicates(df, n_boot, random_state)
+            # with few seeds a replicate can miss the 1-agent rows too; skip those
+            # rather than letting one NaN replicate make the whole CI NaN
+            preds = bootstrap.cooks_predictions(means, w)[valid & ~np.isnan(means[:, 0])]
+            alpha = 1 - confidence
+            lo, hi = np.percentile(preds, [100 * alpha / 2, 100 * (1 - alpha / 2)]) if len(preds) else (np.nan, np.nan)
+            widths[trial] = float(hi - lo)
+        else:
+            res = bootstrap.bootstrap_dish(df, n_boot=n_boot, confidence=confidence, random_state=random_state)
+            widths[trial] = float(res["ci_upper"] - res["ci_lower"])
+    return widths
+
+def write_seed_allocation(outdir: Path, rows: List[dict]):
+    """Seeds used per trial in adaptive mode: <outdir>/results/seed_allocation.csv."""
+    path = Path(outdir) / "results" / "seed_allocation.csv"
+    ensure_dirs(path.parent)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["trial", "trial_type", "seeds_used", "ci_width",
+                                               "target_ci_width", "converged"])
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+    return path
+
+def run_adaptive(args) -> List:
+    """
+    Run --initial-seeds per trial, then add --seed-step seeds at a time to every
+    trial whose model_pred CI is wider than --ci-width, until --seeds (the cap).
+    Returns the failed (task, status) pairs of all rounds.
+    """
+    rows = read_metadata(args.metadata)
+    starts = load_start_locations(args.start_locations)
+    trial_types = {r["trial_id"]: r["trial_type"] for r in rows}
+    seeds_used = {r["trial_id"]: 0 for r in rows}
+    pending = {r["trial_id"]: min(args.initial_seeds, args.seeds) for r in rows}
+    failed, widths, rnd = [], {}, 0
+
+    while pending:
+        rnd += 1
+        tasks = []
+        for r in rows:
+            n = pending.get(r["trial_id"])
+            if n:
+                seeds = list(range(seeds_used[r["trial_id"]] + 1, n + 1))
+                tasks += build_tasks([r], seeds, args.outdir, starts)
+        print(f"[adaptive] round {rnd}: {len(pending)} trial(s), {len(tasks)} task(s)")
+        failed += run_tasks(tasks, args)
+        seeds_used.update(pending)
+        if args.dry_run:
+            break
+
+        widths.update(trial_ci_widths(args.outdir, pending, trial_types, args.mixture_weight, args.n_boot))
+        pending = {}
+        for trial, width in widths.items():
+            # NaN (e.g. no valid replicates yet) counts as too wide
+            if not width <= args.ci_width and seeds_used[trial] < args.seeds:
+                pending[trial] = min(seeds_used[trial] + args.seed_step, args.seeds)
+
+        summary = [{"trial": t, "trial_type": trial_types[t], "seeds_used": seeds_used[t],
+                    "ci_width": widths.get(t), "target_ci_width": args.ci_width,
+                    "converged": widths.get(t, float("nan")) <= args.ci_width} for t in seeds_used]
+        path = write_seed_allocation(args.outdir, summary)
+
+    if not args.dry_run:
+        total = sum(seeds_used.values())
+        print(f"[adaptive] {total} seed(s) over {len(seeds_used)} trial(s) "
+              f"(fixed --seeds {args.seeds} would use {args.seeds * len(seeds_used)}); wrote {path}")
+    return failed
+
+def main():
+    ap = argparse.ArgumentParser(description="S1 Design Inference model runs (CPU-parallel)")
+    ap.add_argument("--metadata", type=Path, default=METADATA_CSV)
+    ap.add_argument("--seeds", type=int, default=20, help="Run seeds 1..N")
+    ap.add_argument("--outdir", type=Path, default=DATA_ROOT, help="Where runs write pickles and records")
+    ap.add_argument("--start-locations", type=Path, default=START_LOCATIONS_JSON,
+                    help="find_start_locations.py output (auto-placement if missing)")
+    ap.add_argument("--jobs", type=int, default=max(1, int((os.cpu_count() or 1) * 0.8)),
+                    help="Parallel processes")
+    ap.add_argument("--executor", choices=("subprocess", "worker"), default="subprocess",
+                    help="subprocess: one interpreter per task; worker: long-lived in-process workers")
+    ap.add_argument("--timeout", type=float, default=None,
+                    help="Kill a task after this many seconds (--executor subprocess)")
+    ap.add_argument("--retries", type=int, default=None,
+                    help="Reruns of a task that timed out or was killed by a signal (--executor subprocess)")
+    ap.add_argument("--failure-report", type=Path, default=None,
+                    help="Failed tasks as a manifest for --from-manifest (default: <outdir>/logs/failed_tasks.jsonl)")
+    ap.add_argument("--worker-chunk", type=int, default=5,
+                    help="Seeds of the same trial sent to a worker at once (--executor worker)")
+    ap.add_argument("--no-record", action="store_true",
+                    help="Skip main.py --record (no per-timestep PNGs); animate runs with render_runs.py")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="Ignore the content-addressed result cache (always simulate)")
+    ap.add_argument("--schedule", choices=("cost", "metadata"), default="cost",
+                    help="cost: longest expected task first (from run history); metadata: metadata order")
+    ap.add_argument("--manifest", type=Path, default=None,
+                    help="Write the JSONL task manifest here and exit")
+    ap.add_argument("--tasks-txt", type=Path, default=None,
+                    help="With --manifest: also write the matching main.py command lines")
+    ap.add_argument("--from-manifest", type=Path, default=None,
+                    help="Take tasks from a manifest instead of the metadata")
+    ap.add_argument("--shard", type=parse_shard, default=None, help="Run only shard i/N (1-based)")
+    ap.add_argument("--task-ids", type=parse_task_ids, default=None,
+                    help="Run only these task ids (comma-separated or @file)")
+    ap.add_argument("--missing", action="store_true", help="Print ids of tasks without a cached result and exit")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Add seeds only to trials whose model_pred CI is wider than --ci-width (--seeds is the cap)")
+    ap.add_argument("--initial-seeds", type=int, default=5, help="Seeds per trial in the first round (--adaptive)")
+    ap.add_argument("--seed-step", type=int, default=5, help="Seeds added per round to wide trials (--adaptive)")
+    ap.add_argument("--ci-width", type=float, default=0.1, help="Target CI width for model_pred (--adaptive)")
+    ap.add_argument("--mixture-weight", type=float, default=0.7, help="w for cooks trials' CI (--adaptive)")
+    ap.add_argument("--n-boot", type=int, default=1000, help="Bootstrap replicates per CI (--adaptive)")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    if args.executor != "subprocess":
+        # only the subprocess supervisor can kill and rerun a task
+        given = [opt for opt, val in (("--timeout", args.timeout), ("--retries", args.retries)) if val is not None]
+        if given:
+            ap.error(f"{' and '.join(given)} only apply to --executor subprocess")
+    args.retries = args.retries or 0
+    if args.adaptive:
+        # each round is rebuilt from the metadata, so a task selection would be ignored
+        given = [opt for opt, val in (("--from-manifest", args.from_manifest), ("--shard", args.shard),
+                                      ("--task-ids", args.task_ids)) if val]
+        if given:
+            ap.error(f"--adaptive cannot be combined with {', '.join(given)}")
+        # a round that adds no seeds would leave the CIs unchanged and repeat forever
+        for opt, val in (("--initial-seeds", args.initial_seeds), ("--seed-step", args.seed_step)):
+            if val < 1:
+                ap.error(f"{opt} must be at least 1 with --adaptive, got {val}")
+        if not args.dry_run and importlib.util.find_spec("pyarrow") is None:
+            ap.error("--adaptive reads each round's CIs from the results store, which needs pyarrow "
+                     "(conda install pyarrow)")
+
+    if args.from_manifest:
+        tasks = read_manifest(args.from_manifest)
+    else:
+        seeds = list(range(1, args.seeds + 1))
+        tasks = build_tasks(read_metadata(args.metadata), seeds, args.outdir,
+                            load_start_locations(args.start_locations))
+    tasks = select_tasks(tasks, args.shard, args.task_ids)
 
-        for fu in as_completed(futures):
-            rcodes.append(fu.result())
+    if args.manifest or args.tasks_txt:
+        records = write_manifest(tasks, args.manifest, args.tasks_txt, not args.no_record)
+        print(f"Wrote {len(records)} task(s) to {args.manifest or args.tasks_txt}")
+        return
+    if args.missing:
+        for tid in missing_ids(tasks):
+            print(tid)
+        return
 
-    failed = sum(1 for r in rcodes if r != 0)
+    if args.adaptive:
+        failed = run_adaptive(args)
+    else:
+        failed = run_tasks(tasks, args)
+    if not args.dry_run:
+        pack_trajectories(args.outdir)
+        report = write_failure_report(failed, failure_report_path(args), not args.no_record)
     if failed:
-        print(f"{failed} task(s) failed.")
+        print(f"{len(failed)} task(s) failed; rerun exactly those with: --from-manifest {report}")
         raise SystemExit(1)
 
 if __name__ == "__main__":
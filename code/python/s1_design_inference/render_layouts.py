@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Render the static layout images for every trial in one pass.
+
+get_layouts.sh used to read start_locations.json with a `python3 -c` per trial
+and run main.py --layout once per image (72 interpreters). This loads the start
+locations once, builds the same main.py argv for each trial's 1-agent and
+2-agent image, and runs them on warmed-up gym-cooking workers (sim_pool.py), so
+pygame and the renderer are imported once per worker.
+
+An image is re-rendered only when its inputs changed: the level file contents,
+the number of start locations and the start locations themselves. Those are
+hashed per image into <out>/.render_inputs.json; --force renders everything.
+
+Images land where main.py --layout puts them: <out>/agents=<n>/<trial>.png.
+
+CLI:
+  render_layouts.py [--start-locations start_locations.json] [--out DIR]
+                    [--trials trial_01 ...] [--jobs J] [--force]
+                    [--tasks-txt layouts_tasks.txt] [--dry-run]
+"""
+
+import os
+import sys
+import json
+import shlex
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import levels
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+TXT_DIR = ROOT / "stimuli" / EXPERIMENT / "txt"
+LAYOUT_ROOT = ROOT / "stimuli" / EXPERIMENT / "layouts"
+START_LOCATIONS_JSON = ROOT / "code" / "bash" / EXPERIMENT / "start_locations.json"
+MAIN_PY = ROOT / "gym-cooking" / "gym_cooking" / "main.py"
+STAMPS = ".render_inputs.json"
+
+
+def load_start_locations(path: Optional[Path]) -> Dict[str, List[Optional[str]]]:
+    """trial_id -> [agent1_location, agent2_location] ('x y' strings or None)."""
+    if path is None or not Path(path).exists():
+        return {}
+    with open(path) as f:
+        return {item["trial_id"]: [item.get("agent1_location"), item.get("agent2_location")]
+                for item in json.load(f)}
+
+
+def layout_argv(level_file: Path, out: Path, starts: Sequence[Optional[str]], n: int) -> List[str]:
+    """main.py arguments rendering `level_file` with `n` start locations (auto-placed where None)."""
+    argv = ["--level", str(level_file), "--num-agents", "0", "--record", "--layout",
+            "--output-prefix", str(out), "--num-start-locations", str(n)]
+    for i, loc in enumerate(starts[:n], start=1):
+        if loc:
+            argv += [f"--start-location-model{i}", loc]
+    return argv
+
+
+def layout_jobs(level_files: Sequence[Path], start_locations: Dict[str, List[Optional[str]]],
+                out: Path) -> List[dict]:
+    """
+    One job per image, with the choices get_layouts.sh made: the 1-agent image
+    at agent1's start and, for cooks trials, the 2-agent image at both starts.
+    Dish trials have only agent1's start, which get_layouts.sh rendered twice
+    into the same 1-agent image; here once. Trials missing from the start
+    locations get both images with auto-placement.
+    """
+    jobs = []
+    for level_file in level_files:
+        trial = level_file.stem
+        a1, a2 = start_locations.get(trial) or [None, None]
+        if trial not in start_locations:
+            print(f"Warning: Could not find start locations for {trial}, using auto-placement")
+        specs = [(1, [a1])]
+        if a1 and a2:
+            specs.append((2, [a1, a2]))
+        elif not a1:
+            specs.append((2, []))
+        sha = levels.file_sha(level_file)
+        for n, starts in specs:
+            inputs = {"level_sha": sha, "num_start_locations": n, "start_locations": [s for s in starts if s]}
+            jobs.append({
+                "level": str(level_file), "trial": trial, "image": f"agents={n}/{trial}.png",
+                "inputs": hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest(),
+                "argv": layout_argv(level_file, out, starts, n),
+            })
+    return jobs
+
+
+def read_stamps(out: Path) -> Dict[str, str]:
+    try:
+        with open(out / STAMPS) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_stamps(out: Path, stamps: Dict[str, str]):
+    tmp = out / (STAMPS + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(stamps, f, indent=2, sort_keys=True)
+    os.replace(tmp, out / STAMPS)
+
+
+def stale_jobs(jobs: List[dict], out: Path, stamps: Dict[str, str], force: bool = False) -> List[dict]:
+    """Jobs whose image is missing or was rendered from different inputs."""
+    return [j for j in jobs if force or stamps.get(j["image"]) != j["inputs"] or not (out / j["image"]).exists()]
+
+
+def render(jobs: List[dict], out: Path, n_jobs: int = 1) -> int:
+    """Render on warmed-up workers, stamping each image as it succeeds; returns the number that failed."""
+    from sim_pool import run_pool
+    stamps = read_stamps(out)
+    failed = 0
+
+    def report(status):
+        nonlocal failed
+        if status["returncode"] != 0:
+            failed += 1
+            print(f"FAILED: {status['image']} (rc={status['returncode']})")
+            if status["error"]:
+                print(status["error"])
+            return
+        stamps[status["image"]] = status["inputs"]
+        write_stamps(out, stamps)
+        print(f"[ok] {status['image']} ({status['wall_time']:.2f}s)")
+
+    env = {"OVERCOOKED_RECORD_ROOT": str(out), "SDL_VIDEODRIVER": "dummy"}
+    # one batch per level keeps a trial's two images on the same worker
+    run_pool(jobs, MAIN_PY, n_jobs, chunk_size=2, env=env, on_status=report)
+    return failed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render every trial's layout images in one process pool")
+    ap.add_argument("--start-locations", type=Path, default=START_LOCATIONS_JSON)
+    ap.add_argument("--levels", type=Path, default=TXT_DIR, help="Directory of trial_*.txt levels")
+    ap.add_argument("--out", type=Path, default=LAYOUT_ROOT)
+    ap.add_argument("--trials", nargs="+", default=None, help="Only these trial ids")
+    ap.add_argument("--jobs", type=int, default=min(4, os.cpu_count() or 1), help="Renderer processes")
+    ap.add_argument("--force", action="store_true", help="Re-render images whose inputs have not changed")
+    ap.add_argument("--tasks-txt", type=Path, default=None,
+                    help="Also write the equivalent main.py command per image (one per line)")
+    ap.add_argument("--dry-run", action="store_true", help="List the images that would be rendered")
+    args = ap.parse_args()
+
+    level_files = sorted(args.levels.glob("trial_*.txt"))
+    if args.trials:
+        level_files = [p for p in level_files if p.stem in set(args.trials)]
+    if not level_files:
+        print(f"No levels found in {args.levels}", file=sys.stderr)
+        return 1
+    jobs = layout_jobs(level_files, load_start_locations(args.start_locations), args.out)
+
+    if args.tasks_txt:
+        with open(args.tasks_txt, "w") as f:
+            f.writelines(shlex.join(["python3", "gym-cooking/gym_cooking/main.py"] + j["argv"]) + "\n"
+                         for j in jobs)
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    todo = stale_jobs(jobs, args.out, read_stamps(args.out), args.force)
+    print(f"{len(todo)} of {len(jobs)} layout image(s) to render ({len(jobs) - len(todo)} unchanged)")
+    if args.dry_run:
+        for j in todo:
+            print(f"  {j['image']}: {shlex.join(j['argv'])}")
+        return 0
+    if not todo:
+        return 0
+    return 1 if render(todo, args.out, args.jobs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
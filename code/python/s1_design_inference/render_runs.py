@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Render model runs to GIF/MP4 straight from their pickles.
+
+Instead of writing a PNG per timestep (main.py --record) and stitching each
+records/<prefix>/seed=<n>/ directory with ffmpeg (process_model_gifs.sh), this
+replays a run from its pickle, draws every frame into an in-memory RGB array and
+encodes the animation in one go. Many runs are rendered on a process pool.
+
+Agent positions come from the run's recorded 'states' when present; otherwise
+they are replayed from 'actions', starting where the command that launched the
+run placed the agents (its --start-location-modelN, else the level's own or
+auto-placed starts). That command is looked up by pickle path in the launch
+manifests: model_runs.py's <outdir>/logs/launched_tasks.jsonl, tasks.txt, or
+any given with --launched-from. A run without 'states' that none of them
+launched is an error rather than a guess. A move into a non-floor tile is an
+interaction and a move onto, or through, another agent is a collision; both
+leave the agent in place. Held items come from
+'holding' when present. Items put down on counters are not tracked by the
+pickle, so only the kitchen, the agents and what they carry are drawn.
+
+Output mirrors process_model_gifs.sh: <out>/<trial>/<settings>/seed=<n>.gif
+(or .mp4); existing files are skipped unless --overwrite. Sweeps that only need
+these animations can skip the per-frame PNGs with model_runs.py --no-record.
+
+GIFs are encoded with ffmpeg (same palette filter as pngs2gif.sh) or, without
+ffmpeg, with Pillow; MP4 needs ffmpeg.
+
+CLI:
+  render_runs.py [--outdir DIR] [--pickle run.pkl ...] [--trials trial_01 ...]
+                 [--format gif|mp4] [-r FPS] [-s START] [-e END] [--tile PX]
+                 [--launched-from manifest.jsonl|tasks.txt ...] [-o OUT_DIR] [--jobs J] [--overwrite]
+"""
+
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import levels
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+TXT_DIR = ROOT / "stimuli" / EXPERIMENT / "txt"
+TASKS_TXT = ROOT / "code" / "bash" / EXPERIMENT / "tasks.txt"
+
+# gym-cooking's palette (misc/game/utils.py) plus item colours
+TILE_RGB = {
+    levels.FLOOR: (245, 230, 210),
+    levels.COUNTER: (220, 170, 110),
+    levels.CUTBOARD: (220, 170, 110),
+    levels.DELIVERY: (96, 96, 96),
+    levels.DISPENSER: (220, 170, 110),
+}
+BORDER_RGB = (114, 93, 51)
+BOARD_RGB = (250, 250, 245)
+ITEM_RGB = {"Tomato": (214, 40, 40), "Lettuce": (90, 170, 60), "Onion": (150, 80, 160), "Plate": (255, 255, 255)}
+AGENT_RGB = [(40, 90, 220), (210, 50, 170), (230, 200, 40), (40, 170, 80)]
+
+# ffmpeg filters: the GIF one is pngs2gif.sh's
+GIF_FILTER = "fps={fps},split[s0][s1];[s0]palettegen=stats_mode=diff[p];[s1][p]paletteuse=dither=sierra2_4a"
+MP4_FILTER = "fps={fps},pad=ceil(iw/2)*2:ceil(ih/2)*2,format=yuv420p"
+
+
+# ─── REPLAY ────────────────────────────────────────────────────────────────────
+
+def resolve_level(path: str) -> Path:
+    """The run's level file: as recorded, relative to the repo, or by name in the stimuli."""
+    for p in (Path(path), ROOT / path, TXT_DIR / Path(path).name):
+        if p.exists():
+            return p
+    raise FileNotFoundError(f"level file not found: {path}")
+
+
+def default_launch_sources(outdir: Path) -> List[Path]:
+    """The launch manifests that exist for runs in `outdir`; the later ones win."""
+    import model_runs
+    return [p for p in (TASKS_TXT, model_runs.launch_log_path(outdir)) if p.exists()]
+
+
+def launched_starts(sources: Iterable[Path], default_outdir: Path = DATA_ROOT) -> Dict[str, List[Optional[str]]]:
+    """
+    Resolved pickle path -> the start locations ("x y", None: auto-placed) its
+    launching command gave each agent, from JSONL manifests (model_runs.py
+    records) and tasks.txt files of main.py command lines. Later lines win.
+    """
+    import sim_cache
+    launched = {}
+    for src in sources:
+        with open(src) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                if Path(src).suffix == ".jsonl":
+                    rec = json.loads(line)
+                    na, outdir, prefix, seed = rec["num_agents"], rec["outdir"], rec["prefix"], rec["seed"]
+                    given = rec["start_locations"] or []
+                else:
+                    a = sim_cache.main_args(line)
+                    na, outdir, prefix, seed = a.num_agents, a.output_dir or default_outdir, a.output_prefix, a.seed
+                    given = [getattr(a, f"start_location_model{i}") for i in range(1, 5)]
+                if prefix:
+                    pkl = sim_cache.pickle_path(Path(outdir), prefix, seed)
+                    launched[str(pkl.resolve())] = (list(given) + [None] * na)[:na]
+    return launched
+
+
+def run_starts(level: levels.Level, given: Sequence[Optional[str]]) -> List[Tuple[int, int]]:
+    """
+    Where a run's agents started, from the start locations its command gave
+    ("x y" per agent; None where main.py placed the agent itself).
+    """
+    starts = list(level.start_locations) or list(levels.candidate_locations(level))
+    for i, loc in enumerate(given):
+        if loc:
+            x, y = (int(v) for v in loc.split())
+            starts[i:i + 1] = [(x, y)]
+    return starts[:len(given)]
+
+
+def replay_positions(level: levels.Level, actions: Sequence[Sequence[Tuple[int, int]]],
+                     starts: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """(T + 1, n_agents, 2) x, y positions from per-agent action lists, starting at `starts`."""
+    n = len(actions)
+    steps = min((len(a) for a in actions), default=0)
+    if len(starts) < n:
+        raise ValueError(f"{len(starts)} start location(s) for {n} agent(s)")
+    pos = np.zeros((steps + 1, n, 2), dtype=np.int64)
+    pos[0] = starts[:n]
+    for t in range(steps):
+        cur = pos[t]
+        nxt = cur + np.array([actions[a][t] for a in range(n)], dtype=np.int64).reshape(n, 2)
+        inside = (nxt[:, 0] >= 0) & (nxt[:, 0] < level.width) & (nxt[:, 1] >= 0) & (nxt[:, 1] < level.height)
+        nxt[~inside] = cur[~inside]
+        blocked = level.tiles[nxt[:, 1], nxt[:, 0]] != levels.FLOOR
+        nxt[blocked] = cur[blocked]
+        # same target, or a swap: both stay
+        for i in range(n):
+            for j in range(i + 1, n):
+                if (nxt[i] == nxt[j]).all() or ((nxt[i] == cur[j]).all() and (nxt[j] == cur[i]).all()):
+                    nxt[i], nxt[j] = cur[i], cur[j]
+        pos[t + 1] = nxt
+    return pos
+
+
+def trajectory(data: dict, level: levels.Level,
+               given_starts: Optional[Sequence[Optional[str]]] = None) -> Tuple[np.ndarray, List[List[str]]]:
+    """
+    Positions (T, n_agents, 2) and what each agent holds per frame ('' for
+    nothing). A run without 'states' is replayed from `given_starts`, the start
+    locations its command gave (see run_starts), and raises ValueError without them.
+    """
+    agents = sorted(data["actions"], key=lambda a: int(a.split("-")[-1]))
+    states = data.get("states") or {}
+    if agents and all(states.get(a) for a in agents):
+        steps = min(len(states[a]) for a in agents)
+        pos = np.array([[states[a][t] for a in agents] for t in range(steps)], dtype=np.int64).reshape(steps, len(agents), 2)
+    else:
+        if given_starts is None:
+            raise ValueError("run has no 'states' and no launch record of its start locations "
+                             "(pass the manifest or tasks.txt that ran it)")
+        if len(given_starts) != len(agents):
+            raise ValueError(f"launch record has {len(given_starts)} agent(s), the run {len(agents)}")
+        pos = replay_positions(level, [data["actions"][a] for a in agents], run_starts(level, given_starts))
+    holding = data.get("holding") or {}
+    held = []
+    for t in range(len(pos)):
+        row = []
+        for a in agents:
+            h = holding.get(a) or []
+            # states/holding are logged after each step; the replay has the start frame too
+            k = t if len(h) >= len(pos) else t - 1
+            row.append(str(h[k]) if 0 <= k < len(h) and h[k] not in (None, "None") else "")
+        held.append(row)
+    return pos, held
+
+
+# ─── DRAWING ───────────────────────────────────────────────────────────────────
+
+def disc(size: int, radius: float) -> np.ndarray:
+    c = (size - 1) / 2
+    y, x = np.ogrid[:size, :size]
+    return (x - c) ** 2 + (y - c) ** 2 <= radius ** 2
+
+
+def draw_level(level: levels.Level, tile: int) -> np.ndarray:
+    """The kitchen without agents, as an (H*tile, W*tile, 3) uint8 image."""
+    lut = np.array([TILE_RGB[c] for c in range(max(TILE_RGB) + 1)], dtype=np.uint8)
+    img = np.repeat(np.repeat(lut[level.tiles], tile, axis=0), tile, axis=1)
+    b = max(1, tile // 16)
+    inset = tile // 6
+    for y, x in zip(*np.nonzero(level.tiles != levels.FLOOR)):
+        cell = img[y * tile:(y + 1) * tile, x * tile:(x + 1) * tile]
+        cell[:b], cell[-b:], cell[:, :b], cell[:, -b:] = BORDER_RGB, BORDER_RGB, BORDER_RGB, BORDER_RGB
+        if level.tiles[y, x] == levels.CUTBOARD:
+            cell[inset:-inset, inset:-inset] = BOARD_RGB
+    item_names = ["Tomato", "Lettuce", "Onion", "Plate"]
+    for obj in level.objects:
+        cell = img[obj["y"] * tile:(obj["y"] + 1) * tile, obj["x"] * tile:(obj["x"] + 1) * tile]
+        r = tile * (0.38 if obj["dispenser"] else 0.28)
+        cell[disc(tile, r)] = ITEM_RGB[item_names[obj["item"]]]
+        if obj["dispenser"]:
+            cell[disc(tile, r) & ~disc(tile, r - b)] = BORDER_RGB
+    return img
+
+
+def draw_held(cell: np.ndarray, held: str):
+    """Held item in the lower-right quarter of an agent's tile: a plate under its ingredients."""
+    q = cell.shape[0] // 2
+    corner = cell[q:, q:]
+    if "Plate" in held:
+        corner[disc(corner.shape[0], q * 0.48)] = ITEM_RGB["Plate"]
+    foods = [f for f in ("Tomato", "Lettuce", "Onion") if f in held]
+    for k, food in enumerate(foods):
+        r = max(1.0, q * (0.22 if "Chopped" in held else 0.3))
+        c = disc(corner.shape[0], r)
+        shift = (k - (len(foods) - 1) / 2) * r * 1.4
+        corner[np.roll(c, int(round(shift)), axis=1)] = ITEM_RGB[food]
+
+
+def draw_frames(level: levels.Level, pos: np.ndarray, held: List[List[str]], tile: int = 32) -> np.ndarray:
+    """(T, H*tile, W*tile, 3) uint8 frames, one per recorded timestep."""
+    base = draw_level(level, tile)
+    body = disc(tile, tile * 0.36)
+    frames = np.empty((len(pos),) + base.shape, dtype=np.uint8)
+    for t in range(len(pos)):
+        frames[t] = base
+        for a, (x, y) in enumerate(pos[t]):
+            cell = frames[t, y * tile:(y + 1) * tile, x * tile:(x + 1) * tile]
+            cell[body] = AGENT_RGB[a % len(AGENT_RGB)]
+            if held[t][a]:
+                draw_held(cell, held[t][a])
+    return frames
+
+
+# ─── ENCODING ──────────────────────────────────────────────────────────────────
+
+def encode(frames: np.ndarray, out: Path, fps: float = 2):
+    """Write frames to a GIF or MP4 (by suffix) atomically."""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.stem}.partial{out.suffix}")
+    if shutil.which("ffmpeg"):
+        _encode_ffmpeg(frames, tmp, fps)
+    elif out.suffix == ".gif":
+        _encode_pillow(frames, tmp, fps)
+    else:
+        raise RuntimeError(f"{out.suffix} output needs ffmpeg")
+    os.replace(tmp, out)
+
+
+def _encode_ffmpeg(frames: np.ndarray, out: Path, fps: float):
+    _, h, w, _ = frames.shape
+    vf = (GIF_FILTER if out.suffix == ".gif" else MP4_FILTER).format(fps=fps)
+    cmd = ["ffmpeg", "-y", "-v", "error", "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{w}x{h}",
+           "-r", str(fps), "-i", "-", "-vf", vf]
+    if out.suffix == ".mp4":
+        cmd += ["-c:v", "libx264", "-movflags", "+faststart"]
+    proc = subprocess.run(cmd + [str(out)], input=np.ascontiguousarray(frames).tobytes(), stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.decode(errors='replace').strip()}")
+
+
+def _encode_pillow(frames: np.ndarray, out: Path, fps: float):
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise ImportError("GIF output needs ffmpeg or Pillow (conda install pillow)") from e
+    images = [Image.fromarray(f).convert("P", palette=Image.ADAPTIVE) for f in frames]
+    images[0].save(out, format="GIF", save_all=True, append_images=images[1:],
+                   duration=int(round(1000 / fps)), loop=0)
+
+
+# ─── RUNS ──────────────────────────────────────────────────────────────────────
+
+def output_path(pickle: Path, out_root: Path, fmt: str) -> Path:
+    """<out_root>/<trial>/<settings>/seed=<n>.<fmt> for a pickle named <trial>-<settings>-seed=<n>.pkl."""
+    import results_store
+    run = results_store.parse_run_name(Path(pickle).stem)
+    return Path(out_root) / run["trial"] / run["model_settings"] / f"seed={run['model_seed']}.{fmt}"
+
+
+def render_run(pickle: Path, out: Path, fps: float = 2, start: Optional[int] = None,
+               end: Optional[int] = None, tile: int = 32,
+               given_starts: Optional[Sequence[Optional[str]]] = None) -> int:
+    """
+    Render one pickle's frames start..end (inclusive, like pngs2gif.sh) to
+    `out`; returns the frame count. `given_starts` as for trajectory().
+    """
+    import results_store
+    data = results_store.load_run_pickle(pickle)
+    level = levels.load_level(resolve_level(data["level"]))
+    pos, held = trajectory(data, level, given_starts)
+    lo = 0 if start is None else max(0, start)
+    hi = len(pos) - 1 if end is None else min(len(pos) - 1, end)
+    if hi < lo:
+        raise ValueError(f"no frames in range {start}..{end} (run has {len(pos)})")
+    encode(draw_frames(level, pos[lo:hi + 1], held[lo:hi + 1], tile), out, fps)
+    return hi - lo + 1
+
+
+def _render(job) -> dict:
+    pickle, out, kwargs = job
+    try:
+        return {"pickle": str(pickle), "out": str(out), "frames": render_run(pickle, out, **kwargs), "error": None}
+    except Exception as e:
+        return {"pickle": str(pickle), "out": str(out), "frames": 0, "error": f"{type(e).__name__}: {e}"}
+
+
+def find_pickles(outdir: Path, trials: Optional[Sequence[str]] = None) -> List[Path]:
+    found = sorted(Path(p) for p in glob.glob(str(Path(outdir) / "pickles" / "*.pkl")))
+    if trials:
+        found = [p for p in found if p.name.split("-", 1)[0] in set(trials)]
+    return found
+
+
+def render_all(pickles: Sequence[Path], out_root: Path, fmt: str = "gif", jobs: int = 1,
+               overwrite: bool = False, launched: Optional[Dict[str, List[Optional[str]]]] = None,
+               **kwargs) -> Dict[str, int]:
+    """
+    Render many runs on a process pool; returns rendered / skipped / failed
+    counts. `launched` (launched_starts() output) gives each run's starts.
+    """
+    todo = []
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    for p in pickles:
+        out = output_path(p, out_root, fmt)
+        if out.exists() and not overwrite:
+            print(f"[skip] {out}")
+            counts["skipped"] += 1
+            continue
+        todo.append((p, out, {**kwargs, "given_starts": (launched or {}).get(str(Path(p).resolve()))}))
+    if not todo:
+        return counts
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(todo)))) as ex:
+        for fu in as_completed([ex.submit(_render, j) for j in todo]):
+            res = fu.result()
+            if res["error"]:
+                print(f"FAILED: {res['pickle']}: {res['error']}", file=sys.stderr)
+                counts["failed"] += 1
+            else:
+                print(f"[ok] {res['out']} ({res['frames']} frames)")
+                counts["rendered"] += 1
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render model runs to GIF/MP4 from their pickles")
+    ap.add_argument("--outdir", type=Path, default=DATA_ROOT, help="Model output dir (the one with pickles/)")
+    ap.add_argument("--pickle", type=Path, nargs="+", default=None, help="Render these pickles only")
+    ap.add_argument("--trials", nargs="+", default=None, help="Only these trial ids")
+    ap.add_argument("--format", choices=("gif", "mp4"), default="gif")
+    ap.add_argument("-r", "--fps", type=float, default=2, help="Frames per second (default: 2)")
+    ap.add_argument("-s", "--start", type=int, default=None, help="First frame (inclusive)")
+    ap.add_argument("-e", "--end", type=int, default=None, help="Last frame (inclusive)")
+    ap.add_argument("--tile", type=int, default=32, help="Pixels per tile")
+    ap.add_argument("--launched-from", type=Path, nargs="+", default=None,
+                    help="Manifests (.jsonl) or tasks.txt files that launched the runs, for pickles without "
+                         "'states' (default: tasks.txt and <outdir>/logs/launched_tasks.jsonl)")
+    ap.add_argument("-o", "--out", type=Path, default=None, help="Output root (default <outdir>/gifs)")
+    ap.add_argument("--jobs", type=int, default=max(1, int((os.cpu_count() or 1) * 0.8)))
+    ap.add_argument("--overwrite", action="store_true")
+    args = ap.parse_args()
+
+    pickles = args.pickle or find_pickles(args.outdir, args.trials)
+    if not pickles:
+        print(f"No pickles found under {args.outdir / 'pickles'}", file=sys.stderr)
+        return 1
+    launched = launched_starts(args.launched_from or default_launch_sources(args.outdir), args.outdir)
+    counts = render_all(pickles, args.out or args.outdir / "gifs", args.format, args.jobs, args.overwrite,
+                        fps=args.fps, start=args.start, end=args.end, tile=args.tile, launched=launched)
+    print(f"{counts['rendered']} rendered, {counts['skipped']} skipped, {counts['failed']} failed")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Columnar store of per-run model results.
+
+Every run appends one compact row (trial, model settings, seed, timesteps,
+pauses, collisions, success, wall time) as a small Parquet part file under
+<outdir>/results/parts/. `compact` folds the parts into one Parquet file per
+trial (<outdir>/results/trial=<id>/data.parquet). Readers load the parts and
+partitions with column projection, so model_results.csv and the bootstrap
+inputs never need to unpickle a gym_cooking run.
+
+Requires pyarrow.
+
+CLI:
+  results_store.py append --pickle <run.pkl> [--wall-time S] [--outdir DIR]
+  results_store.py compact [--outdir DIR]
+  results_store.py export  [--outdir DIR] [--csv model_results.csv]
+"""
+
+import os
+import sys
+import glob
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+METADATA_CSV = ROOT / "stimuli" / EXPERIMENT / "trials_metadata.csv"
+GYM_COOKING_DIR = ROOT / "gym-cooking" / "gym_cooking"
+
+# Run-level columns written by every run; trial metadata is joined at read time
+RUN_COLUMNS = ["trial", "model_agents", "model_model", "model_recipe", "model_seed", "model_settings",
+               "timesteps", "agent_pauses", "agent_collisions", "was_successful", "wall_time"]
+RUN_KEY = ["trial", "model_settings", "model_seed"]
+
+# Column order of model_results.csv as written by process_model_outputs.ipynb
+METADATA_COLUMNS = ["trial_type", "intended_slider_value", "n_chopping_boards", "n_counters"]
+CSV_COLUMNS = (["trial"] + METADATA_COLUMNS + RUN_COLUMNS[1:-1])
+CSV_SORT = ["trial", "model_model", "model_recipe", "model_seed"]
+
+
+def _arrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("results_store needs pyarrow (conda install pyarrow)") from e
+    return pa, pq
+
+
+def _schema():
+    pa, _ = _arrow()
+    return pa.schema([
+        ("trial", pa.string()),
+        ("model_agents", pa.int8()),
+        ("model_model", pa.string()),
+        ("model_recipe", pa.string()),
+        ("model_seed", pa.int32()),
+        ("model_settings", pa.string()),
+        ("timesteps", pa.int32()),
+        ("agent_pauses", pa.int32()),
+        ("agent_collisions", pa.int32()),
+        ("was_successful", pa.bool_()),
+        ("wall_time", pa.float64()),
+    ])
+
+
+def results_dir(outdir=DATA_ROOT) -> Path:
+    return Path(outdir) / "results"
+
+
+# ─── ROWS ──────────────────────────────────────────────────────────────────────
+
+def parse_run_name(name: str) -> dict:
+    """
+    Parse a run name such as 'trial_01-agents=2-model=bd_bd-recipe=Salad-seed=3'
+    (a pickle's stem) into the model_* columns, as the notebook did.
+    """
+    trial, *params = name.split('-')
+    settings = '-'.join(params[:-1])
+    task_params = {f"model_{p.split('=')[0]}": p.split('=')[1] for p in params}
+    return {
+        "trial": trial,
+        "model_agents": int(task_params["model_agents"]),
+        "model_model": task_params["model_model"],
+        "model_recipe": task_params["model_recipe"],
+        "model_seed": int(task_params["model_seed"]),
+        "model_settings": settings,
+    }
+
+
+def summarize_run(data: dict) -> dict:
+    """Outcome columns from an unpickled gym_cooking run."""
+    agents = list(data['actions'].keys())
+    return {
+        "timesteps": len(data['actions']['agent-1']),
+        "agent_pauses": sum([a == (0, 0) for agent in agents for a in data['actions'][agent]]),
+        "agent_collisions": len(data['collisions']),
+        "was_successful": bool(data['was_successful']),
+    }
+
+
+def load_run_pickle(path):
+    """dill-load a run pickle (needs gym_cooking importable for recipe_planner)."""
+    import dill
+    if str(GYM_COOKING_DIR) not in sys.path:
+        sys.path.append(str(GYM_COOKING_DIR))
+    with open(path, 'rb') as f:
+        return dill.load(f)
+
+
+def row_from_pickle(path, wall_time: Optional[float] = None, data: Optional[dict] = None) -> dict:
+    """The run's row; pass `data` if the pickle is already loaded."""
+    data = data if data is not None else load_run_pickle(path)
+    row = parse_run_name(Path(path).stem)
+    # the trial comes from the level the run used, not the (renameable) prefix
+    row["trial"] = os.path.splitext(os.path.basename(data['level']))[0]
+    row.update(summarize_run(data))
+    row["wall_time"] = wall_time
+    return row
+
+
+def _write_table(df: pd.DataFrame, path: Path):
+    """Write rows to a Parquet file atomically (temp file + rename)."""
+    pa, pq = _arrow()
+    table = pa.Table.from_pandas(df[RUN_COLUMNS], schema=_schema(), preserve_index=False)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    os.close(fd)
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def append_rows(rows: List[dict], outdir=DATA_ROOT):
+    """Append run rows; each run gets its own part file named after its key."""
+    parts = results_dir(outdir) / "parts"
+    for row in rows:
+        name = f"{row['trial']}-{row['model_settings']}-seed={row['model_seed']}.parquet"
+        _write_table(pd.DataFrame([row], columns=RUN_COLUMNS), parts / name)
+
+
+def append_batch(rows: List[dict], outdir=DATA_ROOT, name: str = "batch"):
+    """Append many rows as a single part file (bulk ingestion)."""
+    _write_table(pd.DataFrame(rows, columns=RUN_COLUMNS), results_dir(outdir) / "parts" / f"{name}.parquet")
+
+
+# ─── READ / COMPACT ────────────────────────────────────────────────────────────
+
+def _files(outdir=DATA_ROOT):
+    d = results_dir(outdir)
+    compacted = sorted(glob.glob(str(d / "trial=*" / "data.parquet")))
+    # oldest first, so the newest row for a run wins when duplicates are dropped
+    parts = sorted(glob.glob(str(d / "parts" / "*.parquet")), key=os.path.getmtime)
+    return compacted, parts
+
+
+def load_runs(outdir=DATA_ROOT, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """All run rows (parts override compacted rows for the same run), projected to `columns`."""
+    _arrow()
+    import pyarrow.dataset as ds
+    compacted, parts = _files(outdir)
+    if not compacted and not parts:
+        return pd.DataFrame(columns=columns or RUN_COLUMNS)
+    read_cols = None if columns is None else list(dict.fromkeys(list(columns) + RUN_KEY))
+    # Files are read in order, so later part files win in drop_duplicates below
+    df = ds.dataset(compacted + parts, format="parquet", schema=_schema()).to_table(columns=read_cols).to_pandas()
+    df = df.drop_duplicates(subset=RUN_KEY, keep='last').reset_index(drop=True)
+    return df if columns is None else df[list(columns)]
+
+
+def compact(outdir=DATA_ROOT) -> int:
+    """Fold part files into one Parquet file per trial; returns the number of parts folded."""
+    _, parts = _files(outdir)
+    if not parts:
+        return 0
+    df = load_runs(outdir)
+    for trial, rows in df.groupby('trial', sort=True):
+        _write_table(rows, results_dir(outdir) / f"trial={trial}" / "data.parquet")
+    for p in parts:
+        os.remove(p)
+    return len(parts)
+
+
+def model_results(outdir=DATA_ROOT, metadata_csv=METADATA_CSV) -> pd.DataFrame:
+    """The model_results.csv table: run rows joined with trial metadata, in the notebook's order."""
+    runs = load_runs(outdir, columns=RUN_COLUMNS[:-1])
+    meta = pd.read_csv(metadata_csv).rename(columns={'trial_id': 'trial'})
+    df = runs.merge(meta, on='trial', how='left')
+    return df[CSV_COLUMNS].sort_values(by=CSV_SORT).reset_index(drop=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Columnar store of per-run model results")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("append", help="Append rows for finished run pickles")
+    p.add_argument("--pickle", type=Path, nargs="+", required=True)
+    p.add_argument("--wall-time", type=float)
+    p.add_argument("--cmd", default=None,
+                   help="main.py command that produced the pickles (start locations for trajectory parts)")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p = sub.add_parser("compact", help="Fold part files into per-trial Parquet files")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p = sub.add_parser("export", help="Write model_results.csv from the store")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p.add_argument("--metadata", type=Path, default=METADATA_CSV)
+    p.add_argument("--csv", type=Path, default=None)
+    args = ap.parse_args()
+
+    if args.action == "append":
+        rows = []
+        given_starts = None
+        if args.cmd:
+            import sim_cache
+            given_starts = sim_cache.parse_task_cmd(args.cmd)["starts"]
+        for p in args.pickle:
+            data = load_run_pickle(p)
+            rows.append(row_from_pickle(p, args.wall_time, data))
+            try:
+                import trajectories
+                trajectories.write_part(p, args.outdir, data, given_starts)
+            except Exception as e:
+                print(f"WARN: no trajectory part for {p}: {e}", file=sys.stderr)
+        append_rows(rows, args.outdir)
+    elif args.action == "compact":
+        print(f"Compacted {compact(args.outdir)} part file(s)")
+    elif args.action == "export":
+        out = args.csv or Path(args.outdir) / "model_results.csv"
+        df = model_results(args.outdir, args.metadata)
+        df.to_csv(out, index=False)
+        print(f"Wrote {len(df)} rows to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the design-inference pipeline hot paths.
+
+Every benchmark uses fixed inputs (the 36 s1 level files, or synthetic data from
+a fixed seed), so reports from different commits are directly comparable. The
+suite runs offline: OSF downloads are served by a local stand-in of the
+/v2/nodes/{id}/files/ API, and the gym-cooking simulations are skipped (and
+marked so in the report) when the submodule is not checked out.
+
+Benchmarks:
+  levels       parse all level files (no caches)
+  candidates   levels.scan_open / get_candidate_locations on all levels
+  generate     generate_layouts.generate_batch (random kitchens + reachability filter)
+  surrogate    shortest-path surrogate estimates on all levels
+  ingest       unpickle + summarize run pickles, as process_model_outputs.ipynb did
+  trajectories agent-2 occupancy of one trial's bd_bd seeds: unpickling vs the packed memmap
+  bootstrap    bootstrap_cooks / bootstrap_dish over a synthetic model_results table
+  fit          fit_mixture.fit: mixture weight on a 1001-point grid with 1000 replicates
+  osf          OSFDataHandler.load_filtered_csvs, cold (empty cache) and warm
+  sim          one main.py run per model (greedy, bd)
+
+Usage:
+  python run_benchmarks.py [--only levels,bootstrap] [--repeat 5] [--output report.json]
+                           [--compare previous.json]
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import tempfile
+import argparse
+import statistics
+import subprocess
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT / "code" / "python"))
+import levels
+
+EXPERIMENT = "s1_design_inference"
+TXT_DIR = ROOT / "stimuli" / EXPERIMENT / "txt"
+MAIN_PY = ROOT / "gym-cooking" / "gym_cooking" / "main.py"
+REPORT_DIR = Path(os.environ.get("DESIGN_INFERENCE_CACHE", ROOT / ".cache" / "design-inference")) / "benchmarks"
+SEED = 0
+
+
+class Skip(Exception):
+    pass
+
+
+def level_files():
+    return sorted(TXT_DIR.glob("*.txt"))
+
+
+# ─── BENCHMARKS ────────────────────────────────────────────────────────────────
+# Each setup function takes a scratch dir and returns {case name: callable}.
+
+def bench_levels(tmp):
+    texts = [(p.read_text(), p.stem) for p in level_files()]
+    return {"parse_level_x36": lambda: [levels.parse_level(t) for t, _ in texts]}
+
+
+def bench_candidates(tmp):
+    parsed = [levels.parse_level(p.read_text()) for p in level_files()]
+    files = level_files()
+    from find_start_locations import get_candidate_locations
+    return {
+        "scan_open_x36": lambda: [levels.scan_open(l, (l.width - 2, 1), (-1, 0), (0, 1)) for l in parsed],
+        "candidate_locations_x36": lambda: [levels.candidate_locations(l) for l in parsed],
+        # the script-level helper, including reading files through the memory cache
+        "get_candidate_locations_x36": lambda: [get_candidate_locations(str(p)) for p in files],
+    }
+
+
+def bench_generate(tmp):
+    import generate_layouts
+    rng = np.random.default_rng(SEED)
+    return {
+        "generate_batch_cooks_x4096": lambda: generate_layouts.generate_batch(rng, 4096, "cooks", 1, 6),
+        "generate_batch_dish_x4096": lambda: generate_layouts.generate_batch(rng, 4096, "dish", 2, 9),
+    }
+
+
+def bench_surrogate(tmp):
+    import surrogate
+    parsed = [levels.parse_level(p.read_text()) for p in level_files()]
+    starts = [levels.candidate_locations(l) for l in parsed]
+    graphs = [surrogate.graph_for(l) for l in parsed]
+    return {
+        "graph_x36": lambda: [surrogate.graph_for(l) for l in parsed],
+        "single_x36": lambda: [surrogate.single(g, "Salad", s[0]) for g, s in zip(graphs, starts)],
+        "two_agent_x36": lambda: [surrogate.two_agent(g, "Salad", *s) for g, s in zip(graphs, starts)],
+    }
+
+
+def synthetic_model_df(n_seeds=20):
+    """A model_results-like table for 24 cooks and 12 dish trials, from a fixed seed."""
+    rng = np.random.RandomState(SEED)
+    rows = []
+    for t in range(1, 37):
+        trial = f"trial_{t:02d}"
+        if t <= 24:
+            specs = [("greedy", "Salad", 1, 60), ("bd_bd", "Salad", 2, 40), ("greedy_greedy", "Salad", 2, 45)]
+            trial_type = "cooks"
+        else:
+            specs = [("greedy", "Salad", 1, 50), ("greedy", "SaladOL", 1, 70)]
+            trial_type = "dish"
+        for model, recipe, agents, base in specs:
+            for seed in range(1, n_seeds + 1):
+                rows.append({"trial": trial, "trial_type": trial_type, "model_agents": agents, "model_model": model,
+                             "model_recipe": recipe, "model_seed": seed,
+                             "timesteps": int(base + rng.gamma(2.0, 5.0 if model == "bd_bd" else 1.0))})
+    return pd.DataFrame(rows)
+
+
+def bench_ingest(tmp):
+    import dill
+    import results_store
+    df = synthetic_model_df()
+    rng = np.random.RandomState(SEED)
+    pickles = tmp / "pickles"
+    pickles.mkdir()
+    for r in df.itertuples():
+        agents = {f"agent-{i}": [(0, 0) if rng.rand() < 0.2 else (1, 0) for _ in range(r.timesteps)]
+                  for i in range(1, r.model_agents + 1)}
+        data = {"level": f"{r.trial}.txt", "actions": agents,
+                "collisions": [None] * rng.randint(0, 5), "was_successful": True}
+        settings = f"agents={r.model_agents}-model={r.model_model}-recipe={r.model_recipe}"
+        with open(pickles / f"{r.trial}-{settings}-seed={r.model_seed}.pkl", "wb") as f:
+            dill.dump(data, f)
+    files = sorted(pickles.glob("*.pkl"))
+    return {f"row_from_pickle_x{len(files)}": lambda: [results_store.row_from_pickle(p) for p in files]}
+
+
+def bench_trajectories(tmp):
+    import dill
+    import model_runs
+    import results_store
+    import trajectories
+    from render_runs import trajectory
+    df = synthetic_model_df()
+    rng = np.random.RandomState(SEED)
+    pickles = tmp / "pickles"
+    pickles.mkdir()
+    launched = []
+    for r in df.itertuples():
+        moves = rng.randint(len(trajectories.ACTIONS), size=(r.model_agents, r.timesteps))
+        data = {"level": str(TXT_DIR / f"{r.trial}.txt"), "collisions": [], "was_successful": True,
+                "actions": {f"agent-{i + 1}": [trajectories.ACTIONS[m] for m in moves[i]]
+                            for i in range(r.model_agents)}}
+        settings = f"agents={r.model_agents}-model={r.model_model}-recipe={r.model_recipe}"
+        with open(pickles / f"{r.trial}-{settings}-seed={r.model_seed}.pkl", "wb") as f:
+            dill.dump(data, f)
+        # auto-placed starts, as the pickles have no 'states'
+        launched.append((TXT_DIR / f"{r.trial}.txt", r.model_agents, r.model_seed, tmp, f"{r.trial}-{settings}",
+                         r.model_model.split("_"), r.model_recipe, None))
+    model_runs.log_launches(launched)
+    trajectories.build_parts(tmp, jobs=os.cpu_count(), launched_from=[model_runs.launch_log_path(tmp)])
+    trajectories.pack(tmp)
+    files = sorted(pickles.glob("trial_07-agents=2-model=bd_bd-*.pkl"))
+    level = levels.load_level(TXT_DIR / "trial_07.txt")
+
+    def from_pickles():
+        grid = np.zeros(level.tiles.shape, dtype=np.int64)
+        for p in files:
+            pos, _ = trajectory(results_store.load_run_pickle(p), level, [None, None])
+            np.add.at(grid, (pos[1:, 1, 1], pos[1:, 1, 0]), 1)
+        return grid
+
+    tr = trajectories.Trajectories(tmp)
+    return {
+        f"occupancy_unpickle_x{len(files)}": from_pickles,
+        f"open_memmap_x{len(tr.runs)}": lambda: trajectories.Trajectories(tmp),
+        f"occupancy_memmap_x{len(files)}": lambda: tr.occupancy(tr.select(trial="trial_07", model="bd_bd"), agent=2),
+    }
+
+
+def bench_bootstrap(tmp):
+    import bootstrap
+    df = synthetic_model_df()
+    cooks, dish = df[df.trial_type == "cooks"], df[df.trial_type == "dish"]
+    cooks_trials = [g for _, g in cooks.groupby("trial")]
+    dish_trials = [g for _, g in dish.groupby("trial")]
+    return {
+        "bootstrap_cooks_x24": lambda: [bootstrap.bootstrap_cooks(g, w=0.7, random_state=SEED) for g in cooks_trials],
+        "bootstrap_dish_x12": lambda: [bootstrap.bootstrap_dish(g, random_state=SEED) for g in dish_trials],
+        "model_predictions_w_grid_x21": lambda: bootstrap.model_predictions(
+            cooks, dish, w=np.linspace(0, 1, 21), random_state=SEED),
+    }
+
+
+def bench_fit(tmp):
+    import fit_mixture
+    cooks = synthetic_model_df().query("trial_type == 'cooks'")
+    rng = np.random.RandomState(SEED)
+    trials = sorted(cooks.trial.unique())
+    responses = pd.DataFrame([{"participant": f"p{p}", "trial": t, "slider": rng.rand()}
+                              for p in range(60) for t in trials])
+    return {
+        "fit_w_grid1001_boot1000": lambda: fit_mixture.fit(cooks, responses, grid_size=1001, n_boot=1000),
+    }
+
+
+class _OSFFixture(BaseHTTPRequestHandler):
+    """Serves node metadata, paginated file listings, download redirects and file bodies."""
+    files = {}
+    page_size = 10
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, status=200, headers=()):
+        self.send_response(status)
+        for k, v in headers:
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        path, _, query = self.path.partition("?")
+        names = sorted(self.files)
+        if path == "/v2/nodes/fixture/":
+            self._send(json.dumps({"data": {"attributes": {"title": "fixture"}}}).encode())
+        elif path == "/v2/nodes/fixture/files/osfstorage/":
+            page = int(query.split("=")[1]) if query else 1
+            chunk = names[(page - 1) * self.page_size:page * self.page_size]
+            data = [{"attributes": {"name": n, "size": len(self.files[n]), "date_modified": "2025-01-01T00:00:00",
+                                    "extra": {"hashes": {"sha256": hashlib.sha256(self.files[n]).hexdigest()}}},
+                     "links": {"download": f"{base}/download/{n}"}} for n in chunk]
+            nxt = f"{base}{path}?page={page + 1}" if page * self.page_size < len(names) else None
+            self._send(json.dumps({"data": data, "links": {"next": nxt}}).encode())
+        elif path.startswith("/download/"):
+            self._send(b"", 302, [("Location", f"{base}/files/{path[len('/download/'):]}")])
+        elif path.startswith("/files/") and path[len("/files/"):] in self.files:
+            self._send(self.files[path[len("/files/"):]])
+        else:
+            self._send(b"not found", 404)
+
+
+def bench_osf(tmp):
+    from osf_data_handler import OSFDataHandler
+    rng = np.random.RandomState(SEED)
+    files = {}
+    for i in range(40):
+        df = pd.DataFrame({"trial": rng.randint(1, 37, 500), "rt": rng.gamma(2.0, 800.0, 500).round(1),
+                           "response": rng.rand(500).round(3)})
+        files[f"design_inference-exp1-pilot_{i % 2}-{i:08x}.csv"] = df.to_csv(index=False).encode()
+    _OSFFixture.files = files
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _OSFFixture)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api = f"http://127.0.0.1:{server.server_port}/v2"
+    cache = tmp / "osf"
+    criteria = {"iteration_name": "pilot_0"}
+
+    def cold():
+        shutil.rmtree(cache, ignore_errors=True)
+        OSFDataHandler("fixture", cache_dir=cache, api_url=api).load_filtered_csvs(criteria)
+
+    def warm():
+        OSFDataHandler("fixture", cache_dir=cache, api_url=api).load_filtered_csvs(criteria)
+
+    return {"load_filtered_csvs_cold_x20": cold, "load_filtered_csvs_warm_x20": warm}
+
+
+def bench_sim(tmp):
+    if not MAIN_PY.exists():
+        raise Skip(f"{MAIN_PY} not found (gym-cooking submodule not checked out)")
+    level = str(level_files()[0])
+    env = {**os.environ, "SDL_VIDEODRIVER": "dummy", "SDL_AUDIODRIVER": "dummy", "OMP_NUM_THREADS": "1"}
+
+    def run(args):
+        def fn():
+            subprocess.run([sys.executable, str(MAIN_PY), "--level", level, "--seed", "1", "--recipe", "Salad",
+                            "--output-dir", str(tmp), "--output-prefix", "bench"] + args,
+                           env=env, check=True, capture_output=True)
+        return fn
+
+    return {
+        "main_py_greedy": run(["--num-agents", "1", "--model1", "greedy"]),
+        "main_py_bd_bd": run(["--num-agents", "2", "--model1", "bd", "--model2", "bd"]),
+    }
+
+
+BENCHMARKS = {
+    "levels": bench_levels,
+    "candidates": bench_candidates,
+    "generate": bench_generate,
+    "surrogate": bench_surrogate,
+    "ingest": bench_ingest,
+    "trajectories": bench_trajectories,
+    "bootstrap": bench_bootstrap,
+    "fit": bench_fit,
+    "osf": bench_osf,
+    "sim": bench_sim,
+}
+SLOW = {"sim": 1}  # repeats for benchmarks that take seconds per call
+
+
+# ─── RUNNER ────────────────────────────────────────────────────────────────────
+
+def time_case(fn, repeat: int, warmup: int = 1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"repeat": repeat, "min_s": min(times), "median_s": statistics.median(times),
+            "mean_s": statistics.fmean(times), "times_s": times}
+
+
+def git_rev():
+    try:
+        return subprocess.run(["git", "-C", str(ROOT), "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(names, repeat: int):
+    report = {
+        "commit": git_rev(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "host": platform.node(),
+        "cpu_count": os.cpu_count(),
+        "benchmarks": {},
+    }
+    for name in names:
+        tmp = Path(tempfile.mkdtemp(prefix=f"bench-{name}-"))
+        entry = {}
+        try:
+            cases = BENCHMARKS[name](tmp)
+            for case, fn in cases.items():
+                r = SLOW.get(name, repeat)
+                entry[case] = time_case(fn, r, warmup=0 if name in SLOW else 1)
+                print(f"{name:<10} {case:<32} median {entry[case]['median_s'] * 1e3:10.2f} ms  (n={r})")
+        except Skip as e:
+            entry = {"skipped": str(e)}
+            print(f"{name:<10} skipped: {e}")
+        except ImportError as e:
+            entry = {"skipped": f"missing dependency: {e}"}
+            print(f"{name:<10} skipped: missing dependency: {e}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        report["benchmarks"][name] = entry
+    return report
+
+
+def compare(report: dict, previous: dict):
+    """Print median ratios against an earlier report (>1 means slower now)."""
+    print(f"\nvs {previous.get('commit')} ({previous.get('created')}):")
+    for name, cases in report["benchmarks"].items():
+        old = previous.get("benchmarks", {}).get(name, {})
+        for case, res in cases.items():
+            if not isinstance(res, dict) or case not in old or "median_s" not in old[case]:
+                continue
+            ratio = res["median_s"] / old[case]["median_s"]
+            print(f"{name:<10} {case:<32} x{ratio:6.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the design-inference pipeline hot paths")
+    ap.add_argument("--only", default=None, help=f"Comma-separated subset of: {','.join(BENCHMARKS)}")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--output", type=Path, default=None,
+                    help="JSON report (default $DESIGN_INFERENCE_CACHE/benchmarks/<commit>-<time>.json)")
+    ap.add_argument("--compare", type=Path, default=None, help="Earlier report to compare against")
+    args = ap.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    report = run_suite(names, args.repeat)
+    out = args.output or REPORT_DIR / f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Run a pack of tasks.txt lines inside one SLURM array element.
+
+Instead of one array element per simulation, each element takes a slice of the
+task lines (a contiguous block, or every N-th line for a balanced mix of trials)
+and runs them on an in-node pool sized to --cpus-per-task. Per task it keeps the
+array runner's logic: skip when a cached result exists (unless --overwrite),
+otherwise run the command, then store the pickle in the cache and append its row
+to the results store.
+
+With a plan from `plan`, pack I runs the lines the LPT rule gave it (expected
+cost from run history, see task_costs.py), so packs finish at about the same
+time; within a pack, lines start longest expected first.
+
+Every simulation it runs is measured and logged to <outdir>/logs/telemetry.jsonl
+(see telemetry.py); `mem` turns the peak RSS in that log into a --mem request.
+
+CLI:
+  run_task_pack.py plan --tasks tasks.txt --num-packs N [--lines FILE] --out plan.txt
+  run_task_pack.py run --tasks tasks.txt --pack I --num-packs N [--lines FILE | --plan plan.txt]
+                       [--mode contiguous|balanced] [--jobs J] [--overwrite]
+  run_task_pack.py mem --log <outdir>/logs/telemetry.jsonl --jobs J
+"""
+
+import os
+import sys
+import math
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional
+
+import sim_cache
+import telemetry
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+
+
+# ─── PACKING ───────────────────────────────────────────────────────────────────
+
+def read_lines(tasks_file) -> List[str]:
+    with open(tasks_file) as f:
+        return [l.rstrip("\n") for l in f]
+
+
+def pack_lines(line_ids: List[int], pack: int, num_packs: int, mode: str = "contiguous") -> List[int]:
+    """
+    The 1-based task lines for pack `pack` (1..num_packs).
+
+    contiguous: near-equal consecutive blocks (tasks of one trial stay together).
+    balanced: every num_packs-th line, so each pack gets a mix of trials and
+    model specs and packs finish at about the same time.
+    """
+    if not 1 <= pack <= num_packs:
+        raise ValueError(f"pack must be in 1..{num_packs}, got {pack}")
+    if mode == "balanced":
+        return line_ids[pack - 1::num_packs]
+    size, extra = divmod(len(line_ids), num_packs)
+    start = (pack - 1) * size + min(pack - 1, extra)
+    return line_ids[start:start + size + (1 if pack <= extra else 0)]
+
+
+def task_cost_fn(outdir: Path):
+    """prefix -> expected cost, or None when pandas/history are unavailable."""
+    try:
+        import task_costs
+        return task_costs.default_costs(outdir).task_cost
+    except Exception as e:
+        print(f"WARN: no task costs ({e}); keeping task order", file=sys.stderr)
+        return None
+
+
+def plan_packs(tasks_file, line_ids: List[int], num_packs: int, outdir: Path) -> List[List[int]]:
+    """LPT assignment of task lines to packs by expected cost, each pack longest first."""
+    import task_costs
+    lines = read_lines(tasks_file)
+    cost = task_costs.default_costs(outdir).task_cost
+    costs = [cost(sim_cache.parse_task_cmd(lines[i - 1])["prefix"] or "") for i in line_ids]
+    return [[line_ids[j] for j in b] for b in task_costs.lpt_bins(costs, num_packs)]
+
+
+def write_plan(path: Path, packs: List[List[int]]):
+    """One 'pack line' pair per row (1-based both)."""
+    with open(path, "w") as f:
+        for p, lines in enumerate(packs, start=1):
+            f.writelines(f"{p} {l}\n" for l in lines)
+
+
+def read_plan(path: Path, pack: int) -> List[int]:
+    with open(path) as f:
+        return [int(l.split()[1]) for l in f if l.strip() and int(l.split()[0]) == pack]
+
+
+# ─── RUNNING ───────────────────────────────────────────────────────────────────
+
+def record_row(pickle: Path, outdir: Path, wall_time: Optional[float] = None,
+               given_starts: Optional[List[Optional[str]]] = None):
+    try:
+        import results_store
+        data = results_store.load_run_pickle(pickle)
+        results_store.append_rows([results_store.row_from_pickle(pickle, wall_time, data)], outdir)
+    except Exception as e:
+        print(f"WARN: no results row for {pickle}: {e}", file=sys.stderr)
+        return
+    try:
+        import trajectories
+        trajectories.write_part(pickle, outdir, data, given_starts)
+    except Exception as e:
+        print(f"WARN: no trajectory part for {pickle}: {e}", file=sys.stderr)
+
+
+def run_line(line_id: int, cmd: str, default_outdir: Path, log_file: Path, overwrite: bool = False) -> int:
+    task = sim_cache.parse_task_cmd(cmd)
+    pickle = task["pickle"] or sim_cache.pickle_path(default_outdir, task["prefix"], task["seed"])
+    outdir = pickle.parent.parent
+
+    if not overwrite and sim_cache.fetch_pickle(task["key"], pickle):
+        print(f"SKIP (cached) line {line_id}: {pickle}", flush=True)
+        record_row(pickle, outdir, given_starts=task["starts"])
+        return 0
+
+    print(f"Running (line {line_id}): {cmd}", flush=True)
+    res = telemetry.measure(cmd, shell=True)
+    rc, wall, rss = res["returncode"], res["wall_time"], res["max_rss_mb"]
+    timesteps = telemetry.pickle_timesteps(pickle) if rc == 0 and pickle.exists() else None
+    telemetry.record(outdir, {"executor": "pack", "line": line_id,
+                              **telemetry.task_fields(task["prefix"], task["seed"]), **res,
+                              "timesteps": timesteps}, path=log_file)
+    if rc != 0:
+        print(f"FAILED (line {line_id}, rc={rc}): {cmd}", file=sys.stderr, flush=True)
+        return rc
+    if pickle.exists():
+        sim_cache.store_pickle(task["key"], pickle, {"level": task["level"], "seed": task["seed"],
+                                                     "prefix": task["prefix"]})
+        record_row(pickle, outdir, wall, task["starts"])
+    print(f"Done (line {line_id}) in {wall:.1f}s, peak RSS {rss:.0f} MiB", flush=True)
+    return 0
+
+
+def run_pack(tasks_file, line_ids: List[int], jobs: int, outdir: Path, log_file: Path,
+             overwrite: bool = False) -> int:
+    lines = read_lines(tasks_file)
+    todo = [(i, lines[i - 1]) for i in line_ids if 0 < i <= len(lines) and lines[i - 1].strip()]
+    cost = task_cost_fn(outdir) if len(todo) > jobs else None
+    if cost is not None:
+        # longest expected first, so the pool's tail is made of short tasks
+        todo.sort(key=lambda t: -cost(sim_cache.parse_task_cmd(t[1])["prefix"] or ""))
+    print(f"{len(todo)} task(s) on {jobs} worker(s)", flush=True)
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as ex:
+        futures = [ex.submit(run_line, i, cmd, outdir, log_file, overwrite) for i, cmd in todo]
+        for fu in as_completed(futures):
+            failed += fu.result() != 0
+    if failed:
+        print(f"{failed} task(s) failed.", file=sys.stderr)
+    return failed
+
+
+# ─── MEMORY SIZING ─────────────────────────────────────────────────────────────
+
+def suggest_mem(log_file, jobs: int, quantile: float = 0.99, headroom: float = 1.25,
+                base_mb: int = 512, default_task_mb: int = 2048) -> int:
+    """
+    MiB to request for a pack running `jobs` tasks at once: the `quantile` of
+    measured peak RSS per task, times jobs, plus headroom and a fixed base for
+    the runner itself. Falls back to `default_task_mb` per task with no history.
+    """
+    rss = [float(e["max_rss_mb"]) for e in telemetry.load_entries([log_file] if log_file else [])
+           if e.get("returncode") == 0 and e.get("max_rss_mb")]
+    if rss:
+        per_task = telemetry.quantile(rss, quantile)
+    else:
+        per_task = default_task_mb
+    return int(math.ceil(base_mb + headroom * per_task * max(1, jobs)))
+
+
+def read_line_ids(path) -> List[int]:
+    with open(path) as f:
+        return [int(l) for l in f if l.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run a pack of task lines on an in-node pool")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("plan", help="Assign lines to packs by expected cost (LPT)")
+    p.add_argument("--tasks", type=Path, required=True)
+    p.add_argument("--lines", type=Path, default=None,
+                   help="File of 1-based line numbers to pack (default: every line)")
+    p.add_argument("--num-packs", type=int, required=True)
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT, help="Whose telemetry log to use for costs")
+    p.add_argument("--out", type=Path, required=True)
+    p = sub.add_parser("run")
+    p.add_argument("--tasks", type=Path, required=True)
+    p.add_argument("--lines", type=Path, default=None,
+                   help="File of 1-based line numbers to pack (default: every line)")
+    p.add_argument("--plan", type=Path, default=None, help="Pack assignment written by `plan`")
+    p.add_argument("--pack", type=int, default=int(os.environ.get("SLURM_ARRAY_TASK_ID", 1)))
+    p.add_argument("--num-packs", type=int, required=True)
+    p.add_argument("--mode", choices=("contiguous", "balanced"), default="balanced")
+    p.add_argument("--jobs", type=int, default=int(os.environ.get("SLURM_CPUS_PER_TASK", 1)))
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT,
+                   help="Output dir for commands without --output-dir")
+    p.add_argument("--log", type=Path, default=None,
+                   help="Telemetry log (default <outdir>/logs/telemetry.jsonl)")
+    p.add_argument("--overwrite", action="store_true", help="Rerun even if a cached result exists")
+    p = sub.add_parser("mem", help="Print a --mem value (e.g. 6144M) sized from measured peak RSS")
+    p.add_argument("--log", type=Path, required=True)
+    p.add_argument("--jobs", type=int, required=True)
+    p.add_argument("--quantile", type=float, default=0.99)
+    p.add_argument("--headroom", type=float, default=1.25)
+    p.add_argument("--default-task-mb", type=int, default=2048)
+    args = ap.parse_args()
+
+    if args.action == "mem":
+        print(f"{suggest_mem(args.log, args.jobs, args.quantile, args.headroom, default_task_mb=args.default_task_mb)}M")
+        return 0
+
+    if args.lines:
+        line_ids = read_line_ids(args.lines)
+    else:
+        line_ids = list(range(1, len(read_lines(args.tasks)) + 1))
+    if args.action == "plan":
+        packs = plan_packs(args.tasks, line_ids, args.num_packs, args.outdir)
+        write_plan(args.out, packs)
+        print(f"Planned {len(line_ids)} line(s) into {len(packs)} pack(s) -> {args.out}")
+        return 0
+
+    if args.plan:
+        mine = read_plan(args.plan, args.pack)
+    else:
+        mine = pack_lines(line_ids, args.pack, args.num_packs, args.mode)
+    log_file = args.log or telemetry.log_path(args.outdir)
+    return 1 if run_pack(args.tasks, mine, args.jobs, args.outdir, log_file, args.overwrite) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
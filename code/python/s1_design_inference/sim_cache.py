@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of gym-cooking simulation results.
+
+A result is keyed by a hash of everything that determines it: the level file
+contents (not its name), recipe, number of agents, model list, start locations,
+seed and simulator version. Editing a level txt file therefore invalidates only
+that level's results, while renaming a trial or output prefix reuses them.
+
+Entries live under $DESIGN_INFERENCE_CACHE/sim/<key[:2]>/<key>/ and hold either
+the run pickle (`result.pkl`) or a small JSON value such as a timestep count,
+plus `meta.json` describing the inputs.
+
+CLI (task commands are main.py command lines, e.g. a line of tasks.txt):
+  sim_cache.py key     --cmd "<main.py command>"
+  sim_cache.py fetch   --cmd "<main.py command>"   # exit 0 and copy pickle on hit
+  sim_cache.py store   --cmd "<main.py command>"   # after a successful run
+  sim_cache.py missing --tasks tasks.txt           # 1-based lines not cached
+  sim_cache.py stats
+  sim_cache.py evict [--max-size 20G] [--max-age-days 30]
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import shutil
+import hashlib
+import tempfile
+import argparse
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[3]
+sys.path.insert(0, str(ROOT / "code" / "python"))
+from levels import file_sha
+
+CACHE_DIR = Path(os.environ.get("DESIGN_INFERENCE_CACHE", ROOT / ".cache" / "design-inference")) / "sim"
+GYM_COOKING = ROOT / "gym-cooking"
+
+
+@lru_cache(maxsize=None)
+def simulator_version() -> str:
+    """gym-cooking commit (plus -dirty for local edits); override with GYM_COOKING_VERSION."""
+    if os.environ.get("GYM_COOKING_VERSION"):
+        return os.environ["GYM_COOKING_VERSION"]
+    if not (GYM_COOKING / ".git").exists():
+        return "unknown"  # otherwise git would report this repo's commit instead
+    try:
+        rev = subprocess.run(["git", "-C", str(GYM_COOKING), "rev-parse", "HEAD"],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "-C", str(GYM_COOKING), "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return rev + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+@lru_cache(maxsize=4096)
+def _level_sha(level: str, mtime_ns: int, size: int) -> str:
+    return file_sha(level)
+
+
+def level_sha(level) -> str:
+    """sha256 of a level file, memoized until the file changes."""
+    st = os.stat(level)
+    return _level_sha(str(level), st.st_mtime_ns, st.st_size)
+
+
+def task_key(level, seed: int, num_agents: int, models: List[Optional[str]], recipe: Optional[str],
+             start_locations: Optional[List[Optional[str]]] = None, kind: str = "run") -> str:
+    """Hash of the inputs that determine a simulation's outcome."""
+    starts = [" ".join(str(s).split()) if s else None for s in (start_locations or [])[:num_agents]]
+    payload = {
+        "kind": kind,
+        "level_sha": level_sha(level),
+        "recipe": recipe,
+        "num_agents": int(num_agents),
+        "models": [m or None for m in list(models)[:num_agents]],
+        "start_locations": starts if any(starts) else None,
+        "seed": int(seed),
+        "simulator": simulator_version(),
+    }
+    blob = json.dumps(payload, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def entry_dir(key: str) -> Path:
+    return CACHE_DIR / key[:2] / key
+
+
+def lookup(key: str) -> Optional[Path]:
+    """Return the cache entry directory on a hit (and mark it used), else None."""
+    d = entry_dir(key)
+    meta = d / "meta.json"
+    if not meta.exists():
+        return None
+    try:
+        os.utime(meta)  # last use, for LRU eviction
+    except OSError:
+        pass
+    return d
+
+
+def _store(key: str, files: dict, meta: dict):
+    """Atomically publish an entry: stage in a temp dir, then rename into place."""
+    final = entry_dir(key)
+    if (final / "meta.json").exists():
+        return
+    final.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=f".{key}.", dir=final.parent))
+    for name, src in files.items():
+        shutil.copyfile(src, tmp / name)
+    with open(tmp / "meta.json", "w") as f:
+        json.dump({**meta, "key": key, "created": time.time()}, f, indent=2)
+    try:
+        os.rename(tmp, final)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)  # another worker published it first
+
+
+def store_pickle(key: str, pickle_file, meta: Optional[dict] = None):
+    _store(key, {"result.pkl": pickle_file}, meta or {})
+
+
+def fetch_pickle(key: str, dest) -> bool:
+    d = lookup(key)
+    if d is None or not (d / "result.pkl").exists():
+        return False
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + ".tmp")
+    shutil.copyfile(d / "result.pkl", tmp)
+    os.replace(tmp, dest)
+    return True
+
+
+def store_value(key: str, value, meta: Optional[dict] = None):
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".value.", suffix=".json", dir=CACHE_DIR)
+    tmp = Path(tmp)
+    with os.fdopen(fd, "w") as f:
+        json.dump(value, f)
+    try:
+        _store(key, {"result.json": tmp}, meta or {})
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def fetch_value(key: str):
+    d = lookup(key)
+    if d is None or not (d / "result.json").exists():
+        return None
+    with open(d / "result.json") as f:
+        return json.load(f)
+
+
+# ─── main.py COMMAND LINES ─────────────────────────────────────────────────────
+
+def main_args(cmd: str) -> argparse.Namespace:
+    """The main.py arguments of a command line that matter here (others are ignored)."""
+    toks = shlex.split(cmd)
+    ap = argparse.ArgumentParser(add_help=False)
+    ap.add_argument("--level")
+    ap.add_argument("--num-agents", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--recipe")
+    ap.add_argument("--output-dir")
+    ap.add_argument("--output-prefix")
+    ap.add_argument("--return-timesteps-only", action="store_true")
+    for i in range(1, 5):
+        ap.add_argument(f"--model{i}")
+        ap.add_argument(f"--start-location-model{i}")
+    a, _ = ap.parse_known_args(toks)
+    return a
+
+
+def parse_task_cmd(cmd: str) -> dict:
+    """
+    Pull the cache-relevant arguments out of a main.py command line. Raises
+    ValueError without --level, and OSError if the level file cannot be read.
+    """
+    a = main_args(cmd)
+    if not a.level:
+        raise ValueError("no --level in main.py command line")
+    models = [getattr(a, f"model{i}") for i in range(1, 5)]
+    starts = [getattr(a, f"start_location_model{i}") for i in range(1, 5)]
+    key = task_key(a.level, a.seed, a.num_agents, models, a.recipe, starts,
+                   kind="timesteps" if a.return_timesteps_only else "run")
+    pickle = None
+    if a.output_dir and a.output_prefix:
+        pickle = pickle_path(Path(a.output_dir), a.output_prefix, a.seed)
+    return {"key": key, "pickle": pickle, "level": a.level, "seed": a.seed, "prefix": a.output_prefix,
+            "starts": starts[:a.num_agents]}
+
+
+def pickle_path(outdir: Path, prefix: str, seed: int) -> Path:
+    """Where main.py writes a run's pickle."""
+    return Path(outdir) / "pickles" / f"{prefix}-seed={seed}.pkl"
+
+
+# ─── MAINTENANCE ───────────────────────────────────────────────────────────────
+
+def _entries():
+    if not CACHE_DIR.exists():
+        return []
+    out = []
+    for meta in CACHE_DIR.glob("*/*/meta.json"):
+        d = meta.parent
+        size = sum(p.stat().st_size for p in d.iterdir() if p.is_file())
+        out.append((meta.stat().st_mtime, size, d))
+    return out
+
+
+def evict(max_bytes: Optional[int] = None, max_age_days: Optional[float] = None) -> int:
+    """Drop entries unused for `max_age_days`, then least recently used ones until under `max_bytes`."""
+    entries = sorted(_entries())
+    removed = 0
+    if max_age_days is not None:
+        cutoff = time.time() - max_age_days * 86400
+        for e in [e for e in entries if e[0] < cutoff]:
+            shutil.rmtree(e[2], ignore_errors=True)
+            entries.remove(e)
+            removed += 1
+    if max_bytes is not None:
+        total = sum(e[1] for e in entries)
+        for _, size, d in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+            removed += 1
+    return removed
+
+
+def parse_size(s: str) -> int:
+    units = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+    s = s.strip().upper().rstrip("B")
+    if s and s[-1] in units:
+        return int(float(s[:-1]) * units[s[-1]])
+    return int(s)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Content-addressed gym-cooking result cache")
+    sub = ap.add_subparsers(dest="action", required=True)
+    for name in ("key", "fetch", "store"):
+        p = sub.add_parser(name)
+        p.add_argument("--cmd", required=True, help="main.py command line (e.g. a tasks.txt line)")
+    p = sub.add_parser("missing")
+    p.add_argument("--tasks", type=Path, required=True)
+    sub.add_parser("stats")
+    p = sub.add_parser("evict")
+    p.add_argument("--max-size", type=parse_size)
+    p.add_argument("--max-age-days", type=float)
+    args = ap.parse_args()
+
+    if args.action == "key":
+        print(parse_task_cmd(args.cmd)["key"])
+    elif args.action == "fetch":
+        t = parse_task_cmd(args.cmd)
+        if t["pickle"] is None or not fetch_pickle(t["key"], t["pickle"]):
+            return 1
+        print(f"CACHE HIT {t['key'][:12]} -> {t['pickle']}")
+    elif args.action == "store":
+        t = parse_task_cmd(args.cmd)
+        if t["pickle"] is None or not t["pickle"].exists():
+            print(f"Nothing to store: {t['pickle']}", file=sys.stderr)
+            return 1
+        store_pickle(t["key"], t["pickle"], {"level": t["level"], "seed": t["seed"], "prefix": t["prefix"]})
+    elif args.action == "missing":
+        with open(args.tasks) as f:
+            for i, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    key = parse_task_cmd(line)["key"]
+                except (ValueError, OSError) as e:
+                    # Still listed, so the task runs and main.py reports the problem itself
+                    print(f"WARN: {args.tasks}:{i}: cannot compute cache key ({e}); treating as missing",
+                          file=sys.stderr)
+                    print(i)
+                    continue
+                if lookup(key) is None:
+                    print(i)
+    elif args.action == "stats":
+        entries = _entries()
+        total = sum(e[1] for e in entries)
+        print(f"{len(entries)} entries, {total / (1 << 20):.1f} MiB in {CACHE_DIR}")
+        print(f"simulator version: {simulator_version()}")
+    elif args.action == "evict":
+        print(f"Evicted {evict(args.max_size, args.max_age_days)} entries")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Persistent in-process worker pool for gym-cooking simulations.
+
+The subprocess path in model_runs.py launches a fresh interpreter per
+(trial, model spec, seed), which re-imports pygame, numpy and the gym_cooking
+stack every time. Here each worker process imports gym_cooking once (by warming
+up main.py) and then executes main.py in-process for every task it receives,
+with the same argv the subprocess path would use. Pickles and records therefore
+land in exactly the same place, and each task reports its own status.
+"""
+
+import os
+import sys
+import time
+import runpy
+import resource
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Per-worker state, populated by init_worker()
+_MAIN_PY: Optional[str] = None
+_MAIN_CODE = None
+
+
+def init_worker(main_py: str, env: Optional[Dict[str, str]] = None):
+    """Import gym_cooking once for the lifetime of this worker process."""
+    global _MAIN_PY, _MAIN_CODE
+    if env:
+        os.environ.update(env)
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    # Running `python3 main.py` puts the script's directory first on sys.path
+    gym_dir = str(Path(main_py).resolve().parent)
+    if gym_dir not in sys.path:
+        sys.path.insert(0, gym_dir)
+
+    _MAIN_PY = str(main_py)
+    with open(_MAIN_PY) as f:
+        _MAIN_CODE = compile(f.read(), _MAIN_PY, "exec")
+
+    # Executing the module body without __main__ pulls in every import main.py
+    # needs (pygame, numpy, gym, gym_cooking) without starting a simulation.
+    runpy.run_path(_MAIN_PY, run_name="sim_pool_warmup")
+
+
+def run_inprocess(argv: List[str]) -> int:
+    """Run main.py with `argv` (everything after the script path) in this process."""
+    saved_argv = sys.argv
+    sys.argv = [_MAIN_PY] + list(argv)
+    try:
+        exec(_MAIN_CODE, {"__name__": "__main__", "__file__": _MAIN_PY, "__builtins__": __builtins__})
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.argv = saved_argv
+
+
+def run_task_batch(batch: List[dict]) -> List[dict]:
+    """
+    Run a batch of tasks sequentially in this worker.
+
+    Each task is a dict with at least `argv`; any other keys are echoed back in
+    the status dict alongside `returncode`, `error`, `wall_time`, `cpu_time` and
+    `max_rss_mb` (the worker's peak RSS so far, since tasks share the process).
+    """
+    statuses = []
+    for task in batch:
+        status = {k: v for k, v in task.items() if k != "argv"}
+        t0 = time.perf_counter()
+        c0 = time.process_time()
+        try:
+            status["returncode"] = run_inprocess(task["argv"])
+            status["error"] = None
+        except Exception:
+            status["returncode"] = 1
+            status["error"] = traceback.format_exc()
+        status["wall_time"] = time.perf_counter() - t0
+        status["cpu_time"] = time.process_time() - c0
+        status["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        statuses.append(status)
+    return statuses
+
+
+def chunk_by_key(tasks: List[dict], key: str, size: int) -> List[List[dict]]:
+    """Group tasks sharing `key` (e.g. the level) into batches of at most `size`."""
+    groups: Dict[str, List[dict]] = {}
+    for t in tasks:
+        groups.setdefault(str(t.get(key)), []).append(t)
+    batches = []
+    for group in groups.values():
+        for i in range(0, len(group), max(1, size)):
+            batches.append(group[i:i + size])
+    return batches
+
+
+def run_pool(tasks: List[dict], main_py: Path, jobs: int, chunk_size: int = 5,
+             env: Optional[Dict[str, str]] = None, on_status=None) -> List[dict]:
+    """
+    Run `tasks` on `jobs` long-lived workers and return one status dict per task.
+
+    Tasks for the same level are dispatched together so a worker runs many seeds
+    of a trial back to back. Batches go out in decreasing total `cost` (if tasks
+    carry one), so the expensive ones start first. `on_status` is called with
+    each status as it arrives.
+    """
+    batches = chunk_by_key(tasks, "level", chunk_size)
+    batches.sort(key=lambda b: -sum(t.get("cost", 0.0) for t in b))
+    statuses = []
+    with ProcessPoolExecutor(max_workers=max(1, int(jobs)), initializer=init_worker,
+                             initargs=(str(main_py), env)) as ex:
+        futures = {ex.submit(run_task_batch, b): b for b in batches}
+        for fu in as_completed(futures):
+            try:
+                results = fu.result()
+            except BrokenProcessPool as e:
+                # A worker died (e.g. segfault in pygame); mark its batch failed
+                results = [{**{k: v for k, v in t.items() if k != "argv"},
+                            "returncode": 1, "error": repr(e), "wall_time": None,
+                            "cpu_time": None, "max_rss_mb": None}
+                           for t in futures[fu]]
+            for s in results:
+                if on_status is not None:
+                    on_status(s)
+                statuses.append(s)
+    return statuses
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+asyncio supervisor for the subprocess executor in model_runs.py.
+
+At most `jobs` main.py processes run at once. A task still running after
+`timeout` seconds has its process group sent SIGTERM (SIGKILL after KILL_GRACE
+seconds); timed-out tasks, and tasks killed by a signal such as the OOM killer,
+are retried up to `retries` more times, while ordinary non-zero exits are not.
+Each task's stdout and stderr go to its own log file (attempts appended, each
+under a header line) instead of the console, where one status line reports
+done / failed / running counts, sims per minute and the ETA.
+
+Children are reaped with os.wait4 on helper threads, as in telemetry.measure,
+so every status still carries the task's wall time, CPU time and peak RSS.
+"""
+
+import os
+import sys
+import time
+import shlex
+import signal
+import asyncio
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+KILL_GRACE = 10.0  # seconds between SIGTERM and SIGKILL
+
+
+class StatusLine:
+    """Done / failed / running counts, sims per minute and ETA; redrawn in place on a terminal."""
+
+    def __init__(self, total: int, stream=None):
+        self.total = total
+        self.done = self.failed = self.running = 0
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.interval = 1.0 if self.tty else 60.0  # plain lines in SLURM logs
+        self.t0 = time.monotonic()
+
+    def text(self) -> str:
+        finished = self.done + self.failed
+        minutes = (time.monotonic() - self.t0) / 60
+        rate = finished / minutes if minutes > 0 else 0.0
+        eta = str(timedelta(seconds=round((self.total - finished) / rate * 60))) if rate > 0 else "?"
+        return (f"[ {datetime.now():%H:%M:%S} ] {self.done}/{self.total} done, {self.failed} failed, "
+                f"{self.running} running | {rate:.1f} sims/min | ETA {eta}")
+
+    def draw(self):
+        if self.tty:
+            self.stream.write("\r\033[K" + self.text())
+            self.stream.flush()
+        else:
+            print(self.text(), file=self.stream, flush=True)
+
+    def note(self, msg: str):
+        """Print a message above the status line."""
+        if self.tty:
+            self.stream.write("\r\033[K")
+        print(msg, file=self.stream, flush=True)
+        if self.tty:
+            self.draw()
+
+    def close(self):
+        if self.tty:
+            self.stream.write("\r\033[K")
+        print(self.text(), file=self.stream, flush=True)
+
+
+async def _stop(proc: subprocess.Popen, waiter):
+    """SIGTERM the task's process group, then SIGKILL it if it outlives KILL_GRACE; returns the wait4 result."""
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE), (signal.SIGKILL, None)):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            pass
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter), grace)
+        except asyncio.TimeoutError:
+            continue
+
+
+async def _attempt(task: dict, n: int, timeout: Optional[float], reaper: ThreadPoolExecutor) -> dict:
+    """Run one attempt of `task` with output appended to its log; returns usage plus timed_out."""
+    log = Path(task["log"])
+    log.parent.mkdir(parents=True, exist_ok=True)
+    with open(log, "a") as f:
+        f.write(f"# attempt {n} at {datetime.now():%Y-%m-%d %H:%M:%S}: {shlex.join(task['cmd'])}\n")
+        f.flush()
+        t0 = time.perf_counter()
+        # own session, so a timeout kills anything main.py started as well
+        proc = subprocess.Popen(task["cmd"], env=task.get("env"), stdin=subprocess.DEVNULL,
+                                stdout=f, stderr=subprocess.STDOUT, start_new_session=True)
+    waiter = asyncio.get_running_loop().run_in_executor(reaper, os.wait4, proc.pid, 0)
+    timed_out = False
+    try:
+        _, wstatus, usage = await asyncio.wait_for(asyncio.shield(waiter), timeout)
+    except asyncio.TimeoutError:
+        timed_out = True
+        _, wstatus, usage = await _stop(proc, waiter)
+    except asyncio.CancelledError:
+        await _stop(proc, waiter)
+        raise
+    proc.returncode = os.waitstatus_to_exitcode(wstatus)
+    return {
+        "returncode": proc.returncode,
+        "wall_time": round(time.perf_counter() - t0, 3),
+        "cpu_time": round(usage.ru_utime + usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+        "timed_out": timed_out,
+    }
+
+
+async def _run_task(task: dict, sem: asyncio.Semaphore, timeout: Optional[float], retries: int,
+                    reaper: ThreadPoolExecutor, status: StatusLine) -> dict:
+    async with sem:
+        n = 0
+        while True:
+            n += 1
+            status.running += 1
+            try:
+                usage = await _attempt(task, n, timeout, reaper)
+            finally:
+                status.running -= 1
+            if not (usage["timed_out"] or usage["returncode"] < 0) or n > retries:
+                break
+            why = f"timed out after {timeout:g}s" if usage["timed_out"] else f"rc={usage['returncode']}"
+            status.note(f"RETRY: {task['name']} ({why}), attempt {n + 1} of {retries + 1}")
+    return {**{k: v for k, v in task.items() if k not in ("cmd", "env")}, **usage, "attempts": n}
+
+
+async def _supervise(tasks: List[dict], jobs: int, timeout: Optional[float], retries: int,
+                     on_status, stream) -> List[dict]:
+    jobs = max(1, int(jobs))
+    status = StatusLine(len(tasks), stream)
+    sem = asyncio.Semaphore(jobs)
+    reaper = ThreadPoolExecutor(max_workers=jobs)  # one blocking wait4 per running task
+
+    async def tick():
+        while True:
+            status.draw()
+            await asyncio.sleep(status.interval)
+
+    ticker = asyncio.ensure_future(tick())
+    # created in order, so the semaphore admits tasks in the order given (e.g. longest first)
+    running = [asyncio.ensure_future(_run_task(t, sem, timeout, retries, reaper, status)) for t in tasks]
+    statuses = []
+    try:
+        for fu in asyncio.as_completed(running):
+            s = await fu
+            if s["returncode"] == 0:
+                status.done += 1
+            else:
+                status.failed += 1
+                why = f"timed out after {timeout:g}s" if s["timed_out"] else f"rc={s['returncode']}"
+                status.note(f"FAILED: {s['name']} ({why}); log: {s['log']}")
+            if on_status is not None:
+                on_status(s)
+            statuses.append(s)
+    finally:
+        ticker.cancel()
+        reaper.shutdown(wait=False)
+        status.close()
+    return statuses
+
+
+def run_supervised(tasks: List[dict], jobs: int, timeout: Optional[float] = None, retries: int = 0,
+                   on_status=None, stream=None) -> List[dict]:
+    """
+    Run `tasks` (dicts with name, cmd, env and log, plus any fields to pass
+    through) as subprocesses and return one status dict per task, in completion
+    order: the task's fields without cmd/env, plus returncode, wall_time,
+    cpu_time, max_rss_mb, timed_out and attempts. `on_status` is called with
+    each status as it arrives.
+    """
+    if not tasks:
+        return []
+    return asyncio.run(_supervise(tasks, jobs, timeout, retries, on_status, stream))
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Shortest-path surrogate for gym-cooking completion times.
+
+Instead of simulating, a recipe is treated as a fixed sequence of station
+visits, and its cost is the fewest moves and interactions needed, read off the
+level's all-pairs distances over walkable tiles. For each ingredient it costs
+dispenser (1 pick) -> cutboard (place, chop, pick: 3) -> plate (1 merge), then
+plate (1 pick) -> delivery (1). Each visit may use any station of its kind,
+and the ingredient order that works best is used.
+
+  single     one agent from its start tile (inf if a station is out of reach)
+  two_agent  a division-of-labour bound for two agents: the better of
+             - a parallel split, where each agent prepares some ingredients
+               in its own region, and whichever can reach the plate
+               delivers after both are done
+             - a relay, where an item crosses between the agents' separate
+               regions over a free counter they both touch (place + pick: 2)
+
+Raw estimates are in steps. `calibrate` fits, per model spec, a linear map from
+them to the mean timesteps in model_results.csv. The fit is capped at the
+episode horizon, and infeasible estimates map to the horizon. It writes
+surrogate_calibration.json and a per-trial CSV next to model_results.csv.
+
+CLI:
+  surrogate.py estimate --level trial_01.txt [--recipe Salad] [--starts "5 1" "1 5"]
+  surrogate.py calibrate [--results-csv model_results.csv] [--start-locations start_locations.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from itertools import permutations
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import levels
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+LEVEL_DIR = ROOT / "stimuli" / EXPERIMENT
+TXT_DIR = LEVEL_DIR / "txt"
+METADATA_CSV = LEVEL_DIR / "trials_metadata.csv"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+MODEL_RESULTS_CSV = DATA_ROOT / "model_results.csv"
+CALIBRATION_JSON = DATA_ROOT / "surrogate_calibration.json"
+START_LOCATIONS_JSON = ROOT / "code" / "bash" / EXPERIMENT / "start_locations.json"
+
+RECIPE_INGREDIENTS = {"Salad": "tl", "SaladOL": "ol"}
+HORIZON = 100  # gym-cooking's episode length; runs that never finish report it
+
+PICK, CHOP, MERGE, DELIVER, HANDOFF = 1, 3, 1, 1, 2
+
+
+# ─── LAYOUT GRAPH ──────────────────────────────────────────────────────────────
+
+class LayoutGraph:
+    """Walkable-tile distances and the tiles an agent interacts with each station from."""
+
+    def __init__(self, level: levels.Level, dist: Optional[np.ndarray] = None):
+        self.level = level
+        self.walkable = level.open_mask()
+        self.index, self.coords = levels.tile_index(self.walkable)
+        self.dist = levels.distance_index(level) if dist is None else dist
+        self._stations = {
+            "cutboard": self.access(level.tiles == levels.CUTBOARD),
+            "delivery": self.access(level.tiles == levels.DELIVERY),
+            # dispensers and loose items alike
+            **{item: self.access(level.item_mask(item)) for item in levels.ITEM_CODES},
+        }
+
+    def access(self, station: np.ndarray) -> np.ndarray:
+        """Tile numbers next to any tile of the `station` mask."""
+        return self.index[levels.dilate(station) & self.walkable]
+
+    def stations(self, item: str) -> np.ndarray:
+        return self._stations[item]
+
+    def tile(self, xy) -> int:
+        i = self.index[xy[1], xy[0]] if 0 <= xy[1] < self.level.height and 0 <= xy[0] < self.level.width else -1
+        if i < 0:
+            raise ValueError(f"start {xy} is not a walkable tile")
+        return int(i)
+
+    def handoffs(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(i, j) tile-number pairs on two sides of the same free counter."""
+        free = self.level.tiles == levels.COUNTER
+        free[self.level.objects["y"], self.level.objects["x"]] = False
+        padded = np.pad(self.index, 1, constant_values=-1)
+        ys, xs = np.nonzero(free)
+        around = np.stack([padded[ys + 1 + dy, xs + 1 + dx] for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))], axis=1)
+        i, j = around[:, :, None], around[:, None, :]
+        i, j = np.broadcast_arrays(i, j)
+        keep = (i >= 0) & (j >= 0) & (i != j)
+        return i[keep], j[keep]
+
+    def relay_dist(self, a: int, b: int) -> np.ndarray:
+        """Distances where an item can also cross a free counter between a's and b's separate regions."""
+        ra, rb = np.isfinite(self.dist[a]), np.isfinite(self.dist[b])
+        i, j = self.handoffs()
+        cross = (ra[i] & ~rb[i] & rb[j] & ~ra[j]) | (rb[i] & ~ra[i] & ra[j] & ~rb[j])
+        i, j = i[cross], j[cross]
+        if not len(i):
+            return self.dist
+        dist = self.dist
+        for _ in range(2):  # over and, for a later stage, back again
+            dist = np.minimum(dist, (dist[:, i, None] + HANDOFF + dist[None, j, :]).min(axis=1))
+        return dist
+
+
+def graph_for(level: levels.Level) -> LayoutGraph:
+    return LayoutGraph(level)
+
+
+# ─── ROUTES ────────────────────────────────────────────────────────────────────
+
+def route(dist: np.ndarray, start: np.ndarray, stages: Sequence[Tuple[np.ndarray, int]]) -> np.ndarray:
+    """
+    Cost of being at each tile after visiting each stage's stations in turn.
+    `start` is the cost per tile before the first stage (one row per scenario
+    when 2-D). A stage is (tiles it can be done from, interactions it takes).
+    """
+    cost = start
+    for tiles, interactions in stages:
+        nxt = np.full(cost.shape, np.inf)
+        if len(tiles):
+            nxt[..., tiles] = (cost[..., :, None] + dist[:, tiles]).min(axis=-2) + interactions
+        cost = nxt
+    return cost
+
+
+def at(n: int, tiles) -> np.ndarray:
+    cost = np.full(n, np.inf)
+    cost[tiles] = 0.0
+    return cost
+
+
+def prep_stages(g: LayoutGraph, ingredients: Sequence[str]):
+    plate = g.stations("p")
+    return [s for i in ingredients for s in ((g.stations(i), PICK), (g.stations("cutboard"), CHOP), (plate, MERGE))]
+
+
+def finish_stages(g: LayoutGraph):
+    return [(g.stations("p"), PICK), (g.stations("delivery"), DELIVER)]
+
+
+def fastest(g: LayoutGraph, dist: np.ndarray, start: np.ndarray, recipe: str):
+    """Best cost over ingredient orders; one value per row of a 2-D `start`."""
+    return np.min([route(dist, start, prep_stages(g, order) + finish_stages(g)).min(axis=-1)
+                   for order in permutations(RECIPE_INGREDIENTS[recipe])], axis=0)
+
+
+def single(g: LayoutGraph, recipe: str, start) -> float:
+    """Fewest steps for one agent at `start` (x, y) to make and deliver `recipe`."""
+    return float(fastest(g, g.dist, at(len(g.coords), g.tile(start)), recipe))
+
+
+def parallel_split(g: LayoutGraph, recipe: str, a: int, b: int) -> float:
+    ingredients = RECIPE_INGREDIENTS[recipe]
+    n = len(g.coords)
+    plate = g.stations("p")
+
+    memo = {}
+
+    def prep(start, subset):
+        if not subset:
+            return 0.0
+        if (start, subset) not in memo:
+            memo[start, subset] = min(route(g.dist, at(n, start), prep_stages(g, order)).min()
+                                      for order in permutations(subset))
+        return memo[start, subset]
+
+    # The plate is delivered by whichever agent can get from the plate to delivery
+    deliver = min(route(g.dist, at(n, plate[np.isfinite(g.dist[s, plate])]), finish_stages(g)).min()
+                  if len(plate) else np.inf for s in (a, b))
+    best = np.inf
+    for mask in range(2 ** len(ingredients)):
+        mine = tuple(i for k, i in enumerate(ingredients) if mask >> k & 1)
+        theirs = tuple(i for k, i in enumerate(ingredients) if not mask >> k & 1)
+        best = min(best, max(prep(a, mine), prep(b, theirs)) + deliver)
+    return float(best)
+
+
+def two_agent(g: LayoutGraph, recipe: str, start1, start2) -> float:
+    """Division-of-labour bound for two agents at `start1` / `start2`."""
+    a, b = g.tile(start1), g.tile(start2)
+    relay = fastest(g, g.relay_dist(a, b), at(len(g.coords), [a, b]), recipe)
+    return float(min(parallel_split(g, recipe, a, b), relay))
+
+
+# ─── EVERY START TILE ──────────────────────────────────────────────────────────
+# The same estimates for all start tiles (or all ordered pairs) at once: each
+# start is a row of the route's cost matrix.
+
+def each_start(n: int) -> np.ndarray:
+    return np.where(np.eye(n, dtype=bool), 0.0, np.inf)
+
+
+def single_all(g: LayoutGraph, recipe: str) -> np.ndarray:
+    """(n,) single() from every walkable tile, in tile_index order."""
+    return fastest(g, g.dist, each_start(len(g.coords)), recipe)
+
+
+def two_agent_all(g: LayoutGraph, recipe: str) -> np.ndarray:
+    """(n, n) two_agent() for agent1 at tile i and agent2 at tile j (inf on the diagonal)."""
+    ingredients = RECIPE_INGREDIENTS[recipe]
+    n = len(g.coords)
+    starts = each_start(n)
+    plate = g.stations("p")
+
+    def prep(subset):
+        if not subset:
+            return np.zeros(n)
+        return np.min([route(g.dist, starts, prep_stages(g, order)).min(axis=-1)
+                       for order in permutations(subset)], axis=0)
+
+    # Delivery by whichever agent reaches a plate, from the best plate it reaches
+    finish = route(g.dist, each_start(n)[plate], finish_stages(g)).min(axis=-1)
+    leg = np.where(np.isfinite(g.dist[:, plate]), finish[None, :], np.inf).min(axis=1, initial=np.inf)
+    deliver = np.minimum(leg[:, None], leg[None, :])
+    preps = {}
+    best = np.full((n, n), np.inf)
+    for mask in range(2 ** len(ingredients)):
+        mine = tuple(i for k, i in enumerate(ingredients) if mask >> k & 1)
+        theirs = tuple(i for k, i in enumerate(ingredients) if not mask >> k & 1)
+        for subset in (mine, theirs):
+            if subset not in preps:
+                preps[subset] = prep(subset)
+        best = np.minimum(best, np.maximum(preps[mine][:, None], preps[theirs][None, :]) + deliver)
+
+    # Relay: agents sharing a region relay no better than the faster one alone
+    solo = single_all(g, recipe)
+    relay = np.minimum(solo[:, None], solo[None, :])
+    region = np.isfinite(g.dist).argmax(axis=1)  # lowest tile number each tile reaches
+    for ra in np.unique(region):
+        for rb in np.unique(region):
+            if ra == rb:
+                continue
+            via = fastest(g, g.relay_dist(ra, rb), starts, recipe)
+            ia, ib = region == ra, region == rb
+            relay[np.ix_(ia, ib)] = np.minimum(via[ia][:, None], via[ib][None, :])
+    best = np.minimum(best, relay)
+    best[np.arange(n), np.arange(n)] = np.inf
+    return best
+
+
+def estimate(level: levels.Level, recipe: str, starts: Sequence) -> Dict[str, float]:
+    g = graph_for(level)
+    out = {"single": single(g, recipe, starts[0])}
+    if len(starts) > 1 and starts[1] is not None:
+        out["two_agent"] = two_agent(g, recipe, starts[0], starts[1])
+    return out
+
+
+# ─── CALIBRATION ───────────────────────────────────────────────────────────────
+
+def predict(steps: float, fit: dict) -> float:
+    """Calibrated timesteps for a raw estimate (the horizon when infeasible)."""
+    if not np.isfinite(steps):
+        return float(fit.get("horizon", HORIZON))
+    return float(min(fit.get("horizon", HORIZON), fit["slope"] * steps + fit["intercept"]))
+
+
+def load_calibration(path: Path = CALIBRATION_JSON) -> Dict[str, dict]:
+    with open(path) as f:
+        return json.load(f)["fits"]
+
+
+def parse_xy(loc) -> Optional[Tuple[int, int]]:
+    if loc is None:
+        return None
+    x, y = (int(v) for v in str(loc).split()[:2])
+    return (x, y)
+
+
+def trial_starts(trial_id: str, trial_type: str, level: levels.Level, g: LayoutGraph, start_locations: dict):
+    """
+    Start tiles as model_runs.py would pass them: start_locations.json when it
+    has the trial, otherwise the auto-placement candidates, with agent1 the
+    candidate the surrogate finds faster for cooks trials (as
+    find_start_locations.py would by simulation).
+    """
+    if trial_id in start_locations:
+        s1, s2 = (parse_xy(l) for l in start_locations[trial_id])
+        if s1 is not None:
+            return s1, s2
+    c1, c2 = levels.candidate_locations(level)
+    if trial_type == "cooks" and single(g, "Salad", c2) < single(g, "Salad", c1):
+        c1, c2 = c2, c1
+    return c1, c2
+
+
+def surrogate_table(metadata_csv: Path = METADATA_CSV, txt_dir: Path = TXT_DIR,
+                    start_locations_json: Path = START_LOCATIONS_JSON):
+    """Raw estimates for every trial and model spec that model_runs.py simulates."""
+    import pandas as pd
+    from model_runs import load_start_locations
+    starts_by_trial = load_start_locations(start_locations_json)
+    rows = []
+    for r in pd.read_csv(metadata_csv).itertuples():
+        level = levels.load_level(txt_dir / f"{r.trial_id}.txt")
+        g = graph_for(level)
+        s1, s2 = trial_starts(r.trial_id, r.trial_type, level, g, starts_by_trial)
+        specs = ([("agents=1-model=greedy-recipe=Salad", "single"),
+                  ("agents=2-model=bd_bd-recipe=Salad", "two_agent"),
+                  ("agents=2-model=greedy_greedy-recipe=Salad", "two_agent")]
+                 if r.trial_type == "cooks" else
+                 [("agents=1-model=greedy-recipe=Salad", "single"),
+                  ("agents=1-model=greedy-recipe=SaladOL", "single")])
+        for settings, kind in specs:
+            recipe = settings.rsplit("recipe=", 1)[1]
+            steps = single(g, recipe, s1) if kind == "single" else two_agent(g, recipe, s1, s2)
+            rows.append({"trial": r.trial_id, "model_settings": settings, "surrogate_steps": steps})
+    return pd.DataFrame(rows)
+
+
+def fit_calibration(table, results):
+    """Per-spec least-squares fit of mean timesteps on surrogate steps, with agreement statistics."""
+    obs = (results.groupby(["trial", "model_settings"])
+           .agg(observed=("timesteps", "mean"), success_rate=("was_successful", "mean")).reset_index())
+    df = table.merge(obs, on=["trial", "model_settings"], how="inner")
+    fits = {}
+    for settings, d in df.groupby("model_settings"):
+        feasible = np.isfinite(d.surrogate_steps)
+        use = d[feasible & (d.observed < HORIZON)]
+        if len(use) >= 2 and use.surrogate_steps.nunique() > 1:
+            slope, intercept = np.polyfit(use.surrogate_steps, use.observed, 1)
+        else:
+            slope, intercept = 1.0, float((use.observed - use.surrogate_steps).mean()) if len(use) else 0.0
+        fit = {"slope": float(slope), "intercept": float(intercept), "horizon": HORIZON, "n_fit": int(len(use))}
+        pred = np.array([predict(s, fit) for s in d.surrogate_steps])
+        df.loc[d.index, "predicted"] = pred
+        fit.update({
+            "n_trials": int(len(d)),
+            "mae": float(np.abs(pred - d.observed).mean()),
+            "pearson_r": float(np.corrcoef(pred, d.observed)[0, 1]) if len(d) > 2 else None,
+            "spearman_r": float(d.observed.rank().corr(d.surrogate_steps.rank())) if len(d) > 2 else None,
+            # infeasible by the surrogate <=> the model never finished
+            "feasibility_agreement": float(((~feasible) == (d.success_rate == 0)).mean()),
+        })
+        fits[settings] = fit
+    return fits, df
+
+
+def print_report(fits: dict, per_trial, seconds_per_layout: float):
+    print(f"Surrogate: {seconds_per_layout * 1e6:.0f} us per layout (graph + all estimates)\n")
+    print(f"{'model spec':<45} {'n':>3} {'slope':>6} {'icpt':>6} {'MAE':>6} {'r':>5} {'rho':>5} {'feas':>5}")
+    for settings, f in fits.items():
+        r = f"{f['pearson_r']:.2f}" if f["pearson_r"] is not None else "-"
+        rho = f"{f['spearman_r']:.2f}" if f["spearman_r"] is not None else "-"
+        print(f"{settings:<45} {f['n_trials']:>3} {f['slope']:>6.2f} {f['intercept']:>6.1f} {f['mae']:>6.1f} "
+              f"{r:>5} {rho:>5} {f['feasibility_agreement']:>5.2f}")
+    worst = per_trial.assign(err=(per_trial.predicted - per_trial.observed).abs()).nlargest(5, "err")
+    print("\nLargest errors:")
+    for r in worst.itertuples():
+        print(f"  {r.trial} {r.model_settings:<45} surrogate {r.surrogate_steps:5.1f} -> "
+              f"{r.predicted:5.1f}, observed {r.observed:5.1f}")
+
+
+def resolve_level(path: Path) -> Path:
+    """A level file as given, relative to the repo, or by name in the stimuli (as render_runs.resolve_level)."""
+    for p in (Path(path), ROOT / path, TXT_DIR / Path(path).name):
+        if p.exists():
+            return p
+    raise FileNotFoundError(f"level file not found: {path}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Shortest-path surrogate for simulation timesteps")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("estimate")
+    p.add_argument("--level", type=Path, required=True, help="Level file, or a trial's file name in the stimuli")
+    p.add_argument("--recipe", choices=sorted(RECIPE_INGREDIENTS), default="Salad")
+    p.add_argument("--starts", nargs="*", default=None, help='"x y" per agent (default: auto-placement)')
+    p = sub.add_parser("calibrate")
+    p.add_argument("--results-csv", type=Path, default=MODEL_RESULTS_CSV)
+    p.add_argument("--metadata", type=Path, default=METADATA_CSV)
+    p.add_argument("--txt-dir", type=Path, default=TXT_DIR)
+    p.add_argument("--start-locations", type=Path, default=START_LOCATIONS_JSON)
+    p.add_argument("--output", type=Path, default=CALIBRATION_JSON)
+    args = ap.parse_args()
+
+    if args.action == "estimate":
+        level = levels.load_level(resolve_level(args.level))
+        starts = [parse_xy(s) for s in args.starts] if args.starts else list(levels.candidate_locations(level))
+        print(json.dumps({k: (v if np.isfinite(v) else None) for k, v in estimate(level, args.recipe, starts).items()}))
+        return 0
+
+    import pandas as pd
+    t0 = time.perf_counter()
+    table = surrogate_table(args.metadata, args.txt_dir, args.start_locations)
+    per_layout = (time.perf_counter() - t0) / max(1, table.trial.nunique())
+    fits, per_trial = fit_calibration(table, pd.read_csv(args.results_csv))
+    print_report(fits, per_trial, per_layout)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"fits": fits, "results_csv": os.path.relpath(args.results_csv, ROOT)}, f, indent=2)
+    per_trial.replace([np.inf], np.nan).to_csv(args.output.with_suffix(".csv"), index=False)
+    print(f"\nWrote {args.output} and {args.output.with_suffix('.csv')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Expected cost of each simulation task, for longest-first scheduling.
+
+A task's cost is estimated from the best history available, in seconds:
+  1. mean recorded wall time of that trial + model spec (telemetry.jsonl)
+  2. mean timesteps of that trial + spec (model_results.csv) times the spec's
+     seconds per timestep, fitted from telemetry runs that logged timesteps
+  3. mean timesteps times the spec's per-agent prior weight (bd plans, greedy
+     does not) times one global seconds per weighted timestep, fitted from all
+     timed telemetry runs (else from trials + specs with both histories)
+  4. the spec's, then the overall, mean cost
+With no wall times to fit that global rate, every cost is in weighted timesteps
+instead (3 without the rate, wall times unused): the two units are never mixed.
+
+model_runs.py submits tasks longest-expected-first to its pool (workers pull
+the next task as they free up), and run_task_pack.py's `plan` assigns task lines
+to SLURM packs with the LPT rule so every pack carries about the same work.
+
+CLI:
+  task_costs.py show [--tasks tasks.txt] [--top 20]
+"""
+
+import sys
+import heapq
+import argparse
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import telemetry
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+MODEL_RESULTS_CSV = DATA_ROOT / "model_results.csv"
+
+# Relative cost per timestep of each agent's model until telemetry has wall times
+MODEL_STEP_WEIGHT = {"bd": 4.0, "greedy": 1.0}
+
+
+def spec_step_weight(settings: str) -> float:
+    """'agents=2-model=bd_bd-recipe=Salad' -> summed prior weight of its agents' models."""
+    params = dict(p.split("=", 1) for p in settings.split("-") if "=" in p)
+    return sum(MODEL_STEP_WEIGHT.get(m, 1.0) for m in params.get("model", "").split("_") if m) or 1.0
+
+
+def fit_weighted_rate(wall: Iterable[float], timesteps: Iterable[float], settings: Iterable[str]) -> Optional[float]:
+    """Seconds per timestep of unit prior weight, pooled over runs; None without usable runs."""
+    units = sum(t * spec_step_weight(s) for t, s in zip(timesteps, settings))
+    return sum(wall) / units if units > 0 else None
+
+
+class TaskCosts:
+    def __init__(self, wall: Dict[Tuple[str, str], float], timesteps: Dict[Tuple[str, str], float],
+                 sec_per_step: Dict[str, float], sec_per_weighted_step: Optional[float] = None):
+        self.timesteps = timesteps
+        self.sec_per_step = sec_per_step
+        if sec_per_weighted_step is None:
+            both = sorted(set(wall) & set(timesteps))
+            sec_per_weighted_step = fit_weighted_rate([wall[k] for k in both], [timesteps[k] for k in both],
+                                                      [k[1] for k in both])
+        self.sec_per_weighted_step = sec_per_weighted_step
+        # Seconds unless timesteps could not be converted; then wall times are left out
+        self.units = "seconds" if sec_per_weighted_step is not None or not timesteps else "steps"
+        self.wall = wall if self.units == "seconds" else {}
+        known: Dict[str, List[float]] = {}
+        for trial, settings in set(self.wall) | set(timesteps):
+            known.setdefault(settings, []).append(self._estimate(trial, settings))
+        self.spec_mean = {s: sum(v) / len(v) for s, v in known.items()}
+        everything = [c for v in known.values() for c in v]
+        self.default = sum(everything) / len(everything) if everything else 1.0
+
+    def _estimate(self, trial: str, settings: str) -> Optional[float]:
+        key = (trial, settings)
+        if key in self.wall:
+            return self.wall[key]
+        if key in self.timesteps:
+            if self.units == "steps":
+                return self.timesteps[key] * spec_step_weight(settings)
+            rate = self.sec_per_step.get(settings)
+            if rate is None:
+                rate = self.sec_per_weighted_step * spec_step_weight(settings)
+            return self.timesteps[key] * rate
+        return None
+
+    def cost(self, trial: str, settings: str) -> float:
+        est = self._estimate(trial, settings)
+        if est is not None:
+            return est
+        return self.spec_mean.get(settings, self.default)
+
+    def task_cost(self, prefix: str) -> float:
+        """Cost of a task from its output prefix ('<trial>-<settings>')."""
+        trial, _, settings = prefix.partition("-")
+        return self.cost(trial, settings)
+
+
+def load_costs(telemetry_logs: Iterable = (), results_csv: Optional[Path] = MODEL_RESULTS_CSV) -> TaskCosts:
+    entries = [e for e in telemetry.load_entries(telemetry_logs)
+               if e.get("returncode") == 0 and e.get("wall_time") and e.get("trial") and e.get("settings")]
+    wall, steps_rate, weighted_rate = {}, {}, None
+    if entries:
+        df = pd.DataFrame(entries)
+        wall = df.groupby(["trial", "settings"]).wall_time.mean().to_dict()
+        timed = df.dropna(subset=["timesteps"])
+        timed = timed[timed.timesteps > 0]
+        if len(timed):
+            sums = timed.groupby("settings")[["wall_time", "timesteps"]].sum()
+            steps_rate = (sums.wall_time / sums.timesteps).to_dict()
+            weighted_rate = fit_weighted_rate(sums.wall_time, sums.timesteps, sums.index)
+
+    timesteps = {}
+    if results_csv is not None and Path(results_csv).exists():
+        res = pd.read_csv(results_csv, usecols=["trial", "model_settings", "timesteps"])
+        timesteps = res.groupby(["trial", "model_settings"]).timesteps.mean().to_dict()
+    return TaskCosts(wall, timesteps, steps_rate, weighted_rate)
+
+
+def default_costs(outdir=DATA_ROOT) -> TaskCosts:
+    """Costs from <outdir>'s telemetry log plus the committed model_results.csv."""
+    logs = {telemetry.log_path(outdir), telemetry.log_path(DATA_ROOT)}
+    return load_costs(sorted(logs), MODEL_RESULTS_CSV)
+
+
+# ─── SCHEDULING ────────────────────────────────────────────────────────────────
+
+def longest_first(items: List, costs: List[float]) -> List:
+    """Items in decreasing cost order (stable for ties)."""
+    order = sorted(range(len(items)), key=lambda i: -costs[i])
+    return [items[i] for i in order]
+
+
+def lpt_bins(costs: List[float], n_bins: int) -> List[List[int]]:
+    """
+    Longest-processing-time assignment of item indices to `n_bins` bins: each
+    item, longest first, goes to the currently lightest bin. Each bin lists its
+    items longest first.
+    """
+    bins: List[List[int]] = [[] for _ in range(n_bins)]
+    heap = [(0.0, b) for b in range(n_bins)]
+    for i in sorted(range(len(costs)), key=lambda i: -costs[i]):
+        load, b = heapq.heappop(heap)
+        bins[b].append(i)
+        heapq.heappush(heap, (load + costs[i], b))
+    return bins
+
+
+def makespan(costs: List[float], workers: int, order: Optional[List[int]] = None) -> float:
+    """Simulated finish time of a greedy pool running items in `order` on `workers` workers."""
+    heap = [0.0] * max(1, workers)
+    for i in (order if order is not None else range(len(costs))):
+        heapq.heappush(heap, heapq.heappop(heap) + costs[i])
+    return max(heap)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Estimated task costs from run history")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("show")
+    p.add_argument("--tasks", type=Path, default=None, help="tasks.txt to estimate (default: known trial/specs)")
+    p.add_argument("--log", type=Path, nargs="*", default=[telemetry.log_path(DATA_ROOT)])
+    p.add_argument("--results-csv", type=Path, default=MODEL_RESULTS_CSV)
+    p.add_argument("--jobs", type=int, default=8, help="Pool size for the makespan estimate")
+    p.add_argument("--top", type=int, default=20)
+    args = ap.parse_args()
+
+    costs = load_costs(args.log, args.results_csv)
+    if args.tasks:
+        import sim_cache
+        with open(args.tasks) as f:
+            prefixes = [sim_cache.parse_task_cmd(l)["prefix"] for l in f if l.strip()]
+    else:
+        prefixes = [f"{t}-{s}" for t, s in sorted(set(costs.wall) | set(costs.timesteps))]
+    est = [costs.task_cost(p) for p in prefixes]
+    for i in sorted(range(len(est)), key=lambda i: -est[i])[:args.top]:
+        print(f"{est[i]:10.2f}  {prefixes[i]}")
+    lpt = sorted(range(len(est)), key=lambda i: -est[i])
+    print(f"\n{len(est)} task(s), estimated makespan in {costs.units} on {args.jobs} workers: "
+          f"in order {makespan(est, args.jobs):.1f}, longest first {makespan(est, args.jobs, lpt):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
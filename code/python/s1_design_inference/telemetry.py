@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Per-task resource telemetry for gym-cooking simulations.
+
+Every simulation run by model_runs.py (either executor), run_task_pack.py or the
+SLURM array script appends one JSON line to <outdir>/logs/telemetry.jsonl:
+
+  time, host, slurm_job, executor, trial, settings, seed, returncode,
+  wall_time (s), cpu_time (s), max_rss_mb, timesteps
+
+plus timed_out and attempts from the subprocess executor's supervisor.
+
+`summary` reads one or more of these logs and reports throughput, the slowest
+trials and model specs, and per-spec --mem / --time recommendations.
+
+CLI:
+  telemetry.py run --cmd "<main.py command>" [--outdir DIR]   # run, measure, log; exits with the command's code
+  telemetry.py summary [--log telemetry.jsonl ...] [--top 10] [--json]
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import socket
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+
+
+def log_path(outdir) -> Path:
+    return Path(outdir) / "logs" / "telemetry.jsonl"
+
+
+def measure(argv, env=None, shell: bool = False) -> dict:
+    """Run a command and return its returncode, wall time, CPU time and peak RSS."""
+    t0 = time.perf_counter()
+    args = ["/bin/bash", "-c", argv] if shell else list(argv)
+    proc = subprocess.Popen(args, env=env)
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "returncode": proc.returncode,
+        "wall_time": round(time.perf_counter() - t0, 3),
+        "cpu_time": round(usage.ru_utime + usage.ru_stime, 3),
+        "max_rss_mb": round(usage.ru_maxrss / 1024, 1),  # ru_maxrss is KiB on Linux
+    }
+
+
+def task_fields(prefix: Optional[str], seed) -> dict:
+    """trial / settings from an output prefix such as 'trial_01-agents=2-model=bd_bd-recipe=Salad'."""
+    trial, _, settings = (prefix or "").partition("-")
+    return {"trial": trial or None, "settings": settings or None, "seed": seed}
+
+
+def record(outdir, entry: dict, path: Optional[Path] = None):
+    """Append one task's telemetry (host, time and SLURM ids are filled in)."""
+    path = Path(path) if path else log_path(outdir)
+    line = {
+        "time": round(time.time(), 3),
+        "host": socket.gethostname(),
+        "slurm_job": "_".join(filter(None, [os.environ.get("SLURM_ARRAY_JOB_ID") or os.environ.get("SLURM_JOB_ID"),
+                                           os.environ.get("SLURM_ARRAY_TASK_ID")])) or None,
+        **entry,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # One short O_APPEND write per line, so concurrent writers do not interleave
+    with open(path, "a") as f:
+        f.write(json.dumps(line) + "\n")
+
+
+def pickle_timesteps(pickle) -> Optional[int]:
+    """Timesteps of a finished run (len(actions['agent-1'])), or None if unreadable."""
+    try:
+        import results_store
+        return results_store.summarize_run(results_store.load_run_pickle(pickle))["timesteps"]
+    except Exception:
+        return None
+
+
+def load_entries(paths: Iterable) -> List[dict]:
+    entries = []
+    for p in paths:
+        if not Path(p).exists():
+            continue
+        with open(p) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue  # a line cut short by a killed job
+    return entries
+
+
+# ─── SUMMARY ───────────────────────────────────────────────────────────────────
+
+def quantile(values: List[float], q: float) -> float:
+    v = sorted(values)
+    return v[min(len(v) - 1, max(0, int(math.ceil(q * len(v))) - 1))]
+
+
+def fmt_time(seconds: float) -> str:
+    seconds = max(60, int(math.ceil(seconds)))  # SLURM time limits are whole minutes
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def fmt_mem(mb: float) -> str:
+    return f"{int(math.ceil(mb / 256.0)) * 256}M"  # whole 256M steps
+
+
+def summarize(entries: List[dict], top: int = 10, mem_headroom: float = 1.25, time_headroom: float = 1.5) -> dict:
+    runs = [e for e in entries if e.get("wall_time") is not None]
+    ok = [e for e in runs if e.get("returncode") == 0]
+    out = {"tasks": len(runs), "succeeded": len(ok), "failed": len(runs) - len(ok)}
+    if not ok:
+        return out
+
+    # Throughput over the wall-clock span the tasks covered (start = end - wall)
+    start = min(e["time"] - e["wall_time"] for e in ok)
+    span_h = max((max(e["time"] for e in ok) - start) / 3600, 1e-9)
+    busy_h = sum(e["wall_time"] for e in ok) / 3600
+    out["throughput"] = {"sims_per_hour": len(ok) / span_h, "sims_per_core_hour": len(ok) / busy_h,
+                         "hosts": len({e.get("host") for e in ok})}
+
+    def by(key):
+        groups = {}
+        for e in ok:
+            groups.setdefault(e.get(key), []).append(e)
+        return groups
+
+    def row(name, es):
+        wall = [e["wall_time"] for e in es]
+        return {"name": name, "n": len(es), "mean_wall_s": sum(wall) / len(wall), "max_wall_s": max(wall)}
+
+    for key, label in (("trial", "slowest_trials"), ("settings", "slowest_specs")):
+        rows = [row(k, es) for k, es in by(key).items()]
+        out[label] = sorted(rows, key=lambda r: r["mean_wall_s"], reverse=True)[:top]
+
+    recs = {}
+    for spec, es in sorted(by("settings").items(), key=lambda kv: str(kv[0])):
+        rss = [e["max_rss_mb"] for e in es if e.get("max_rss_mb")]
+        wall = [e["wall_time"] for e in es]
+        ts = [e["timesteps"] for e in es if e.get("timesteps") is not None]
+        recs[str(spec)] = {
+            "n": len(es),
+            "p99_rss_mb": quantile(rss, 0.99) if rss else None,
+            "p99_wall_s": quantile(wall, 0.99),
+            "mean_cpu_s": sum(e.get("cpu_time") or 0 for e in es) / len(es),
+            "mean_timesteps": sum(ts) / len(ts) if ts else None,
+            "mem": fmt_mem(mem_headroom * quantile(rss, 0.99)) if rss else None,
+            "time": fmt_time(time_headroom * quantile(wall, 0.99)),
+        }
+    out["recommendations"] = recs
+    return out
+
+
+def print_summary(s: dict):
+    print(f"{s['tasks']} task(s): {s['succeeded']} succeeded, {s['failed']} failed")
+    if "throughput" not in s:
+        return
+    t = s["throughput"]
+    print(f"Throughput: {t['sims_per_hour']:.1f} sims/hour over {t['hosts']} host(s) "
+          f"({t['sims_per_core_hour']:.1f} sims per busy core-hour)")
+    for label in ("slowest_trials", "slowest_specs"):
+        print(f"\n{label.replace('_', ' ').capitalize()}:")
+        for r in s[label]:
+            print(f"  {str(r['name']):<45} n={r['n']:<5} mean {r['mean_wall_s']:8.1f}s  max {r['max_wall_s']:8.1f}s")
+    print("\nPer-task requests by model spec (p99 x headroom):")
+    for spec, r in s["recommendations"].items():
+        rss = f"{r['p99_rss_mb']:.0f}MB" if r["p99_rss_mb"] else "?"
+        print(f"  {spec:<45} --mem={r['mem'] or '?':<7} --time={r['time']}  "
+              f"(p99 RSS {rss}, p99 wall {r['p99_wall_s']:.1f}s, n={r['n']})")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-task resource telemetry")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("run", help="Run a main.py command, measure it and log the result")
+    p.add_argument("--cmd", required=True)
+    p.add_argument("--outdir", type=Path, default=None, help="Log under <outdir>/logs (default: the command's --output-dir)")
+    p.add_argument("--executor", default="slurm-array")
+    p = sub.add_parser("summary")
+    p.add_argument("--log", type=Path, nargs="+", default=[log_path(DATA_ROOT)])
+    p.add_argument("--top", type=int, default=10)
+    p.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    if args.action == "summary":
+        s = summarize(load_entries(args.log), args.top)
+        if args.json:
+            print(json.dumps(s, indent=2))
+        else:
+            print_summary(s)
+        return 0
+
+    import sim_cache
+    res = measure(args.cmd, shell=True)
+    try:
+        task = sim_cache.parse_task_cmd(args.cmd)
+    except Exception:  # never fail the task over its telemetry
+        task = {"pickle": None, "prefix": None, "seed": None}
+    outdir = args.outdir or (task["pickle"].parent.parent if task["pickle"] else DATA_ROOT)
+    timesteps = pickle_timesteps(task["pickle"]) if res["returncode"] == 0 and task["pickle"] else None
+    record(outdir, {"executor": args.executor, **task_fields(task["prefix"], task["seed"]), **res,
+                    "timesteps": timesteps})
+    rc = res["returncode"]
+    return 128 - rc if rc < 0 else rc  # killed by a signal: report it as the shell would
+
+
+if __name__ == "__main__":
+    sys.exit(main())
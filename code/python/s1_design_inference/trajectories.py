@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Compact, memory-mapped trajectories of model runs.
+
+A run pickle keeps its actions as lists of Python tuples next to gym_cooking
+objects, so any question about paths, pauses or collisions across runs means
+unpickling every file. Here each finished run also writes a small array part
+(<outdir>/trajectories/parts/<run>.npz):
+
+  actions     (T, A) int8      action code per agent per timestep (ACTIONS; -1: none)
+  positions   (T, A, 2) x, y   where each agent is after that timestep's action
+  collisions  (K, 7) int32     t, agent_a, agent_b, xa, ya, xb, yb
+
+Positions are the run's recorded 'states', or replayed from its actions like
+render_runs.py does when a pickle has none, from the start locations its
+launching command gave (passed in by model_runs.py, run_task_pack.py and
+results_store.py append --cmd; looked up in the launch manifests by `build`).
+
+`pack` concatenates every part of a sweep into one file,
+<outdir>/trajectories/trajectories-<token>.bin, holding the three arrays
+back to back (positions as uint8, or uint16 for levels wider than 255 tiles),
+plus trajectories.json: each array's dtype, shape and byte offset, and a run
+table with each run's trial, settings, seed, level shape and its row / collision
+offsets. `Trajectories` maps the arrays read-only, so cross-run queries (e.g.
+`occupancy`) are NumPy operations over the selected rows; nothing is unpickled.
+
+Model runs write parts as they finish (model_runs.py, run_task_pack.py and
+results_store.py append); `build` backfills parts for existing pickles.
+
+CLI:
+  trajectories.py build [--outdir DIR] [--jobs J] [--overwrite]   # parts for pickles without one, then pack
+                        [--launched-from manifest.jsonl|tasks.txt ...]
+  trajectories.py pack [--outdir DIR]
+  trajectories.py heatmap --trial trial_07 --model bd_bd [--recipe Salad] [--agent 2] [--outdir DIR]
+"""
+
+import os
+import sys
+import glob
+import json
+import argparse
+import secrets
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import levels
+
+ROOT = Path(__file__).resolve().parents[3]
+EXPERIMENT = "s1_design_inference"
+DATA_ROOT = ROOT / "data" / "models" / EXPERIMENT
+
+# Action codes: index into ACTIONS; -1 for a missing action (or agent)
+ACTIONS = [(0, 0), (0, -1), (0, 1), (-1, 0), (1, 0)]
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+PAUSE = 0
+COLLISION_COLUMNS = ["t", "agent_a", "agent_b", "xa", "ya", "xb", "yb"]
+RUN_COLUMNS = ["name", "trial", "settings", "model", "recipe", "agents", "seed", "height", "width",
+               "row_start", "row_count", "coll_start", "coll_count"]
+ALIGN = 64
+
+
+def traj_dir(outdir=DATA_ROOT) -> Path:
+    return Path(outdir) / "trajectories"
+
+
+def part_path(outdir, name: str) -> Path:
+    return traj_dir(outdir) / "parts" / f"{name}.npz"
+
+
+# ─── PARTS ─────────────────────────────────────────────────────────────────────
+
+def _field(obj, name: str, i: int):
+    """A field of a gym_cooking CollisionRepr (namedtuple), or of a dict/tuple stand-in."""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    if hasattr(obj, name):
+        return getattr(obj, name)
+    return obj[i] if isinstance(obj, (tuple, list)) and len(obj) > i else None
+
+
+def collision_rows(collisions, agents: Sequence[str]) -> np.ndarray:
+    """(K, 7) int32 rows from CollisionRepr(time, agent_names, agent_locations); -1 where unknown."""
+    index = {a: i for i, a in enumerate(agents)}
+    rows = []
+    for c in collisions or []:
+        t = _field(c, "time", 0)
+        names = list(_field(c, "agent_names", 1) or [])[:2]
+        locs = list(_field(c, "agent_locations", 2) or [])[:2]
+        ids = [index.get(n, -1) for n in names] + [-1] * (2 - len(names))
+        xy = [v for loc in locs for v in loc] + [-1] * (4 - 2 * len(locs))
+        rows.append([-1 if t is None else int(t)] + ids + [int(v) for v in xy])
+    return np.array(rows, dtype=np.int32).reshape(-1, len(COLLISION_COLUMNS))
+
+
+def run_arrays(data: dict, level, given_starts: Optional[List[Optional[str]]] = None) -> Dict[str, np.ndarray]:
+    """actions / positions / collisions arrays of one unpickled run (`given_starts` as for render_runs.trajectory)."""
+    from render_runs import trajectory
+    agents = sorted(data["actions"], key=lambda a: int(a.split("-")[-1]))
+    steps = min((len(data["actions"][a]) for a in agents), default=0)
+    actions = np.full((steps, len(agents)), -1, dtype=np.int8)
+    for j, a in enumerate(agents):
+        actions[:, j] = [ACTION_CODES.get(tuple(act) if act is not None else None, -1)
+                         for act in data["actions"][a][:steps]]
+    pos, _ = trajectory(data, level, given_starts)
+    # recorded states are already one per step; a replay also has the start tiles
+    positions = pos[len(pos) - steps:]
+    return {"actions": actions, "positions": positions.astype(np.int32),
+            "collisions": collision_rows(data.get("collisions"), agents)}
+
+
+def write_part(pickle, outdir=None, data: Optional[dict] = None,
+               given_starts: Optional[List[Optional[str]]] = None) -> Path:
+    """
+    Write the trajectory part of one run pickle (default outdir: the pickle's).
+    `given_starts` are the start locations its command gave, needed without 'states'.
+    """
+    import results_store
+    from render_runs import resolve_level
+    pickle = Path(pickle)
+    outdir = Path(outdir) if outdir else pickle.parent.parent
+    data = data if data is not None else results_store.load_run_pickle(pickle)
+    level = levels.load_level(resolve_level(data["level"]))
+    arrays = run_arrays(data, level, given_starts)
+    run = results_store.parse_run_name(pickle.stem)
+    out = part_path(outdir, pickle.stem)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.stem}.tmp.npz")
+    np.savez(tmp, **arrays, shape=np.array(level.tiles.shape, dtype=np.int32),
+             trial=np.array(Path(data["level"]).stem), settings=np.array(run["model_settings"]),
+             seed=np.array(run["model_seed"], dtype=np.int32))
+    os.replace(tmp, out)
+    return out
+
+
+def _write_one(job):
+    pickle, outdir, given_starts = job
+    try:
+        write_part(pickle, outdir, given_starts=given_starts)
+        return pickle, None
+    except Exception:
+        return pickle, traceback.format_exc(limit=2)
+
+
+def build_parts(outdir=DATA_ROOT, jobs: Optional[int] = None, overwrite: bool = False,
+                launched_from: Optional[List[Path]] = None) -> List[tuple]:
+    """
+    Parts for every pickle that has none (or is newer than its part); returns the
+    failures. Start locations come from `launched_from` (default: the launch
+    manifests render_runs.py reads).
+    """
+    from render_runs import default_launch_sources, launched_starts
+    launched = launched_starts(launched_from or default_launch_sources(Path(outdir)), Path(outdir))
+    todo = []
+    for p in sorted(glob.glob(str(Path(outdir) / "pickles" / "*.pkl"))):
+        part = part_path(outdir, Path(p).stem)
+        if overwrite or not part.exists() or part.stat().st_mtime < Path(p).stat().st_mtime:
+            todo.append((p, outdir, launched.get(str(Path(p).resolve()))))
+    print(f"{len(todo)} trajectory part(s) to write")
+    failed = []
+    if todo:
+        workers = jobs or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for pickle, err in ex.map(_write_one, todo, chunksize=max(1, len(todo) // (4 * workers))):
+                if err is not None:
+                    failed.append((pickle, err))
+    for pickle, err in failed:
+        print(f"  {pickle}\n    {err.strip().splitlines()[-1]}", file=sys.stderr)
+    return failed
+
+
+# ─── PACK ──────────────────────────────────────────────────────────────────────
+
+def pack(outdir=DATA_ROOT) -> Optional[Path]:
+    """Concatenate all parts into one mappable file plus its JSON index; returns the index path."""
+    parts = sorted(glob.glob(str(traj_dir(outdir) / "parts" / "*.npz")))
+    if not parts:
+        return None
+    loaded = []
+    for p in parts:
+        with np.load(p) as z:
+            loaded.append((Path(p).stem, {k: z[k] for k in z.files}))
+    n_agents = max(z["actions"].shape[1] for _, z in loaded)
+    big = max(int(z["shape"].max()) for _, z in loaded) >= 255
+    pos_dtype = np.uint16 if big else np.uint8
+    missing = np.iinfo(pos_dtype).max
+
+    rows = sum(len(z["actions"]) for _, z in loaded)
+    colls = sum(len(z["collisions"]) for _, z in loaded)
+    actions = np.full((rows, n_agents), -1, dtype=np.int8)
+    positions = np.full((rows, n_agents, 2), missing, dtype=pos_dtype)
+    collisions = np.empty((colls, len(COLLISION_COLUMNS)), dtype=np.int32)
+    runs = {c: [] for c in RUN_COLUMNS}
+    r = c = 0
+    for name, z in loaded:
+        t, a = z["actions"].shape
+        k = len(z["collisions"])
+        actions[r:r + t, :a] = z["actions"]
+        positions[r:r + t, :a] = z["positions"]
+        collisions[c:c + k] = z["collisions"]
+        params = dict(p.split("=", 1) for p in str(z["settings"]).split("-") if "=" in p)
+        for col, v in zip(RUN_COLUMNS, [name, str(z["trial"]), str(z["settings"]), params.get("model"),
+                                        params.get("recipe"), int(params.get("agents", a)), int(z["seed"]),
+                                        int(z["shape"][0]), int(z["shape"][1]), r, t, c, k]):
+            runs[col].append(v)
+        r, c = r + t, c + k
+
+    d = traj_dir(outdir)
+    token = secrets.token_hex(4)
+    bin_path = d / f"trajectories-{token}.bin"
+    layout, offset = {}, 0
+    with open(bin_path, "wb") as f:
+        for key, arr in (("actions", actions), ("positions", positions), ("collisions", collisions)):
+            offset = -(-offset // ALIGN) * ALIGN
+            f.seek(offset)
+            f.write(arr.tobytes())
+            layout[key] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+            offset += arr.nbytes
+    index = d / "trajectories.json"
+    old = _bin_name(index)
+    tmp = index.with_name(index.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"file": bin_path.name, "arrays": layout, "missing_position": int(missing),
+                   "actions": [list(a) for a in ACTIONS], "collision_columns": COLLISION_COLUMNS,
+                   "runs": runs}, f)
+    os.replace(tmp, index)
+    # readers that mapped the old file keep it until they close it
+    if old and old != bin_path.name:
+        try:
+            os.remove(d / old)
+        except OSError:
+            pass
+    print(f"Packed {len(loaded)} run(s), {rows} step(s), {colls} collision(s) -> {bin_path}")
+    return index
+
+
+def _bin_name(index: Path) -> Optional[str]:
+    try:
+        with open(index) as f:
+            return json.load(f)["file"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+# ─── QUERIES ───────────────────────────────────────────────────────────────────
+
+def ranges(start: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Concatenated arange(start[i], start[i] + count[i]) for all i, without a Python loop."""
+    ends = np.cumsum(count)
+    total = int(ends[-1]) if len(ends) else 0
+    return np.arange(total) - np.repeat(ends - count, count) + np.repeat(start, count)
+
+
+class Trajectories:
+    """Read-only view of a packed sweep: memory-mapped arrays plus the run table."""
+
+    def __init__(self, outdir=DATA_ROOT):
+        d = traj_dir(outdir)
+        with open(d / "trajectories.json") as f:
+            meta = json.load(f)
+        path = d / meta["file"]
+        self.missing = meta["missing_position"]
+        for key, spec in meta["arrays"].items():
+            shape = tuple(spec["shape"])
+            arr = (np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r", offset=spec["offset"], shape=shape)
+                   if np.prod(shape) else np.empty(shape, dtype=np.dtype(spec["dtype"])))
+            setattr(self, key, arr)
+        self.runs = pd.DataFrame(meta["runs"], columns=RUN_COLUMNS)
+
+    def select(self, trial: Optional[str] = None, model: Optional[str] = None, recipe: Optional[str] = None,
+               seeds: Optional[Sequence[int]] = None, settings: Optional[str] = None) -> np.ndarray:
+        """Run ids (rows of `runs`) matching every given filter."""
+        keep = np.ones(len(self.runs), dtype=bool)
+        for col, v in (("trial", trial), ("model", model), ("recipe", recipe), ("settings", settings)):
+            if v is not None:
+                keep &= (self.runs[col] == v).to_numpy()
+        if seeds is not None:
+            keep &= self.runs.seed.isin(list(seeds)).to_numpy()
+        return np.flatnonzero(keep)
+
+    def rows(self, run_ids) -> np.ndarray:
+        """Step-row indices of the given runs, concatenated."""
+        return ranges(self.runs.row_start.to_numpy()[run_ids], self.runs.row_count.to_numpy()[run_ids])
+
+    def occupancy(self, run_ids, agent: int = 1) -> np.ndarray:
+        """(height, width) count of timesteps agent-`agent` spent on each tile over the runs."""
+        h, w = int(self.runs.height.to_numpy()[run_ids].max()), int(self.runs.width.to_numpy()[run_ids].max())
+        xy = np.asarray(self.positions[self.rows(run_ids), agent - 1], dtype=np.int64)
+        xy = xy[(xy != self.missing).all(axis=1)]
+        return np.bincount(xy[:, 1] * w + xy[:, 0], minlength=h * w).reshape(h, w)
+
+    def pauses(self, run_ids) -> np.ndarray:
+        """(len(run_ids), agents) pause counts per run."""
+        count = self.runs.row_count.to_numpy()[run_ids]
+        paused = np.asarray(self.actions[self.rows(run_ids)]) == PAUSE
+        totals = np.concatenate([np.zeros((1, paused.shape[1]), dtype=np.int64), np.cumsum(paused, axis=0)])
+        ends = np.cumsum(count)
+        return totals[ends] - totals[ends - count]
+
+    def collision_tiles(self, run_ids) -> np.ndarray:
+        """(height, width) count of collisions by agent_a's tile over the runs."""
+        h, w = int(self.runs.height.to_numpy()[run_ids].max()), int(self.runs.width.to_numpy()[run_ids].max())
+        idx = ranges(self.runs.coll_start.to_numpy()[run_ids], self.runs.coll_count.to_numpy()[run_ids])
+        c = np.asarray(self.collisions[idx], dtype=np.int64)
+        c = c[c[:, 3] >= 0]
+        return np.bincount(c[:, 4] * w + c[:, 3], minlength=h * w).reshape(h, w)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compact memory-mapped trajectories of model runs")
+    sub = ap.add_subparsers(dest="action", required=True)
+    p = sub.add_parser("build", help="Write parts for pickles without one, then pack")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p.add_argument("--jobs", type=int, default=os.cpu_count())
+    p.add_argument("--overwrite", action="store_true", help="Rewrite every part")
+    p.add_argument("--launched-from", type=Path, nargs="+", default=None,
+                   help="Manifests (.jsonl) or tasks.txt files that launched the runs, for pickles without 'states'")
+    p = sub.add_parser("pack", help="Concatenate parts into the mappable file")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p = sub.add_parser("heatmap", help="Print an agent's occupancy over the selected runs")
+    p.add_argument("--outdir", type=Path, default=DATA_ROOT)
+    p.add_argument("--trial", required=True)
+    p.add_argument("--model", default=None, help="e.g. bd_bd")
+    p.add_argument("--recipe", default=None)
+    p.add_argument("--agent", type=int, default=1)
+    args = ap.parse_args()
+
+    if args.action == "build":
+        failed = build_parts(args.outdir, args.jobs, args.overwrite, args.launched_from)
+        pack(args.outdir)
+        return 1 if failed else 0
+    if args.action == "pack":
+        return 0 if pack(args.outdir) else 1
+
+    tr = Trajectories(args.outdir)
+    ids = tr.select(trial=args.trial, model=args.model, recipe=args.recipe)
+    if not len(ids):
+        print("No runs match.", file=sys.stderr)
+        return 1
+    grid = tr.occupancy(ids, args.agent)
+    print(f"agent-{args.agent} occupancy over {len(ids)} run(s), {grid.sum()} step(s):")
+    for row in grid:
+        print(" ".join(f"{v:5d}" for v in row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
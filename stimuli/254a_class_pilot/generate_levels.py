@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'code', 'python'))
+from levels import write_level
 
 # ─── CONFIG ────────────────────────────────────────────────────────────────────
 
@@ -131,15 +135,7 @@ if __name__ == '__main__':
                 for ar in actual_recipes:
                     fn = f'{aa}-{ar}.txt'
                     path = os.path.join(dir_path, fn)
-                    with open(path, 'w') as f:
-                        # Phase 1: layout
-                        f.write(layout)
-                        f.write('\n\n')
-                        # Phase 2: recipe
-                        f.write(recipe_map[ar])
-                        f.write('\n\n')
-                        # Phase 3: up to 4 start locations
-                        for x, y in start_locs[ai][aa]:
-                            f.write(f'{x} {y}\n')
+                    # Phases: layout, recipe, up to 4 start locations
+                    write_level(path, layout, [recipe_map[ar]], start_locs[ai][aa])
 
     print("All folders and files generated under", base_dir)